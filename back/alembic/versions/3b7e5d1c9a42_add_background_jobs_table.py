@@ -0,0 +1,57 @@
+"""add_background_jobs_table
+
+Revision ID: 3b7e5d1c9a42
+Revises: da1c18593cc6
+Create Date: 2025-10-20 10:12:31.204518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b7e5d1c9a42'
+down_revision: Union[str, None] = 'da1c18593cc6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('background_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('job_type', sa.String(length=50), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('payload', sa.Text(), nullable=True),
+    sa.Column('result', sa.Text(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('progress_current', sa.Integer(), nullable=True),
+    sa.Column('progress_total', sa.Integer(), nullable=True),
+    sa.Column('progress_message', sa.String(length=255), nullable=True),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('max_attempts', sa.Integer(), nullable=False),
+    sa.Column('cancel_requested', sa.Boolean(), nullable=False),
+    sa.Column('artifact_path', sa.String(length=500), nullable=True),
+    sa.Column('artifact_name', sa.String(length=255), nullable=True),
+    sa.Column('worker_id', sa.String(length=100), nullable=True),
+    sa.Column('project_id', sa.Integer(), nullable=True),
+    sa.Column('created_by', sa.Integer(), nullable=True),
+    sa.Column('run_after', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('heartbeat_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['created_by'], ['users.id'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['project_id'], ['projects.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_background_jobs_id'), 'background_jobs', ['id'], unique=False)
+    op.create_index('ix_background_jobs_status_run_after', 'background_jobs', ['status', 'run_after'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_background_jobs_status_run_after', table_name='background_jobs')
+    op.drop_index(op.f('ix_background_jobs_id'), table_name='background_jobs')
+    op.drop_table('background_jobs')
@@ -0,0 +1,32 @@
+"""add_transmittals_keyset_index
+
+Revision ID: 4d9a6b2e8f15
+Revises: 7c2f4e8a1b63
+Create Date: 2025-10-22 11:05:47.512930
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4d9a6b2e8f15'
+down_revision: Union[str, None] = '7c2f4e8a1b63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Журнал трансмитталов проекта: сортировка и keyset-пагинация по (updated_at, id)
+    op.create_index(
+        'ix_transmittals_project_updated_id',
+        'transmittals',
+        ['project_id', 'updated_at', 'id'],
+        unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_transmittals_project_updated_id', table_name='transmittals')
@@ -0,0 +1,28 @@
+"""add_background_jobs_partially_committed
+
+Revision ID: 4f8a2c6e1b93
+Revises: c5d2a7e94b18
+Create Date: 2025-10-27 09:41:05.512873
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4f8a2c6e1b93'
+down_revision: Union[str, None] = 'c5d2a7e94b18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('background_jobs', sa.Column(
+        'partially_committed', sa.Boolean(), server_default=sa.text('false'), nullable=False
+    ))
+
+
+def downgrade() -> None:
+    op.drop_column('background_jobs', 'partially_committed')
@@ -0,0 +1,35 @@
+"""transmittals_keyset_by_id
+
+Revision ID: 6a1d3f9b2c57
+Revises: 4f8a2c6e1b93
+Create Date: 2025-10-27 14:22:18.904311
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6a1d3f9b2c57'
+down_revision: Union[str, None] = '4f8a2c6e1b93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Keyset-пагинация журнала по неизменяемому id вместо updated_at:
+    # изменение трансмиттала между страницами больше не сдвигает строки
+    op.drop_index('ix_transmittals_project_updated_id', table_name='transmittals')
+    op.create_index('ix_transmittals_project_id_id', 'transmittals', ['project_id', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_transmittals_project_id_id', table_name='transmittals')
+    op.create_index(
+        'ix_transmittals_project_updated_id',
+        'transmittals',
+        ['project_id', 'updated_at', 'id'],
+        unique=False
+    )
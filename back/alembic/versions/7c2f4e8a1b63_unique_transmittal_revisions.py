@@ -0,0 +1,38 @@
+"""unique_transmittal_revisions
+
+Revision ID: 7c2f4e8a1b63
+Revises: 3b7e5d1c9a42
+Create Date: 2025-10-21 09:40:12.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c2f4e8a1b63'
+down_revision: Union[str, None] = '3b7e5d1c9a42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Удаляем дубли (оставляем самую раннюю запись) перед созданием ограничения
+    op.execute("""
+        DELETE FROM transmittal_revisions tr
+        USING transmittal_revisions dup
+        WHERE tr.transmittal_id = dup.transmittal_id
+          AND tr.revision_id = dup.revision_id
+          AND tr.id > dup.id
+    """)
+    op.create_unique_constraint(
+        'uq_transmittal_revisions_transmittal_revision',
+        'transmittal_revisions',
+        ['transmittal_id', 'revision_id']
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_transmittal_revisions_transmittal_revision', 'transmittal_revisions', type_='unique')
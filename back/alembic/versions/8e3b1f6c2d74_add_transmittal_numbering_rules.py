@@ -0,0 +1,47 @@
+"""add_transmittal_numbering_rules
+
+Revision ID: 8e3b1f6c2d74
+Revises: 4d9a6b2e8f15
+Create Date: 2025-10-22 15:31:08.847126
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e3b1f6c2d74'
+down_revision: Union[str, None] = '4d9a6b2e8f15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('transmittal_numbering_rules',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('project_id', sa.Integer(), nullable=False),
+    sa.Column('direction', sa.String(length=10), nullable=True),
+    sa.Column('counterparty_id', sa.Integer(), nullable=True),
+    sa.Column('template', sa.String(length=200), nullable=False),
+    sa.Column('next_value', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['counterparty_id'], ['companies.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['project_id'], ['projects.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_transmittal_numbering_rules_id'), 'transmittal_numbering_rules', ['id'], unique=False)
+    op.create_index(
+        'uq_transmittal_numbering_rules_scope',
+        'transmittal_numbering_rules',
+        ['project_id', sa.text("coalesce(direction, '')"), sa.text("coalesce(counterparty_id, 0)")],
+        unique=True
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('uq_transmittal_numbering_rules_scope', table_name='transmittal_numbering_rules')
+    op.drop_index(op.f('ix_transmittal_numbering_rules_id'), table_name='transmittal_numbering_rules')
+    op.drop_table('transmittal_numbering_rules')
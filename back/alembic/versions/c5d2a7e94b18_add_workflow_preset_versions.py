@@ -0,0 +1,98 @@
+"""add_workflow_preset_versions
+
+Revision ID: c5d2a7e94b18
+Revises: 8e3b1f6c2d74
+Create Date: 2025-10-24 11:12:40.318205
+
+"""
+import json
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5d2a7e94b18'
+down_revision: Union[str, None] = '8e3b1f6c2d74'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEQUENCE_FIELDS = (
+    "id", "document_type_id", "sequence_order", "revision_description_id", "revision_step_id",
+    "is_final", "requires_transmittal"
+)
+RULE_FIELDS = (
+    "id", "document_type_id", "current_revision_description_id", "current_revision_step_id",
+    "review_code_id", "operator", "review_code_list", "priority",
+    "next_revision_description_id", "next_revision_step_id"
+)
+
+
+def upgrade() -> None:
+    op.create_table('workflow_preset_versions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('preset_id', sa.Integer(), nullable=False),
+    sa.Column('version_number', sa.Integer(), nullable=False),
+    sa.Column('sequences', sa.Text(), nullable=False),
+    sa.Column('rules', sa.Text(), nullable=False),
+    sa.Column('created_by', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['created_by'], ['users.id'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['preset_id'], ['workflow_presets.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('preset_id', 'version_number', name='uq_workflow_preset_versions_preset_version')
+    )
+    op.create_index(op.f('ix_workflow_preset_versions_id'), 'workflow_preset_versions', ['id'], unique=False)
+    op.add_column('workflow_presets', sa.Column('current_version_id', sa.Integer(), nullable=True))
+    op.add_column('projects', sa.Column('workflow_preset_version_id', sa.Integer(), nullable=True))
+    op.create_foreign_key(
+        'fk_projects_workflow_preset_version_id', 'projects', 'workflow_preset_versions',
+        ['workflow_preset_version_id'], ['id'], ondelete='SET NULL'
+    )
+
+    # Версия 1 для каждого существующего пресета из текущих последовательностей и правил;
+    # проекты закрепляются на ней
+    bind = op.get_bind()
+    sequences = {}
+    for row in bind.execute(sa.text(
+        f"SELECT preset_id, {', '.join(SEQUENCE_FIELDS)} FROM workflow_preset_sequences "
+        "ORDER BY preset_id, sequence_order, id"
+    )).mappings():
+        sequences.setdefault(row["preset_id"], []).append({field: row[field] for field in SEQUENCE_FIELDS})
+    rules = {}
+    for row in bind.execute(sa.text(
+        f"SELECT preset_id, {', '.join(RULE_FIELDS)} FROM workflow_preset_rules "
+        "ORDER BY preset_id, priority, id"
+    )).mappings():
+        rules.setdefault(row["preset_id"], []).append({field: row[field] for field in RULE_FIELDS})
+
+    for (preset_id, created_by) in bind.execute(sa.text("SELECT id, created_by FROM workflow_presets")).all():
+        version_id = bind.execute(
+            sa.text(
+                "INSERT INTO workflow_preset_versions (preset_id, version_number, sequences, rules, created_by) "
+                "VALUES (:preset_id, 1, :sequences, :rules, :created_by) RETURNING id"
+            ),
+            {
+                "preset_id": preset_id,
+                "sequences": json.dumps(sequences.get(preset_id, [])),
+                "rules": json.dumps(rules.get(preset_id, [])),
+                "created_by": created_by,
+            }
+        ).scalar()
+        bind.execute(
+            sa.text("UPDATE workflow_presets SET current_version_id = :version_id WHERE id = :preset_id"),
+            {"version_id": version_id, "preset_id": preset_id}
+        )
+    bind.execute(sa.text(
+        "UPDATE projects SET workflow_preset_version_id = workflow_presets.current_version_id "
+        "FROM workflow_presets WHERE workflow_presets.id = projects.workflow_preset_id"
+    ))
+
+
+def downgrade() -> None:
+    op.drop_constraint('fk_projects_workflow_preset_version_id', 'projects', type_='foreignkey')
+    op.drop_column('projects', 'workflow_preset_version_id')
+    op.drop_column('workflow_presets', 'current_version_id')
+    op.drop_index(op.f('ix_workflow_preset_versions_id'), table_name='workflow_preset_versions')
+    op.drop_table('workflow_preset_versions')
@@ -3,7 +3,7 @@ API v1 router configuration
 """
 
 from fastapi import APIRouter
-from app.api.v1.endpoints import auth, users, projects, documents, transmittals, reviews, disciplines, user_settings, references, workflow_presets, workflow_rule_application, project_participants, contacts, company_roles, roles, document_comments, transmittal_import_settings, transmittal_import
+from app.api.v1.endpoints import auth, users, projects, documents, transmittals, reviews, disciplines, user_settings, references, workflow_presets, workflow_rule_application, project_participants, contacts, company_roles, roles, document_comments, transmittal_import_settings, transmittal_import, transmittal_numbering, jobs
 
 api_router = APIRouter()
 
@@ -26,3 +26,5 @@ api_router.include_router(roles.router, prefix="/roles", tags=["roles"])
 api_router.include_router(document_comments.router, prefix="", tags=["document-comments"])
 api_router.include_router(transmittal_import_settings.router, prefix="/transmittal-import-settings", tags=["transmittal-import-settings"])
 api_router.include_router(transmittal_import.router, prefix="/transmittal-import", tags=["transmittal-import"])
+api_router.include_router(transmittal_numbering.router, prefix="/transmittal-numbering", tags=["transmittal-numbering"])
+api_router.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
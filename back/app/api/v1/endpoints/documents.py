@@ -8,12 +8,9 @@ from sqlalchemy.orm import Session
 from typing import List, Optional
 from pydantic import BaseModel
 import os
-import shutil
 import hashlib
 import uuid
 from datetime import datetime, date
-# import pandas as pd  # Temporarily disabled
-import io
 
 from app.core.database import get_db
 from app.core.config import settings
@@ -21,12 +18,38 @@ from app.models.user import User
 from app.models.document import Document, DocumentRevision
 from app.models.discipline import Discipline, DocumentType
 from app.models.discipline import Discipline, DocumentType
-from app.models.references import Language, WorkflowStatus
-from app.models.project import ProjectDisciplineDocumentType, ProjectMember
+from app.models.references import WorkflowStatus
+from app.models.project import ProjectDisciplineDocumentType
 from app.services.auth import get_current_active_user
+from app.services.job_queue import enqueue_job
+from app.services.document_import import validate_manifest, ManifestError
+from app.services.file_ingest import INGEST_MODES
+from app.services.project_access import get_project_access
+from app.services.revision_numbering import bump_revision_number, lock_documents
 
 router = APIRouter()
 
+
+# Права в проекте документа из кеша project_access: без запросов к БД при повторных проверках
+def _access(db: Session, user: User, project_id: Optional[int]):
+    return get_project_access(db, user.id, project_id) if project_id else None
+
+
+def _is_project_member(db: Session, user: User, project_id: Optional[int]) -> bool:
+    access = _access(db, user, project_id)
+    return bool(access and access.is_member)
+
+
+def _is_project_owner(db: Session, user: User, project_id: Optional[int]) -> bool:
+    access = _access(db, user, project_id)
+    return bool(access and access.is_owner)
+
+
+def _can_contribute(db: Session, user: User, project_id: Optional[int]) -> bool:
+    access = _access(db, user, project_id)
+    return bool(access and access.can_contribute)
+
+
 class DocumentCreate(BaseModel):
     title: str
     title_native: str = None  # Переименовано из description
@@ -89,19 +112,6 @@ class DocumentMetadata(BaseModel):
     confidentiality: str = "internal"
 
 
-def _bump_revision_string(current: Optional[str]) -> str:
-    """Увеличивает номер ревизии: 01 -> 02, 02 -> 03, и т.д."""
-    try:
-        # Парсим текущий номер (например, "01", "02")
-        current_num = int(current or "01")
-        new_num = current_num + 1
-        # Возвращаем в формате с ведущим нулем (01, 02, 03, ...)
-        return f"{new_num:02d}"
-    except Exception:
-        # Если не удалось распарсить, возвращаем "02"
-        return "02"
-
-
 def _compute_md5(file_path: str) -> Optional[str]:
     try:
         md5 = hashlib.md5()
@@ -457,205 +467,58 @@ async def get_document(
 async def import_documents_by_paths(
     metadata_file: UploadFile = File(...),
     project_id: int = Form(...),
+    dry_run: bool = Form(False),
+    ingest_mode: Optional[str] = Form(None),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Импорт документов по путям из Excel метаданных (без загрузки файлов).
 
+    Доступно владельцу проекта или админу. Файлы берутся только из каталога IMPORT_ROOT.
+
     Ожидаемые колонки Excel (минимум):
-    - file_path: абсолютный или относительный путь к исходному файлу
+    - file_path: путь к исходному файлу внутри IMPORT_ROOT (абсолютный или относительно него)
     - title: заголовок документа
-    Необязательные: description, discipline_code, document_type_code, document_code, language,
-      author, creation_date, revision, sheet_number, total_sheets, scale, format, confidentiality
+    Необязательные: description, remarks, number, discipline_code, document_type_code, language_code,
+      creation_date, revision, sheet_number, total_sheets, scale, format, confidentiality
+
+    Импорт выполняется фоновой задачей (манифест читается потоково, строки сохраняются
+    пачками по IMPORT_BATCH_SIZE); статус и результат — GET /jobs/{job_id}.
+
+    dry_run=true: только проверка манифеста (синхронно, без записи) — полный отчет об ошибках.
+    ingest_mode: auto | reflink | copy — способ помещения файлов в хранилище (по умолчанию IMPORT_INGEST_MODE).
     """
+    # Импорт читает файлы сервера: только админ или владелец проекта
+    if not current_user.is_admin and not _is_project_owner(db, current_user, project_id):
+        raise HTTPException(status_code=403, detail="Импорт по путям доступен только владельцу проекта или админу")
+    if not settings.IMPORT_ROOT:
+        raise HTTPException(status_code=400, detail="Импорт по путям отключен: не задан каталог IMPORT_ROOT")
+    if ingest_mode and ingest_mode not in INGEST_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Неверный режим ingest_mode: {ingest_mode}. Допустимые: {', '.join(INGEST_MODES)}"
+        )
 
-    try:
-        metadata_content = await metadata_file.read()
-        # df = pd.read_excel(io.BytesIO(metadata_content))  # Temporarily disabled
-        # TODO: Re-enable pandas functionality
-        raise HTTPException(status_code=501, detail="Excel import temporarily disabled")
-
-        required_columns = ['file_path', 'title']
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        if missing_columns:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Отсутствуют обязательные колонки: {', '.join(missing_columns)}"
-            )
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Ошибка чтения файла метаданных: {str(e)}")
-
-    disciplines = {d.code: d.id for d in db.query(Discipline).all()}
-    document_types = {dt.code: dt.id for dt in db.query(DocumentType).all()}
-
-    imported_documents = []
-    errors = []
-
-    upload_dir = os.path.join(settings.UPLOAD_DIR, f"project_{project_id}")
-    os.makedirs(upload_dir, exist_ok=True)
+    metadata_content = await metadata_file.read()
+    if not metadata_content:
+        raise HTTPException(status_code=400, detail="Файл метаданных пуст")
 
-    for _, row in df.iterrows():
+    if dry_run:
         try:
-            src_path_raw = row['file_path']
-            # if pd.isna(src_path_raw) or not str(src_path_raw).strip():  # Temporarily disabled
-            if not src_path_raw or not str(src_path_raw).strip():
-                errors.append("Строка без file_path пропущена")
-                continue
-
-            src_path = str(src_path_raw).strip()
-
-            # Проверяем существование файла
-            if not os.path.isabs(src_path):
-                # Разрешаем относительные пути относительно рабочего каталога процесса
-                src_path = os.path.abspath(src_path)
-            if not os.path.exists(src_path) or not os.path.isfile(src_path):
-                errors.append(f"Файл не найден: {src_path}")
-                continue
-
-            # Имя и расширение исходного файла
-            original_name = os.path.basename(src_path)
-            file_extension = os.path.splitext(original_name)[1].lstrip('.').lower()
-
-            # Проверка типа файла (по расширению)
-            if file_extension and settings.ALLOWED_FILE_TYPES:
-                # settings.ALLOWED_FILE_TYPES хранится строкой с запятыми
-                allowed = {ext.strip().lower() for ext in settings.ALLOWED_FILE_TYPES.split(',') if ext.strip()}
-                if file_extension not in allowed:
-                    errors.append(f"Неподдерживаемый тип файла: .{file_extension} ({original_name})")
-                    continue
-
-            # Копируем файл в каталог загрузок проекта с уникальным именем
-            unique_filename = f"{uuid.uuid4()}.{file_extension}" if file_extension else str(uuid.uuid4())
-            dst_path = os.path.join(upload_dir, unique_filename)
-            try:
-                shutil.copy2(src_path, dst_path)
-            except Exception as copy_err:
-                errors.append(f"Ошибка копирования '{src_path}': {copy_err}")
-                continue
-
-            # Карта метаданных
-            def get_str(name: str, default: str = None):
-                val = row.get(name)
-                # return str(val).strip() if pd.notna(val) else default  # Temporarily disabled
-                return str(val).strip() if val is not None else default
-
-            def get_int(name: str):
-                val = row.get(name)
-                try:
-                    # return int(val) if pd.notna(val) else None  # Temporarily disabled
-                    return int(val) if val is not None else None
-                except Exception:
-                    return None
-
-            def get_date(name: str):
-                val = row.get(name)
-                try:
-                    # return pd.to_datetime(val).date() if pd.notna(val) else None  # Temporarily disabled
-                    # TODO: Implement proper date parsing without pandas
-                    return None
-                except Exception:
-                    return None
-
-            discipline_id = None
-            document_type_id = None
-
-            discipline_code = get_str('discipline_code')
-            if discipline_code:
-                discipline_id = disciplines.get(discipline_code)
-                if not discipline_id:
-                    errors.append(f"Дисциплина не найдена по коду: {discipline_code} (файл {original_name})")
-                    # не прерываем — можно продолжить без дисциплины
-
-            document_type_code = get_str('document_type_code')
-            if document_type_code:
-                document_type_id = document_types.get(document_type_code)
-                if not document_type_id:
-                    errors.append(f"Тип документа не найден по коду: {document_type_code} (файл {original_name})")
-
-            title = get_str('title', original_name)
-            description = get_str('description')
-
-            # Получаем language_id по коду языка
-            language_id = None
-            language_code = get_str('language_code')
-            if language_code:
-                language = db.query(Language).filter(Language.code == language_code).first()
-                if language:
-                    language_id = language.id
-                else:
-                    errors.append(f"Язык не найден по коду: {language_code} (файл {original_name})")
-
-            db_document = Document(
-                title=title,
-                title_native=description,  # Переименовано из description
-                remarks=None,  # Примечания (можно добавить в будущем)
-                number=get_str('number'),
-                project_id=project_id,
-                discipline_id=discipline_id,
-                document_type_id=document_type_id,
-                language_id=language_id,
-                document_code=get_str('document_code'),
-                author=get_str('author'),
-                creation_date=get_date('creation_date'),
-                revision=get_str('revision'),
-                sheet_number=get_str('sheet_number'),
-                total_sheets=get_int('total_sheets'),
-                scale=get_str('scale'),
-                format=get_str('format'),
-                confidentiality=get_str('confidentiality', 'internal'),
-                drs=None  # DRS moved to project_discipline_document_types
-            )
-
-            db.add(db_document)
-            db.commit()
-            db.refresh(db_document)
-            
-            # Получаем ID статуса "Draft" из workflow_statuses
-            draft_workflow_status = db.query(WorkflowStatus).filter(WorkflowStatus.name == "Draft").first()
-            
-            # Создаем первую ревизию документа
-            revision_row = DocumentRevision(
-                document_id=db_document.id,
-                revision="1.0",
-                file_path=dst_path,
-                file_name=original_name,
-                file_size=os.path.getsize(dst_path),
-                file_type=file_extension,
-                change_description="Импорт по пути",
-                uploaded_by=current_user.id,
-                workflow_status_id=draft_workflow_status.id if draft_workflow_status else None,
-            )
-            
-            db.add(revision_row)
-            db.commit()
-            db.refresh(revision_row)
-
-            imported_documents.append({
-                "id": db_document.id,
-                "title": db_document.title,
-                "number": db_document.number,
-                "file_name": revision_row.file_name,
-                "file_size": revision_row.file_size,
-                "is_deleted": db_document.is_deleted,
-                "drs": None,  # DRS moved to project_discipline_document_types
-                "discipline_id": db_document.discipline_id,
-                "document_type_id": db_document.document_type_id,
-                "language_id": db_document.language_id,
-                "document_code": db_document.document_code,
-                "author": db_document.author,
-                "revision": "01",  # Заглушка, так как поле revision больше не существует
-                "confidentiality": db_document.confidentiality
-            })
-
-        except Exception as e:
-            errors.append(str(e))
-
-    return {
-        "imported_documents": imported_documents,
-        "total_imported": len(imported_documents),
-        "total_rows": len(df.index),
-        "errors": errors
-    }
+            return validate_manifest(db, metadata_content, project_id)
+        except ManifestError as e:
+            raise HTTPException(status_code=400, detail=f"Ошибка чтения файла метаданных: {str(e)}")
+
+    job = enqueue_job(
+        db,
+        "documents_import_by_paths",
+        {"project_id": project_id, "user_id": current_user.id, "ingest_mode": ingest_mode},
+        user_id=current_user.id,
+        project_id=project_id,
+        input_file=metadata_content,
+        input_filename=metadata_file.filename
+    )
+    return {"job_id": job.id, "status": job.status}
 
 
 @router.get("/{document_id}/revisions", response_model=List[dict])
@@ -733,6 +596,9 @@ async def create_document_revision(
     from app.models.references import RevisionStatus
     cancelled_status = db.query(RevisionStatus).filter(RevisionStatus.name == "Cancelled").first()
     
+    # Блокируем документ до коммита: параллельное создание ревизии ждет и получает следующий номер
+    lock_documents(db, [document_id])
+
     # Получаем текущую ревизию из последней НЕ отмененной ревизии
     latest_revision = db.query(DocumentRevision).filter(
         DocumentRevision.document_id == document_id,
@@ -753,7 +619,7 @@ async def create_document_revision(
             new_revision = latest_revision.number
         else:
             # Генерируем новый номер
-            new_revision = _bump_revision_string(latest_revision.number)
+            new_revision = bump_revision_number(latest_revision.number)
     else:
         # Если нет ревизий, начинаем с "01"
         new_revision = "01"
@@ -912,12 +778,7 @@ async def download_document_revision(
         raise HTTPException(status_code=404, detail="Ревизия не найдена")
     
     # Проверяем права доступа (пользователь должен быть участником проекта)
-    project_member = db.query(ProjectMember).filter(
-        ProjectMember.project_id == document.project_id,
-        ProjectMember.user_id == current_user.id
-    ).first()
-    
-    if not current_user.is_admin and not project_member:
+    if not current_user.is_admin and not _is_project_member(db, current_user, document.project_id):
         raise HTTPException(status_code=403, detail="Нет прав доступа к документу")
     
     if not revision.file_path:
@@ -953,20 +814,12 @@ async def soft_delete_document(
     if current_user.is_admin:
         can_delete = True
     # 2. Создатель проекта может удалять все документы в своих проектах
-    elif document.project_id and document.project.created_by == current_user.id:
+    elif _is_project_owner(db, current_user, document.project_id):
         can_delete = True
     # 3. Участник проекта может удалять только свои документы в проекте
     elif document.created_by == current_user.id:
         # Проверяем, что пользователь является участником проекта (не читателем)
-        from app.models.project import ProjectMember
-        from app.models.project_role import ProjectRole
-        project_member = db.query(ProjectMember).join(ProjectRole).filter(
-            ProjectMember.project_id == document.project_id,
-            ProjectMember.user_id == current_user.id,
-            ProjectRole.code != 'viewer'  # Исключаем читателей
-        ).first()
-        
-        if project_member:
+        if _can_contribute(db, current_user, document.project_id):
             can_delete = True
     
     if not can_delete:
@@ -1089,14 +942,7 @@ async def cancel_document_revision(
     # 3. Участник проекта (не читатель) может отменять ревизии документов в проекте
     if not current_user.is_admin and document.created_by != current_user.id:
         # Проверяем, является ли пользователь участником проекта с правами (не читателем)
-        from app.models.project import ProjectMember
-        project_member = db.query(ProjectMember).filter(
-            ProjectMember.project_id == document.project_id,
-            ProjectMember.user_id == current_user.id,
-            ProjectMember.role != 'viewer'  # Исключаем читателей
-        ).first()
-        
-        if not project_member:
+        if not _can_contribute(db, current_user, document.project_id):
             raise HTTPException(status_code=403, detail="Нет прав для отмены этой ревизии")
     
     # Получаем ID статуса "Cancelled"
@@ -0,0 +1,85 @@
+"""
+Фоновые задачи: статус, прогресс, отмена, скачивание результата
+"""
+
+import os
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+
+from app.core.database import get_db
+from app.services.auth import get_current_active_user
+from app.services.job_queue import job_to_dict, request_cancel
+from app.models.user import User
+from app.models.background_job import BackgroundJob
+
+router = APIRouter()
+
+
+def _get_job_for_user(db: Session, job_id: int, current_user: User) -> BackgroundJob:
+    job = db.query(BackgroundJob).filter(BackgroundJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    if not current_user.is_admin and job.created_by != current_user.id:
+        raise HTTPException(status_code=403, detail="Нет доступа к задаче")
+    return job
+
+
+@router.get("/")
+async def get_jobs(
+    status: Optional[str] = Query(None, description="Фильтр по статусу"),
+    job_type: Optional[str] = Query(None, description="Фильтр по типу задачи"),
+    limit: int = Query(50, ge=1, le=500),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Список задач текущего пользователя (администратор видит все)"""
+    query = db.query(BackgroundJob)
+    if not current_user.is_admin:
+        query = query.filter(BackgroundJob.created_by == current_user.id)
+    if status:
+        query = query.filter(BackgroundJob.status == status)
+    if job_type:
+        query = query.filter(BackgroundJob.job_type == job_type)
+    jobs = query.order_by(BackgroundJob.id.desc()).limit(limit).all()
+    return [job_to_dict(job) for job in jobs]
+
+
+@router.get("/{job_id}")
+async def get_job(
+    job_id: int,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Статус, прогресс и результат задачи"""
+    return job_to_dict(_get_job_for_user(db, job_id, current_user))
+
+
+@router.post("/{job_id}/cancel")
+async def cancel_job(
+    job_id: int,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Запрос отмены задачи"""
+    job = _get_job_for_user(db, job_id, current_user)
+    if job.status not in ("queued", "running"):
+        raise HTTPException(status_code=400, detail="Задача уже завершена")
+    request_cancel(db, job)
+    db.refresh(job)
+    return job_to_dict(job)
+
+
+@router.get("/{job_id}/artifact")
+async def download_job_artifact(
+    job_id: int,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Скачивание файла-результата задачи"""
+    job = _get_job_for_user(db, job_id, current_user)
+    if not job.artifact_path or not os.path.exists(job.artifact_path):
+        raise HTTPException(status_code=404, detail="Файл результата не найден")
+    return FileResponse(job.artifact_path, filename=job.artifact_name or os.path.basename(job.artifact_path))
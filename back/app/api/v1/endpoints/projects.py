@@ -3,7 +3,7 @@ Projects endpoints
 """
 
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 from typing import List, Optional
 from datetime import datetime
 import random
@@ -12,10 +12,15 @@ from pydantic import BaseModel, field_validator
 
 from app.core.database import get_db
 from app.models.user import User
-from app.models.project import Project, ProjectMember, ProjectDisciplineDocumentType
+from app.models.project import Project, ProjectMember
 from app.models.project_participant import ProjectParticipant
-from app.models.discipline import Discipline, DocumentType
 from app.services.auth import get_current_active_user
+from app.services.project_catalogue import project_catalogue_cache, invalidate_project_catalogue
+from app.services.project_access import get_project_access, invalidate_project_access
+from app.services.project_setup import (
+    CLONE_SECTIONS, clone_project_config, sync_discipline_document_types, sync_revision_descriptions,
+    sync_revision_steps, sync_members, sync_participants
+)
 
 router = APIRouter()
 
@@ -61,6 +66,7 @@ class ProjectUpdate(BaseModel):
     selected_revision_descriptions: List[int] | None = None
     selected_revision_steps: List[int] | None = None
     workflow_preset_id: int | None = None
+    workflow_preset_version_id: int | None = None  # Закрепить другую версию пресета (например, перейти на текущую)
 
 @router.get("/check-code/{project_code}")
 async def check_project_code(
@@ -121,62 +127,59 @@ async def get_projects(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Получение списка проектов"""
+    """
+    Получение списка проектов. Число запросов не зависит от числа проектов:
+    проекты с именем владельца, участники-пользователи (с ролями) и участники-компании
+    загружаются тремя запросами.
+    """
+    is_admin = bool(current_user.user_role and current_user.user_role.code == 'admin')
+    
+    projects_query = db.query(Project, User.full_name).outerjoin(
+        User, User.id == Project.created_by
+    ).options(
+        selectinload(Project.members).joinedload(ProjectMember.project_role),
+        selectinload(Project.participants).joinedload(ProjectParticipant.company)
+    ).filter(Project.is_deleted == 0)
+    
     # Админ видит все проекты, остальные только свои
-    if current_user.user_role and current_user.user_role.code == 'admin':
-        projects_query = db.query(Project).filter(Project.is_deleted == 0).order_by(Project.updated_at.desc())
-    else:
-        # Получаем проекты, где пользователь является участником
-        projects_query = db.query(Project).join(ProjectMember).filter(
-            ProjectMember.user_id == current_user.id,
-            Project.is_deleted == 0
-        ).order_by(Project.updated_at.desc())
+    if not is_admin:
+        projects_query = projects_query.filter(
+            Project.id.in_(
+                db.query(ProjectMember.project_id).filter(ProjectMember.user_id == current_user.id)
+            )
+        )
     
-    projects = projects_query.all()
     result = []
-    
-    for project in projects:
-        # Получаем участников проекта (пользователей)
-        members = db.query(ProjectMember).filter(ProjectMember.project_id == project.id).all()
-        members_data = [
-            {
+    for project, owner_name in projects_query.order_by(Project.updated_at.desc()).all():
+        members_data = []
+        current_user_member = None
+        for member in project.members:
+            if member.user_id == current_user.id and current_user_member is None:
+                current_user_member = member
+            members_data.append({
                 "id": member.id,
                 "user_id": member.user_id,
                 "project_role_id": member.project_role_id,
                 "joined_at": member.joined_at.isoformat() if member.joined_at else None
-            }
-            for member in members
-        ]
-        
-        # Получаем роль текущего пользователя в проекте
-        current_user_member = db.query(ProjectMember).filter(
-            ProjectMember.project_id == project.id, 
-            ProjectMember.user_id == current_user.id
-        ).first()
+            })
         
-        if current_user.user_role and current_user.user_role.code == 'admin':
+        if is_admin:
             user_role = 'admin'
         elif current_user_member and current_user_member.project_role:
             user_role = current_user_member.project_role.name
         else:
             user_role = 'member'
         
-        # Получаем участников проекта (компании) с контактами
-        participants = db.query(ProjectParticipant).filter(ProjectParticipant.project_id == project.id).all()
         participants_data = []
-        for participant in participants:
-            # Получаем данные компании
-            from app.models.references import Company
-            company = db.query(Company).filter(Company.id == participant.company_id).first()
-            
-            
+        for participant in project.participants:
+            company = participant.company
             participants_data.append({
                 "id": participant.id,
                 "company_id": participant.company_id,
                 "company": {
-                    "id": company.id if company else participant.company_id,
-                    "name": company.name if company else f"Company {participant.company_id}",
-                    "name_native": company.name_native if company else None,
+                    "id": company.id,
+                    "name": company.name,
+                    "name_native": company.name_native,
                 } if company else None,
                 "contact_id": participant.contact_id,
                 "company_role_id": participant.company_role_id,
@@ -195,7 +198,7 @@ async def get_projects(
             "end_date": project.end_date.isoformat() if project.end_date else None,
             "budget": project.budget,
             "owner_id": project.created_by,
-            "owner_name": (db.query(User).filter(User.id == project.created_by).first().full_name if project.created_by else None),
+            "owner_name": owner_name if project.created_by else None,
             "user_role": user_role,  # Роль текущего пользователя в проекте
             "members": members_data,
             "participants": participants_data,
@@ -244,9 +247,22 @@ async def create_project(
         workflow_preset_id=project_data.workflow_preset_id
     )
     
+    # Проверяем, что выбранный пресет существует и доступен (до создания проекта)
+    if project_data.workflow_preset_id:
+        from app.models.project import WorkflowPreset
+        
+        preset = db.query(WorkflowPreset).filter(
+            WorkflowPreset.id == project_data.workflow_preset_id,
+            (WorkflowPreset.is_global == True) | (WorkflowPreset.created_by == current_user.id)
+        ).first()
+        
+        if not preset:
+            raise HTTPException(status_code=400, detail="Выбранный пресет workflow не найден или недоступен")
+        # Проект закрепляется на текущей версии пресета
+        db_project.workflow_preset_version_id = preset.current_version_id
+    
     db.add(db_project)
-    db.commit()
-    db.refresh(db_project)
+    db.flush()
     
     # Добавляем создателя как участника проекта с ролью "manager"
     from app.models.project_role import ProjectRole
@@ -255,98 +271,22 @@ async def create_project(
         # Если нет роли manager, берем первую доступную
         manager_role = db.query(ProjectRole).filter(ProjectRole.is_active == True).first()
     
-    project_member = ProjectMember(
+    db.add(ProjectMember(
         project_id=db_project.id,
         user_id=current_user.id,
         project_role_id=manager_role.id if manager_role else None
-    )
-    db.add(project_member)
+    ))
+    db.flush()
     
-    # Добавляем типы документов для каждой дисциплины (дисциплины добавляются автоматически)
-    for discipline_id, document_type_data in project_data.discipline_document_types.items():
-        for item in document_type_data:
-            # Поддерживаем как старый формат (массив чисел), так и новый (массив объектов)
-            if isinstance(item, dict):
-                document_type_id = item.get('documentTypeId')
-                drs = item.get('drs')
-            else:
-                document_type_id = item
-                drs = None
-            
-                
-            project_discipline_document_type = ProjectDisciplineDocumentType(
-                project_id=db_project.id,
-                discipline_id=discipline_id,
-                document_type_id=document_type_id,
-                drs=drs
-            )
-            db.add(project_discipline_document_type)
-    
-    # Добавляем выбранные описания ревизий
-    from app.models.project import ProjectRevisionDescription
-    for revision_description_id in project_data.selected_revision_descriptions:
-        project_revision_description = ProjectRevisionDescription(
-            project_id=db_project.id,
-            revision_description_id=revision_description_id
-        )
-        db.add(project_revision_description)
-    
-    # Добавляем выбранные шаги ревизий
-    from app.models.project import ProjectRevisionStep
-    for revision_step_id in project_data.selected_revision_steps:
-        project_revision_step = ProjectRevisionStep(
-            project_id=db_project.id,
-            revision_step_id=revision_step_id
-        )
-        db.add(project_revision_step)
-    
-    # Проверяем, что выбранный пресет существует и доступен
-    if project_data.workflow_preset_id:
-        from app.models.project import WorkflowPreset
-        
-        preset = db.query(WorkflowPreset).filter(
-            WorkflowPreset.id == project_data.workflow_preset_id,
-            (WorkflowPreset.is_global == True) | (WorkflowPreset.created_by == current_user.id)
-        ).first()
-        
-        if not preset:
-            raise HTTPException(status_code=400, detail="Выбранный пресет workflow не найден или недоступен")
-    
-    # Добавляем участников-пользователей, если переданы
-    if project_data.members:
-        for member_data in project_data.members:
-            # Пропускаем создателя проекта, он уже добавлен
-            if member_data.user_id == current_user.id:
-                continue
-                
-            # Проверяем, что пользователь существует
-            user = db.query(User).filter(User.id == member_data.user_id).first()
-            if user:
-                project_member = ProjectMember(
-                    project_id=db_project.id,
-                    user_id=member_data.user_id,
-                    project_role_id=member_data.project_role_id
-                )
-                db.add(project_member)
-    
-    # Добавляем участников-компаний, если переданы
-    if project_data.participants:
-        for participant_data in project_data.participants:
-            # Проверяем, что компания существует
-            from app.models.references import Company
-            company = db.query(Company).filter(Company.id == participant_data.company_id).first()
-            if company:
-                project_participant = ProjectParticipant(
-                    project_id=db_project.id,
-                    company_id=participant_data.company_id,
-                    contact_id=participant_data.contact_id,
-                    company_role_id=participant_data.company_role_id,
-                    is_primary=participant_data.is_primary,
-                    notes=participant_data.notes
-                )
-                db.add(project_participant)
+    # Связи и участники — пакетными INSERT (дисциплины добавляются автоматически через типы документов)
+    sync_discipline_document_types(db, db_project.id, project_data.discipline_document_types)
+    sync_revision_descriptions(db, db_project.id, project_data.selected_revision_descriptions)
+    sync_revision_steps(db, db_project.id, project_data.selected_revision_steps)
+    sync_members(db, db_project.id, current_user.id, project_data.members)
+    sync_participants(db, db_project.id, project_data.participants)
     
     db.commit()
+    db.refresh(db_project)
     
     return {
         "id": db_project.id,
@@ -417,109 +357,45 @@ async def update_project(
 
     db.add(project)
 
-    # Обновляем дисциплины и типы, если пришли
-    # Дисциплины теперь управляются через project_discipline_document_types
-    # Нет необходимости в отдельной логике для дисциплин
-
+    # Связи и участники синхронизируются по разнице с текущими (удаляются только лишние,
+    # добавляются только новые); дисциплины управляются через project_discipline_document_types
     if project_data.discipline_document_types is not None:
-        # Удаляем старые
-        db.query(ProjectDisciplineDocumentType).filter(ProjectDisciplineDocumentType.project_id == project_id).delete()
-        # Добавляем новые
-        for discipline_id, document_type_data in project_data.discipline_document_types.items():
-            for item in document_type_data:
-                # Поддерживаем как старый формат (массив чисел), так и новый (массив объектов)
-                if isinstance(item, dict):
-                    document_type_id = item.get('documentTypeId')
-                    drs = item.get('drs')
-                else:
-                    document_type_id = item
-                    drs = None
-                
-                    
-                db.add(ProjectDisciplineDocumentType(
-                    project_id=project_id,
-                    discipline_id=int(discipline_id),
-                    document_type_id=int(document_type_id),
-                    drs=drs
-                ))
+        sync_discipline_document_types(db, project_id, project_data.discipline_document_types)
 
-    # Обновляем revision descriptions, если пришли
     if project_data.selected_revision_descriptions is not None:
-        # Удаляем старые
-        from app.models.project import ProjectRevisionDescription
-        db.query(ProjectRevisionDescription).filter(ProjectRevisionDescription.project_id == project_id).delete()
-        # Добавляем новые
-        for revision_description_id in project_data.selected_revision_descriptions:
-            db.add(ProjectRevisionDescription(
-                project_id=project_id,
-                revision_description_id=revision_description_id
-            ))
+        sync_revision_descriptions(db, project_id, project_data.selected_revision_descriptions)
 
-    # Обновляем revision steps, если пришли
     if project_data.selected_revision_steps is not None:
-        # Удаляем старые
-        from app.models.project import ProjectRevisionStep
-        db.query(ProjectRevisionStep).filter(ProjectRevisionStep.project_id == project_id).delete()
-        # Добавляем новые
-        for revision_step_id in project_data.selected_revision_steps:
-            db.add(ProjectRevisionStep(
-                project_id=project_id,
-                revision_step_id=revision_step_id
-            ))
-
-    # Обновляем workflow preset, если пришел
-    if project_data.workflow_preset_id is not None:
+        sync_revision_steps(db, project_id, project_data.selected_revision_steps)
+
+    # Обновляем workflow preset, если пришел: при смене пресета проект закрепляется на его текущей версии,
+    # повторная отправка того же пресета закрепленную версию не меняет
+    from app.models.project import WorkflowPreset, WorkflowPresetVersion
+    if project_data.workflow_preset_id is not None and (
+        project_data.workflow_preset_id != project.workflow_preset_id or project.workflow_preset_version_id is None
+    ):
         project.workflow_preset_id = project_data.workflow_preset_id
-
-    # Обновляем участников проекта (пользователей), если пришли
+        project.workflow_preset_version_id = db.query(WorkflowPreset.current_version_id).filter(
+            WorkflowPreset.id == project_data.workflow_preset_id
+        ).scalar()
+    if project_data.workflow_preset_version_id is not None:
+        version_preset_id = db.query(WorkflowPresetVersion.preset_id).filter(
+            WorkflowPresetVersion.id == project_data.workflow_preset_version_id
+        ).scalar()
+        if version_preset_id is None or version_preset_id != project.workflow_preset_id:
+            raise HTTPException(status_code=400, detail="Версия не относится к пресету workflow проекта")
+        project.workflow_preset_version_id = project_data.workflow_preset_version_id
+
+    # Участники-пользователи (создатель проекта не затрагивается) и участники-компании
     if project_data.members is not None:
-        # Удаляем всех текущих участников (кроме создателя проекта)
-        db.query(ProjectMember).filter(
-            ProjectMember.project_id == project_id,
-            ProjectMember.user_id != project.created_by
-        ).delete()
-        
-        # Добавляем новых участников
-        for member_data in project_data.members:
-            # Пропускаем создателя проекта, он уже есть
-            if member_data.user_id == project.created_by:
-                continue
-                
-            # Проверяем, что пользователь существует
-            user = db.query(User).filter(User.id == member_data.user_id).first()
-            if user:
-                # Добавляем участника с выбранной ролью
-                project_member = ProjectMember(
-                    project_id=project_id,
-                    user_id=member_data.user_id,
-                    project_role_id=member_data.project_role_id
-                )
-                db.add(project_member)
+        sync_members(db, project_id, project.created_by, project_data.members)
 
-    # Обновляем участников проекта (компании), если пришли
     if project_data.participants is not None:
-        # Удаляем всех текущих участников-компаний
-        db.query(ProjectParticipant).filter(
-            ProjectParticipant.project_id == project_id
-        ).delete()
-        
-        # Добавляем новых участников-компаний
-        for participant_data in project_data.participants:
-            # Проверяем, что компания существует
-            from app.models.references import Company
-            company = db.query(Company).filter(Company.id == participant_data.company_id).first()
-            if company:
-                # Добавляем участника-компанию с полными данными
-                project_participant = ProjectParticipant(
-                    project_id=project_id,
-                    company_id=participant_data.company_id,
-                    contact_id=participant_data.contact_id,
-                    company_role_id=participant_data.company_role_id,
-                    is_primary=participant_data.is_primary,
-                    notes=participant_data.notes
-                )
-                db.add(project_participant)
+        sync_participants(db, project_id, project_data.participants)
 
+    if project_data.members is not None:
+        invalidate_project_access(db, project_id)
+    invalidate_project_catalogue(db, project_id)
     db.commit()
     db.refresh(project)
 
@@ -538,38 +414,86 @@ async def update_project(
         "updated_at": project.updated_at.isoformat() if project.updated_at else None
     }
 
+class ProjectCloneConfig(BaseModel):
+    source_project_id: int  # Проект-источник (в том числе проект-шаблон)
+    sections: List[str] = list(CLONE_SECTIONS)
+    replace: bool = False  # True — заменить справочники проекта, False — добавить недостающие
+
+@router.post("/{project_id}/clone-config", response_model=dict)
+async def clone_project_configuration(
+    project_id: int,
+    clone_data: ProjectCloneConfig,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Копирование справочников (типы документов с DRS, описания и шаги ревизий, пресет workflow)
+    из другого проекта: INSERT ... SELECT на стороне БД, без передачи строк в приложение
+    """
+    unknown = set(clone_data.sections) - set(CLONE_SECTIONS)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Неизвестные разделы: {', '.join(sorted(unknown))}. Допустимые: {', '.join(CLONE_SECTIONS)}"
+        )
+    if clone_data.source_project_id == project_id:
+        raise HTTPException(status_code=400, detail="Проект-источник совпадает с целевым проектом")
+    
+    project = db.query(Project).filter(Project.id == project_id, Project.is_deleted == 0).first()
+    if not project:
+        raise HTTPException(status_code=404, detail="Проект не найден")
+    source = db.query(Project).filter(Project.id == clone_data.source_project_id, Project.is_deleted == 0).first()
+    if not source:
+        raise HTTPException(status_code=404, detail="Проект-источник не найден")
+    
+    # Изменять справочники — как в update_project; читать источник может админ или его участник
+    is_admin = current_user.user_role and current_user.user_role.code == 'admin'
+    if not is_admin:
+        if project.created_by != current_user.id:
+            raise HTTPException(status_code=403, detail="Только создатель проекта или админ могут редактировать проект")
+        check_project_access(source, current_user, db)
+    
+    # Пресет источника копируется, только если он доступен пользователю — как при создании проекта
+    sections = list(clone_data.sections)
+    skipped = {}
+    if "workflow_preset" in sections and source.workflow_preset_id:
+        from app.models.project import WorkflowPreset
+
+        preset_available = db.query(WorkflowPreset.id).filter(
+            WorkflowPreset.id == source.workflow_preset_id,
+            (WorkflowPreset.is_global == True) | (WorkflowPreset.created_by == current_user.id)
+        ).first() is not None
+        if not preset_available:
+            sections.remove("workflow_preset")
+            skipped["workflow_preset"] = "Пресет workflow проекта-источника не найден или недоступен"
+
+    copied = clone_project_config(db, source, project, sections, clone_data.replace)
+    invalidate_project_catalogue(db, project_id)
+    db.commit()
+
+    return {
+        "message": "Настройки проекта скопированы",
+        "project_id": project_id,
+        "source_project_id": source.id,
+        "copied": copied,
+        "skipped": skipped
+    }
+
 # Эндпоинты для управления участниками проекта
 
 def check_project_access(project: Project, current_user: User, db: Session, require_creator_or_admin: bool = False):
-    """Проверяет права доступа к проекту"""
+    """Проверяет права доступа к проекту (права участника берутся из кеша, см. project_access)"""
+    access = get_project_access(db, current_user.id, project.id)
     if require_creator_or_admin:
         # Для управления участниками: admin, создатель проекта или участники с ролью "manager" в проекте
         if current_user.user_role and current_user.user_role.code == 'admin':
             return  # Админ может все
         
-        # Проверяем, является ли пользователь создателем проекта
-        if project.created_by == current_user.id:
-            return  # Создатель проекта может все
-        
-        # Проверяем, является ли пользователь менеджером проекта
-        from app.models.project_role import ProjectRole
-        manager_role = db.query(ProjectRole).filter(ProjectRole.code == 'manager').first()
-        manager_member = db.query(ProjectMember).filter(
-            ProjectMember.project_id == project.id,
-            ProjectMember.user_id == current_user.id,
-            ProjectMember.project_role_id == manager_role.id if manager_role else None
-        ).first()
-        
-        if not manager_member:
+        if not access or not access.can_manage_members:
             raise HTTPException(status_code=403, detail="Только создатель проекта, менеджеры проекта или админ могут управлять участниками")
     else:
         # Для просмотра: любой участник проекта
-        current_member = db.query(ProjectMember).filter(
-            ProjectMember.project_id == project.id,
-            ProjectMember.user_id == current_user.id
-        ).first()
-        
-        if not current_member:
+        if not access or not access.is_member:
             raise HTTPException(status_code=403, detail="У вас нет доступа к этому проекту")
 
 class ProjectMemberCreate(BaseModel):
@@ -619,6 +543,7 @@ async def add_project_member(
     
     try:
         db.add(project_member)
+        invalidate_project_access(db, project_id, member_data.user_id)
         db.commit()
         db.refresh(project_member)
     except Exception as e:
@@ -723,6 +648,7 @@ async def update_project_member_role(
 
     # Обновляем роль участника
     member_to_update.project_role_id = member_data.project_role_id
+    invalidate_project_access(db, project_id, user_id)
     db.commit()
     db.refresh(member_to_update)
     
@@ -779,6 +705,7 @@ async def remove_project_member(
             raise HTTPException(status_code=400, detail="Нельзя удалить последнего менеджера проекта")
 
     db.delete(member_to_remove)
+    invalidate_project_access(db, project_id, user_id)
     db.commit()
     
     return {"message": "Участник удален из проекта"}
@@ -807,6 +734,29 @@ async def delete_project(
     return {"message": "Проект удален"}
 
 
+def _project_catalogue(project_id: int, db: Session, current_user: User) -> dict:
+    """Справочники проекта из кеша после проверки доступа"""
+    project = db.query(Project).filter(Project.id == project_id, Project.is_deleted == 0).first()
+    if not project:
+        raise HTTPException(status_code=404, detail="Проект не найден")
+    
+    check_project_access(project, current_user, db)
+    return project_catalogue_cache.get(db, project)
+
+
+@router.get("/{project_id}/catalogue", response_model=dict)
+async def get_project_catalogue(
+    project_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Все справочники проекта одним ответом: дисциплины, типы документов с DRS
+    (сгруппированы по дисциплинам), описания и шаги ревизий, последовательность пресета workflow
+    """
+    return _project_catalogue(project_id, db, current_user)
+
+
 @router.get("/{project_id}/disciplines", response_model=List[dict])
 async def get_project_disciplines(
     project_id: int,
@@ -814,34 +764,7 @@ async def get_project_disciplines(
     current_user: User = Depends(get_current_active_user)
 ):
     """Получение дисциплин проекта"""
-    project = db.query(Project).filter(Project.id == project_id, Project.is_deleted == 0).first()
-    if not project:
-        raise HTTPException(status_code=404, detail="Проект не найден")
-    
-    check_project_access(project, current_user, db)
-    
-    # Получаем дисциплины проекта через project_discipline_document_types
-    project_discipline_document_types = db.query(ProjectDisciplineDocumentType).filter(
-        ProjectDisciplineDocumentType.project_id == project_id
-    ).all()
-    
-    # Получаем уникальные дисциплины через JOIN
-    disciplines = db.query(Discipline).join(
-        ProjectDisciplineDocumentType,
-        Discipline.id == ProjectDisciplineDocumentType.discipline_id
-    ).filter(
-        ProjectDisciplineDocumentType.project_id == project_id
-    ).distinct().all()
-    
-    return [
-        {
-            "id": discipline.id,
-            "code": discipline.code,
-            "name": discipline.name,
-            "description": discipline.description
-        }
-        for discipline in disciplines
-    ]
+    return _project_catalogue(project_id, db, current_user)["disciplines"]
 
 
 @router.get("/{project_id}/document-types/{discipline_id}", response_model=List[dict])
@@ -852,35 +775,7 @@ async def get_project_document_types(
     current_user: User = Depends(get_current_active_user)
 ):
     """Получение типов документов для дисциплины в проекте"""
-    project = db.query(Project).filter(Project.id == project_id, Project.is_deleted == 0).first()
-    if not project:
-        raise HTTPException(status_code=404, detail="Проект не найден")
-    
-    check_project_access(project, current_user, db)
-    
-    # Получаем типы документов для дисциплины в проекте
-    # Используем JOIN вместо N+1 запросов
-    results = db.query(
-        DocumentType,
-        ProjectDisciplineDocumentType
-    ).join(
-        ProjectDisciplineDocumentType,
-        DocumentType.id == ProjectDisciplineDocumentType.document_type_id
-    ).filter(
-        ProjectDisciplineDocumentType.project_id == project_id,
-        ProjectDisciplineDocumentType.discipline_id == discipline_id
-    ).all()
-    
-    return [
-        {
-            "id": doc_type.id,
-            "code": doc_type.code,
-            "name": doc_type.name,
-            "description": doc_type.description,
-            "drs": pddt.drs  # Добавляем DRS из project_discipline_document_types
-        }
-        for doc_type, pddt in results
-    ]
+    return _project_catalogue(project_id, db, current_user)["document_types"].get(discipline_id, [])
 
 
 @router.get("/{project_id}/document-types", response_model=dict)
@@ -890,36 +785,7 @@ async def get_all_project_document_types(
     current_user: User = Depends(get_current_active_user)
 ):
     """Получение всех типов документов для проекта, сгруппированных по дисциплинам"""
-    project = db.query(Project).filter(Project.id == project_id, Project.is_deleted == 0).first()
-    if not project:
-        raise HTTPException(status_code=404, detail="Проект не найден")
-    
-    check_project_access(project, current_user, db)
-    
-    # Получаем все связи дисциплина-тип документа для проекта
-    project_discipline_document_types = db.query(ProjectDisciplineDocumentType).filter(
-        ProjectDisciplineDocumentType.project_id == project_id
-    ).all()
-    
-    # Группируем по дисциплинам
-    result = {}
-    for pddt in project_discipline_document_types:
-        doc_type = db.query(DocumentType).filter(DocumentType.id == pddt.document_type_id).first()
-        if doc_type:
-            discipline_id = pddt.discipline_id
-            if discipline_id not in result:
-                result[discipline_id] = []
-            
-            
-            result[discipline_id].append({
-                "id": doc_type.id,
-                "code": doc_type.code,
-                "name": doc_type.name,
-                "description": doc_type.description,
-                "drs": pddt.drs
-            })
-    
-    return result
+    return _project_catalogue(project_id, db, current_user)["document_types"]
 
 
 @router.get("/{project_id}/revision-descriptions", response_model=List[dict])
@@ -928,34 +794,8 @@ async def get_project_revision_descriptions(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Получение описаний ревизий проекта"""
-    project = db.query(Project).filter(Project.id == project_id, Project.is_deleted == 0).first()
-    if not project:
-        raise HTTPException(status_code=404, detail="Проект не найден")
-    
-    check_project_access(project, current_user, db)
-    
-    # Получаем описания ревизий проекта
-    from app.models.project import ProjectRevisionDescription
-    from app.models.references import RevisionDescription
-    
-    project_revision_descriptions = db.query(ProjectRevisionDescription).filter(
-        ProjectRevisionDescription.project_id == project_id
-    ).all()
-    
-    revision_descriptions = []
-    for prd in project_revision_descriptions:
-        rev_desc = db.query(RevisionDescription).filter(RevisionDescription.id == prd.revision_description_id).first()
-        if rev_desc:
-            revision_descriptions.append({
-                "id": rev_desc.id,
-                "code": rev_desc.code,
-                "description": rev_desc.description,
-                "description_native": rev_desc.description_native,
-                "phase": rev_desc.phase
-            })
-    
-    return revision_descriptions
+    """Получение выбранных описаний ревизий для проекта"""
+    return _project_catalogue(project_id, db, current_user)["revision_descriptions"]
 
 
 @router.get("/{project_id}/revision-steps", response_model=List[dict])
@@ -964,33 +804,8 @@ async def get_project_revision_steps(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Получение шагов ревизий проекта"""
-    project = db.query(Project).filter(Project.id == project_id, Project.is_deleted == 0).first()
-    if not project:
-        raise HTTPException(status_code=404, detail="Проект не найден")
-    
-    check_project_access(project, current_user, db)
-    
-    # Получаем шаги ревизий проекта
-    from app.models.project import ProjectRevisionStep
-    from app.models.references import RevisionStep
-    
-    project_revision_steps = db.query(ProjectRevisionStep).filter(
-        ProjectRevisionStep.project_id == project_id
-    ).all()
-    
-    revision_steps = []
-    for prs in project_revision_steps:
-        rev_step = db.query(RevisionStep).filter(RevisionStep.id == prs.revision_step_id).first()
-        if rev_step:
-            revision_steps.append({
-                "id": rev_step.id,
-                "code": rev_step.code,
-                "description": rev_step.description,
-                "description_native": rev_step.description_native
-            })
-    
-    return revision_steps
+    """Получение выбранных шагов ревизий для проекта"""
+    return _project_catalogue(project_id, db, current_user)["revision_steps"]
 
 
 @router.get("/{project_id}/workflow-preset/sequence", response_model=List[dict])
@@ -1000,47 +815,7 @@ async def get_workflow_preset_sequence(
     current_user: User = Depends(get_current_active_user)
 ):
     """Получение sequence пресета workflow для проекта"""
-    project = db.query(Project).filter(Project.id == project_id, Project.is_deleted == 0).first()
-    if not project:
-        raise HTTPException(status_code=404, detail="Проект не найден")
-    
-    check_project_access(project, current_user, db)
-    
-    if not project.workflow_preset_id:
-        return []
-    
-    # Получаем sequence пресета
-    from app.models.project import WorkflowPresetSequence
-    from app.models.references import RevisionStep, RevisionDescription
-    
-    sequence = db.query(WorkflowPresetSequence).filter(
-        WorkflowPresetSequence.preset_id == project.workflow_preset_id
-    ).order_by(WorkflowPresetSequence.sequence_order).all()
-    
-    result = []
-    for seq_item in sequence:
-        # Получаем данные шага и описания
-        revision_step = db.query(RevisionStep).filter(RevisionStep.id == seq_item.revision_step_id).first()
-        revision_description = db.query(RevisionDescription).filter(RevisionDescription.id == seq_item.revision_description_id).first()
-        
-        result.append({
-            "id": seq_item.id,
-            "order": seq_item.sequence_order,
-            "revision_step": {
-                "id": revision_step.id if revision_step else None,
-                "code": revision_step.code if revision_step else None,
-                "description": revision_step.description if revision_step else None,
-                "description_native": revision_step.description_native if revision_step else None
-            } if revision_step else None,
-            "revision_description": {
-                "id": revision_description.id if revision_description else None,
-                "code": revision_description.code if revision_description else None,
-                "description": revision_description.description if revision_description else None,
-                "description_native": revision_description.description_native if revision_description else None
-            } if revision_description else None
-        })
-    
-    return result
+    return _project_catalogue(project_id, db, current_user)["workflow_sequence"]
 
 
 # Workflow API endpoints - УДАЛЕНЫ
@@ -1048,83 +823,6 @@ async def get_workflow_preset_sequence(
 # Данные берутся из WorkflowPresetSequence и WorkflowPresetRule
 
 
-@router.get("/{project_id}/revision-descriptions", response_model=List[dict])
-async def get_project_revision_descriptions(
-    project_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
-):
-    """Получение выбранных описаний ревизий для проекта"""
-    project = db.query(Project).filter(Project.id == project_id, Project.is_deleted == 0).first()
-    if not project:
-        raise HTTPException(status_code=404, detail="Проект не найден")
-    
-    check_project_access(project, current_user, db)
-    
-    from app.models.project import ProjectRevisionDescription
-    from app.models.references import RevisionDescription
-    
-    # Получаем выбранные описания ревизий для проекта
-    project_revisions = db.query(ProjectRevisionDescription).filter(
-        ProjectRevisionDescription.project_id == project_id
-    ).all()
-    
-    revision_descriptions = []
-    for prd in project_revisions:
-        revision_desc = db.query(RevisionDescription).filter(
-            RevisionDescription.id == prd.revision_description_id
-        ).first()
-        if revision_desc:
-            revision_descriptions.append({
-                "id": revision_desc.id,
-                "code": revision_desc.code,
-                "description": revision_desc.description,
-                "description_native": revision_desc.description_native,
-                "is_active": revision_desc.is_active
-            })
-    
-    return revision_descriptions
-
-
-@router.get("/{project_id}/revision-steps", response_model=List[dict])
-async def get_project_revision_steps(
-    project_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
-):
-    """Получение выбранных шагов ревизий для проекта"""
-    project = db.query(Project).filter(Project.id == project_id, Project.is_deleted == 0).first()
-    if not project:
-        raise HTTPException(status_code=404, detail="Проект не найден")
-    
-    check_project_access(project, current_user, db)
-    
-    from app.models.project import ProjectRevisionStep
-    from app.models.references import RevisionStep
-    
-    # Получаем выбранные шаги ревизий для проекта
-    project_steps = db.query(ProjectRevisionStep).filter(
-        ProjectRevisionStep.project_id == project_id
-    ).all()
-    
-    revision_steps = []
-    for prs in project_steps:
-        revision_step = db.query(RevisionStep).filter(
-            RevisionStep.id == prs.revision_step_id
-        ).first()
-        if revision_step:
-            revision_steps.append({
-                "id": revision_step.id,
-                "code": revision_step.code,
-                "description": revision_step.description,
-                "description_native": revision_step.description_native,
-                "description_long": revision_step.description_long,
-                "is_active": revision_step.is_active
-            })
-    
-    return revision_steps
-
-
 @router.get("/{project_id}/workflow-preset", response_model=dict)
 async def get_project_workflow_preset(
     project_id: int,
@@ -1146,11 +844,19 @@ async def get_project_workflow_preset(
         ).first()
         
         if workflow_preset:
+            from app.models.project import WorkflowPresetVersion
+            version_number = db.query(WorkflowPresetVersion.version_number).filter(
+                WorkflowPresetVersion.id == project.workflow_preset_version_id
+            ).scalar() if project.workflow_preset_version_id else None
             return {
                 "id": workflow_preset.id,
                 "name": workflow_preset.name,
                 "description": workflow_preset.description,
-                "is_global": workflow_preset.is_global
+                "is_global": workflow_preset.is_global,
+                # Закрепленная версия; отличие от current_version_id — доступна более новая версия
+                "version_id": project.workflow_preset_version_id,
+                "version_number": version_number,
+                "current_version_id": workflow_preset.current_version_id
             }
     
     return {"id": None, "name": None, "description": None}
\ No newline at end of file
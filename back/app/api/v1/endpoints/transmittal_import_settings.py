@@ -13,6 +13,7 @@ from app.models.user import User
 from app.models.transmittal_import_settings import TransmittalImportSettings
 from app.models.project_participant import ProjectParticipant
 from app.services.auth import get_current_active_user
+from app.services.transmittal_import_profile import invalidate_import_profile
 
 router = APIRouter()
 
@@ -131,6 +132,7 @@ async def create_or_update_transmittal_import_settings(
         existing_setting.settings_value = json.dumps(settings_data.settings_value)
         db.commit()
         db.refresh(existing_setting)
+        invalidate_import_profile(existing_setting.project_id, existing_setting.company_id, current_user.id)
         
         # Получаем название компании
         participant = db.query(ProjectParticipant).filter(
@@ -160,6 +162,7 @@ async def create_or_update_transmittal_import_settings(
         db.add(new_setting)
         db.commit()
         db.refresh(new_setting)
+        invalidate_import_profile(new_setting.project_id, new_setting.company_id, current_user.id)
         
         # Получаем название компании
         participant = db.query(ProjectParticipant).filter(
@@ -199,6 +202,7 @@ async def update_transmittal_import_settings(
     setting.settings_value = json.dumps(settings_data.settings_value)
     db.commit()
     db.refresh(setting)
+    invalidate_import_profile(setting.project_id, setting.company_id, current_user.id)
     
     # Получаем название компании
     participant = db.query(ProjectParticipant).filter(
@@ -235,5 +239,6 @@ async def delete_transmittal_import_settings(
     
     db.delete(setting)
     db.commit()
+    invalidate_import_profile(setting.project_id, setting.company_id, current_user.id)
     
     return {"message": "Настройки удалены"}
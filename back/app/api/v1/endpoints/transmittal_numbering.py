@@ -0,0 +1,165 @@
+"""
+Transmittal numbering rules endpoints
+"""
+
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+from pydantic import BaseModel
+
+from app.core.database import get_db
+from app.models.user import User
+from app.models.project import Project
+from app.models.references import Company
+from app.models.transmittal_numbering import TransmittalNumberingRule
+from app.services.auth import get_current_active_user
+from app.services.project_access import get_project_access
+from app.services.transmittal_numbering import (
+    NumberingTemplateError, validate_template, preview_transmittal_number
+)
+
+router = APIRouter()
+
+class NumberingRuleCreate(BaseModel):
+    project_id: int
+    direction: Optional[str] = None  # 'out' | 'in' | None — любое
+    counterparty_id: Optional[int] = None
+    template: str
+    next_value: int = 1
+
+class NumberingRuleUpdate(BaseModel):
+    template: Optional[str] = None
+    next_value: Optional[int] = None
+
+def _validate_rule(direction: Optional[str], template: Optional[str], next_value: Optional[int]):
+    if direction not in (None, "out", "in"):
+        raise HTTPException(status_code=400, detail="Направление должно быть 'out' или 'in'")
+    if next_value is not None and next_value < 1:
+        raise HTTPException(status_code=400, detail="Следующий номер должен быть больше нуля")
+    if template is not None:
+        try:
+            validate_template(template)
+        except NumberingTemplateError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+def _is_admin(user: User) -> bool:
+    return bool(user.user_role and user.user_role.code == 'admin')
+
+def _check_can_view(db: Session, project_id: int, current_user: User):
+    """Правила и следующий номер видят участники проекта"""
+    if _is_admin(current_user):
+        return
+    access = get_project_access(db, current_user.id, project_id)
+    if not access or not access.is_member:
+        raise HTTPException(status_code=403, detail="У вас нет доступа к этому проекту")
+
+def _check_can_edit(db: Session, project_id: int, current_user: User):
+    """Менять нумерацию может тот, кто может редактировать проект (как update_project)"""
+    project = db.query(Project).filter(Project.id == project_id, Project.is_deleted == 0).first()
+    if not project:
+        raise HTTPException(status_code=404, detail="Проект не найден")
+    if not _is_admin(current_user) and project.created_by != current_user.id:
+        raise HTTPException(status_code=403, detail="Только создатель проекта или админ могут редактировать проект")
+
+def _get_rule(db: Session, rule_id: int, current_user: User) -> TransmittalNumberingRule:
+    rule = db.query(TransmittalNumberingRule).filter(TransmittalNumberingRule.id == rule_id).first()
+    if not rule:
+        raise HTTPException(status_code=404, detail="Правило нумерации не найдено")
+    _check_can_edit(db, rule.project_id, current_user)
+    return rule
+
+def _rule_to_dict(rule: TransmittalNumberingRule, counterparty_name: Optional[str] = None) -> dict:
+    return {
+        "id": rule.id,
+        "project_id": rule.project_id,
+        "direction": rule.direction,
+        "counterparty_id": rule.counterparty_id,
+        "counterparty_name": counterparty_name,
+        "template": rule.template,
+        "next_value": rule.next_value,
+        "created_at": rule.created_at,
+        "updated_at": rule.updated_at
+    }
+
+@router.get("/rules", response_model=List[dict])
+async def get_numbering_rules(
+    project_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Правила нумерации трансмитталов проекта"""
+    _check_can_view(db, project_id, current_user)
+    rows = db.query(TransmittalNumberingRule, Company.name).outerjoin(
+        Company, Company.id == TransmittalNumberingRule.counterparty_id
+    ).filter(
+        TransmittalNumberingRule.project_id == project_id
+    ).order_by(TransmittalNumberingRule.id).all()
+    return [_rule_to_dict(rule, counterparty_name) for rule, counterparty_name in rows]
+
+@router.post("/rules", response_model=dict)
+async def create_numbering_rule(
+    rule_data: NumberingRuleCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Создание правила нумерации (одно на сочетание проект/направление/контрагент)"""
+    _check_can_edit(db, rule_data.project_id, current_user)
+    _validate_rule(rule_data.direction, rule_data.template, rule_data.next_value)
+    rule = TransmittalNumberingRule(**rule_data.dict())
+    db.add(rule)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(
+            status_code=400,
+            detail="Правило нумерации для этого направления и контрагента уже существует"
+        )
+    db.refresh(rule)
+    return _rule_to_dict(rule)
+
+@router.put("/rules/{rule_id}", response_model=dict)
+async def update_numbering_rule(
+    rule_id: int,
+    rule_data: NumberingRuleUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Изменение шаблона или следующего номера правила"""
+    rule = _get_rule(db, rule_id, current_user)
+    _validate_rule(None, rule_data.template, rule_data.next_value)
+    if rule_data.template is not None:
+        rule.template = rule_data.template
+    if rule_data.next_value is not None:
+        rule.next_value = rule_data.next_value
+    db.commit()
+    db.refresh(rule)
+    return _rule_to_dict(rule)
+
+@router.delete("/rules/{rule_id}", response_model=dict)
+async def delete_numbering_rule(
+    rule_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Удаление правила нумерации"""
+    rule = _get_rule(db, rule_id, current_user)
+    db.delete(rule)
+    db.commit()
+    return {"message": "Правило нумерации удалено", "id": rule_id}
+
+@router.get("/next", response_model=dict)
+async def get_next_transmittal_number(
+    project_id: int,
+    direction: Optional[str] = None,
+    counterparty_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Предпросмотр следующего номера трансмиттала (номер не резервируется)"""
+    _check_can_view(db, project_id, current_user)
+    preview = preview_transmittal_number(db, project_id, direction, counterparty_id)
+    if preview is None:
+        raise HTTPException(status_code=404, detail="Нумерация трансмитталов для проекта не настроена")
+    return preview
@@ -2,23 +2,40 @@
 Transmittals endpoints
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+import os
+from datetime import date, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse
+from starlette.background import BackgroundTask
+from sqlalchemy import func, tuple_
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
-from typing import List
+from typing import List, Optional
 from pydantic import BaseModel
 
 from app.core.database import get_db
+from app.core.pagination import encode_cursor, decode_cursor, set_next_cursor
 from app.models.user import User
 from app.models.transmittal import Transmittal, TransmittalRevision
 from app.models.document import Document, DocumentRevision
-from app.models.references import RevisionStatus
+from app.models.references import RevisionStatus, TransmittalStatus, Company
 from app.services.auth import get_current_active_user
+from app.services.transmittal_revisions import find_missing_revision_ids, attach_revisions
+from app.services.transmittal_numbering import allocate_transmittal_number, NumberAllocationError
+from app.services.transmittal_status import (
+    SENT_STATUS, RECEIVED_STATUS, BULK_TRANSITION_MAX, TransmittalStatusError,
+    get_transmittal_status_id, bulk_transition
+)
+from app.services.transmittal_export import (
+    TransmittalExportError, XLSX_MEDIA_TYPE, PDF_MEDIA_TYPE,
+    export_transmittal_xlsx, export_transmittal_register_xlsx, export_transmittal_cover_pdf
+)
 
 router = APIRouter()
 
 class TransmittalCreate(BaseModel):
-    transmittal_number: str
+    transmittal_number: str | None = None  # Не указан — выделяется по правилу нумерации проекта
     title: str
     project_id: int
     # New unified fields
@@ -34,8 +51,23 @@ class TransmittalUpdate(BaseModel):
 class TransmittalRevisionAdd(BaseModel):
     revision_ids: List[int]
 
+class TransmittalBulkTransition(BaseModel):
+    transmittal_ids: List[int]
+
 class TransmittalRevisionRemove(BaseModel):
     revision_id: int
+
+def _ensure_revisions_exist(db: Session, revision_ids: List[int]):
+    """Проверяет существование всех ревизий одним запросом"""
+    missing = find_missing_revision_ids(db, revision_ids)
+    if len(missing) == 1:
+        raise HTTPException(status_code=400, detail=f"Ревизия с ID {missing[0]} не найдена")
+    if missing:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Ревизии с ID {', '.join(str(revision_id) for revision_id in missing)} не найдены"
+        )
+
 @router.delete("/{transmittal_id}", response_model=dict)
 async def delete_transmittal(
     transmittal_id: int,
@@ -54,21 +86,77 @@ async def delete_transmittal(
 
 @router.get("/", response_model=List[dict])
 async def get_transmittals(
+    response: Response,
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=5000),
     project_id: int = None,
+    direction: Optional[str] = None,
+    status: Optional[str] = None,
+    counterparty_id: Optional[int] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Получение списка трансмитталов"""
-    from sqlalchemy.orm import joinedload
+    """
+    Получение списка трансмитталов с количеством ревизий, суммарным размером файлов,
+    названием контрагента и именем создателя — одним сгруппированным запросом.
+    Фильтры: direction, status (имя статуса), counterparty_id, date_from/date_to (по transmittal_date, включительно).
+    Сортировка — новые первыми (по id). Пагинация: keyset по cursor (курсор следующей
+    страницы — в заголовке X-Next-Cursor) или, для совместимости, skip/limit.
+    """
+    revisions_count = func.count(TransmittalRevision.id)
+    total_file_size = func.coalesce(func.sum(DocumentRevision.file_size), 0)
     
-    query = db.query(Transmittal).options(joinedload(Transmittal.status)).filter(Transmittal.is_deleted == 0)
+    query = db.query(
+        Transmittal,
+        TransmittalStatus.name.label("status_name"),
+        Company.name.label("counterparty_name"),
+        User.full_name.label("created_by_name"),
+        revisions_count.label("revisions_count"),
+        total_file_size.label("total_file_size")
+    ).outerjoin(
+        TransmittalStatus, TransmittalStatus.id == Transmittal.status_id
+    ).outerjoin(
+        Company, Company.id == Transmittal.counterparty_id
+    ).outerjoin(
+        User, User.id == Transmittal.created_by
+    ).outerjoin(
+        TransmittalRevision, TransmittalRevision.transmittal_id == Transmittal.id
+    ).outerjoin(
+        DocumentRevision, DocumentRevision.id == TransmittalRevision.revision_id
+    ).filter(Transmittal.is_deleted == 0)
     
     if project_id:
         query = query.filter(Transmittal.project_id == project_id)
-    
-    transmittals = query.order_by(Transmittal.updated_at.desc()).offset(skip).limit(limit).all()
+    if direction:
+        query = query.filter(Transmittal.direction == direction)
+    if status:
+        query = query.filter(TransmittalStatus.name == status)
+    if counterparty_id:
+        query = query.filter(Transmittal.counterparty_id == counterparty_id)
+    if date_from:
+        query = query.filter(Transmittal.transmittal_date >= date_from)
+    if date_to:
+        query = query.filter(Transmittal.transmittal_date < date_to + timedelta(days=1))
+    if cursor:
+        # Ключ — неизменяемый id: правка трансмиттала между страницами не сдвигает строки
+        (last_id,) = decode_cursor(cursor, 1)
+        if not isinstance(last_id, int):
+            raise HTTPException(status_code=400, detail="Некорректный курсор пагинации")
+        query = query.filter(Transmittal.id < last_id)
+    
+    query = query.group_by(
+        Transmittal.id, TransmittalStatus.name, Company.name, User.full_name
+    ).order_by(Transmittal.id.desc())
+    if not cursor:
+        query = query.offset(skip)
+    rows = query.limit(limit).all()
+    
+    if len(rows) == limit:
+        last = rows[-1].Transmittal
+        set_next_cursor(response, encode_cursor(last.id))
     
     return [
         {
@@ -81,16 +169,53 @@ async def get_transmittals(
             # New unified fields
             "direction": transmittal.direction,
             "counterparty_id": transmittal.counterparty_id,
+            "counterparty_name": counterparty_name,
             "transmittal_date": transmittal.transmittal_date,
             "created_by": transmittal.created_by,
-            "status": transmittal.status.name if transmittal.status else "draft",
+            "created_by_name": created_by_name,
+            "status": status_name or "draft",
             "status_id": transmittal.status_id,
+            "revisions_count": revisions_count,
+            "total_file_size": int(total_file_size or 0),
             "created_at": transmittal.created_at,
             "updated_at": transmittal.updated_at
         }
-        for transmittal in transmittals
+        for transmittal, status_name, counterparty_name, created_by_name, revisions_count, total_file_size in rows
     ]
 
+def _export_response(export: dict, media_type: str, temporary: bool = True) -> FileResponse:
+    """Отдает файл экспорта частями; временный файл удаляется после отправки"""
+    return FileResponse(
+        export["path"],
+        media_type=media_type,
+        filename=export["filename"],
+        background=BackgroundTask(os.remove, export["path"]) if temporary else None
+    )
+
+@router.get("/register/export")
+async def export_transmittal_register(
+    project_id: int,
+    direction: Optional[str] = None,
+    status: Optional[str] = None,
+    counterparty_id: Optional[int] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Реестр трансмитталов проекта в XLSX (фильтры — как у списка трансмитталов).
+    Подписи колонок берутся из настроек экспорта для counterparty_id, если он указан.
+    """
+    try:
+        export = await run_in_threadpool(
+            export_transmittal_register_xlsx, db, project_id, current_user.id,
+            direction, status, counterparty_id, date_from, date_to
+        )
+    except TransmittalExportError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    return _export_response(export, XLSX_MEDIA_TYPE)
+
 @router.post("/", response_model=dict)
 async def create_transmittal(
     transmittal_data: TransmittalCreate,
@@ -99,9 +224,28 @@ async def create_transmittal(
 ):
     """Создание нового трансмиттала"""
     
-    # Используем переданный номер трансмиттала
+    # Все ревизии проверяются одним запросом до создания трансмиттала
+    _ensure_revisions_exist(db, transmittal_data.revision_ids)
+    
+    # Используем переданный номер трансмиттала или выделяем следующий по правилу нумерации
+    # (счетчик правила блокируется до коммита — параллельные создания не конфликтуют)
+    transmittal_number = (transmittal_data.transmittal_number or '').strip()
+    if not transmittal_number:
+        try:
+            transmittal_number = allocate_transmittal_number(
+                db, transmittal_data.project_id, transmittal_data.direction, transmittal_data.counterparty_id
+            )
+        except NumberAllocationError as e:
+            db.rollback()
+            raise HTTPException(status_code=409, detail=str(e))
+        if not transmittal_number:
+            raise HTTPException(
+                status_code=400,
+                detail="Не указан номер трансмиттала и для проекта не настроена нумерация"
+            )
+    
     db_transmittal = Transmittal(
-        transmittal_number=transmittal_data.transmittal_number,
+        transmittal_number=transmittal_number,
         title=transmittal_data.title,
         description=None,  # Убираем description
         project_id=transmittal_data.project_id,
@@ -116,6 +260,9 @@ async def create_transmittal(
     
     db.add(db_transmittal)
     try:
+        db.flush()
+        # Ревизии добавляются одним INSERT в той же транзакции, что и трансмиттал
+        attach_revisions(db, db_transmittal.id, transmittal_data.revision_ids)
         db.commit()
         db.refresh(db_transmittal)
     except IntegrityError as e:
@@ -124,7 +271,7 @@ async def create_transmittal(
             # Извлекаем номер трансмиттала из ошибки
             import re
             match = re.search(r'\(transmittal_number\)=\(([^)]+)\)', str(e.orig))
-            transmittal_number = match.group(1) if match else transmittal_data.transmittal_number
+            transmittal_number = match.group(1) if match else transmittal_number
             raise HTTPException(
                 status_code=400, 
                 detail=f"Трансмиттал с номером '{transmittal_number}' уже существует"
@@ -135,21 +282,6 @@ async def create_transmittal(
                 detail="Ошибка при создании трансмиттала"
             )
     
-    # Добавляем ревизии в трансмиттал
-    for revision_id in transmittal_data.revision_ids:
-        # Проверяем, что ревизия существует
-        revision = db.query(DocumentRevision).filter(DocumentRevision.id == revision_id).first()
-        if not revision:
-            raise HTTPException(status_code=400, detail=f"Ревизия с ID {revision_id} не найдена")
-        
-        transmittal_revision = TransmittalRevision(
-            transmittal_id=db_transmittal.id,
-            revision_id=revision_id
-        )
-        db.add(transmittal_revision)
-    
-    db.commit()
-    
     return {
         "id": db_transmittal.id,
         "transmittal_number": db_transmittal.transmittal_number,
@@ -280,6 +412,26 @@ async def get_transmittal(
         "revisions": result
     }
 
+@router.get("/{transmittal_id}/export")
+async def export_transmittal(
+    transmittal_id: int,
+    format: str = Query("xlsx", pattern="^(xlsx|pdf)$"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Экспорт трансмиттала по настройкам экспорта контрагента:
+    xlsx — лист трансмиттала со списком документов, pdf — титульный лист (кешируется по версии трансмиттала)
+    """
+    try:
+        if format == "pdf":
+            export = await run_in_threadpool(export_transmittal_cover_pdf, db, transmittal_id, current_user.id)
+            return _export_response(export, PDF_MEDIA_TYPE, temporary=False)
+        export = await run_in_threadpool(export_transmittal_xlsx, db, transmittal_id, current_user.id)
+    except TransmittalExportError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    return _export_response(export, XLSX_MEDIA_TYPE)
+
 @router.get("/{transmittal_id}/revisions", response_model=List[dict])
 async def get_transmittal_revisions(
     transmittal_id: int,
@@ -338,27 +490,10 @@ async def add_revisions_to_transmittal(
     if not transmittal:
         raise HTTPException(status_code=404, detail="Трансмиттал не найден")
     
-    added_revisions = []
-    for revision_id in revision_data.revision_ids:
-        # Проверяем, что ревизия существует
-        revision = db.query(DocumentRevision).filter(DocumentRevision.id == revision_id).first()
-        if not revision:
-            raise HTTPException(status_code=400, detail=f"Ревизия с ID {revision_id} не найдена")
-        
-        # Проверяем, что ревизия еще не добавлена в этот трансмиттал
-        existing = db.query(TransmittalRevision).filter(
-            TransmittalRevision.transmittal_id == transmittal_id,
-            TransmittalRevision.revision_id == revision_id
-        ).first()
-        
-        if not existing:
-            transmittal_revision = TransmittalRevision(
-                transmittal_id=transmittal_id,
-                revision_id=revision_id
-            )
-            db.add(transmittal_revision)
-            added_revisions.append(revision_id)
+    _ensure_revisions_exist(db, revision_data.revision_ids)
     
+    # Уже добавленные ревизии пропускаются (ON CONFLICT DO NOTHING)
+    added_revisions = attach_revisions(db, transmittal_id, revision_data.revision_ids)
     db.commit()
     
     return {
@@ -393,12 +528,25 @@ async def remove_revision_from_transmittal(
 
 @router.get("/documents/active-revisions", response_model=List[dict])
 async def get_active_revisions(
+    response: Response,
     project_id: int = None,
+    search: Optional[str] = None,
+    discipline_id: Optional[int] = None,
+    document_type_id: Optional[int] = None,
+    revision_description_id: Optional[int] = None,
+    exclude_transmittal_id: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1, le=5000),
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Получение активных ревизий документов для выбора в трансмиттал"""
-    from sqlalchemy import func, and_
+    """
+    Получение активных ревизий документов для выбора в трансмиттал.
+    search — поиск по номеру и названию документа; exclude_transmittal_id — без ревизий,
+    уже входящих в указанный трансмиттал. Без limit возвращается весь список;
+    с limit — страница, курсор следующей — в заголовке X-Next-Cursor.
+    """
+    from sqlalchemy import and_
     from app.models.references import RevisionDescription
     
     # Получаем статус "Active" (используем name вместо code)
@@ -413,14 +561,34 @@ async def get_active_revisions(
     if not active_status:
         return []
     
-    # Создаем подзапрос для получения последней ревизии каждого документа со статусом "active"
-    latest_revision_subquery = db.query(
-        DocumentRevision.document_id,
-        func.max(DocumentRevision.created_at).label('max_created_at')
+    # Последняя активная ревизия каждого документа (ROW_NUMBER), фильтры по документу —
+    # до ранжирования, чтобы не обходить ревизии всей базы
+    ranked_query = db.query(
+        DocumentRevision.id.label('revision_id'),
+        func.row_number().over(
+            partition_by=DocumentRevision.document_id,
+            order_by=(DocumentRevision.created_at.desc(), DocumentRevision.id.desc())
+        ).label('rn')
+    ).join(
+        Document,
+        Document.id == DocumentRevision.document_id
     ).filter(
         DocumentRevision.revision_status_id == active_status.id,
         DocumentRevision.is_deleted == 0
-    ).group_by(DocumentRevision.document_id).subquery()
+    )
+    
+    if project_id:
+        ranked_query = ranked_query.filter(Document.project_id == project_id)
+    if discipline_id:
+        ranked_query = ranked_query.filter(Document.discipline_id == discipline_id)
+    if document_type_id:
+        ranked_query = ranked_query.filter(Document.document_type_id == document_type_id)
+    if search and search.strip():
+        term = search.strip()
+        ranked_query = ranked_query.filter(
+            Document.number.icontains(term, autoescape=True) | Document.title.icontains(term, autoescape=True)
+        )
+    ranked = ranked_query.subquery()
     
     # Основной запрос с JOIN'ами для получения всех данных за один раз
     query = db.query(
@@ -428,28 +596,43 @@ async def get_active_revisions(
         Document,
         RevisionDescription
     ).join(
-        latest_revision_subquery,
-        and_(
-            DocumentRevision.document_id == latest_revision_subquery.c.document_id,
-            DocumentRevision.created_at == latest_revision_subquery.c.max_created_at
-        )
+        ranked,
+        and_(ranked.c.revision_id == DocumentRevision.id, ranked.c.rn == 1)
     ).join(
         Document,
         Document.id == DocumentRevision.document_id
     ).outerjoin(
         RevisionDescription,
         RevisionDescription.id == DocumentRevision.revision_description_id
-    ).filter(
-        DocumentRevision.revision_status_id == active_status.id,
-        DocumentRevision.is_deleted == 0
     )
     
-    if project_id:
-        query = query.filter(Document.project_id == project_id)
+    if revision_description_id:
+        query = query.filter(DocumentRevision.revision_description_id == revision_description_id)
+    if exclude_transmittal_id:
+        query = query.filter(~db.query(TransmittalRevision.id).filter(
+            TransmittalRevision.transmittal_id == exclude_transmittal_id,
+            TransmittalRevision.revision_id == DocumentRevision.id
+        ).exists())
+    
+    # Сортировка по номеру документа; id ревизии — для однозначного ключа keyset-пагинации
+    sort_number = func.coalesce(Document.number, '')
+    query = query.order_by(sort_number, DocumentRevision.id)
+    if cursor:
+        last_number, last_id = decode_cursor(cursor, 2)
+        # Типы ключа проверяются до сравнения в SQL: иначе некорректный курсор — ошибка БД (500)
+        if not isinstance(last_number, str) or not isinstance(last_id, int) or isinstance(last_id, bool):
+            raise HTTPException(status_code=400, detail="Некорректный курсор пагинации")
+        query = query.filter(tuple_(sort_number, DocumentRevision.id) > tuple_(last_number, last_id))
+    if limit:
+        query = query.limit(limit)
     
     # Выполняем запрос
     results = query.all()
     
+    if limit and len(results) == limit:
+        last_revision, last_document, _ = results[-1]
+        set_next_cursor(response, encode_cursor(last_document.number or '', last_revision.id))
+    
     # Формируем результат
     revisions_data = []
     for revision, document, revision_description in results:
@@ -470,6 +653,44 @@ async def get_active_revisions(
     return revisions_data
 
 
+def _bulk_transition(db: Session, transmittal_ids: List[int], target: str, user: User) -> dict:
+    if len(transmittal_ids) > BULK_TRANSITION_MAX:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Слишком много трансмитталов в одном запросе (максимум {BULK_TRANSITION_MAX})"
+        )
+    try:
+        report = bulk_transition(db, transmittal_ids, target, user)
+    except TransmittalStatusError as e:
+        raise HTTPException(status_code=500, detail=e.detail)
+    db.commit()
+    return report
+
+@router.post("/bulk/send", response_model=dict)
+async def bulk_send_transmittals(
+    data: TransmittalBulkTransition,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Массовая отправка трансмитталов одним запросом. Трансмитталы, которые нельзя отправить
+    (не найден, чужой, уже отправлен), пропускаются — причина указана в отчете по каждому id.
+    """
+    report = _bulk_transition(db, data.transmittal_ids, SENT_STATUS, current_user)
+    report["message"] = f"Отправлено трансмитталов: {report['updated']} из {report['requested']}"
+    return report
+
+@router.post("/bulk/receive", response_model=dict)
+async def bulk_receive_transmittals(
+    data: TransmittalBulkTransition,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Массовое получение трансмитталов одним запросом с отчетом по каждому id"""
+    report = _bulk_transition(db, data.transmittal_ids, RECEIVED_STATUS, current_user)
+    report["message"] = f"Получено трансмитталов: {report['updated']} из {report['requested']}"
+    return report
+
 @router.put("/{transmittal_id}/send")
 async def send_transmittal(
     transmittal_id: int,
@@ -487,14 +708,11 @@ async def send_transmittal(
     
     # Обновляем трансмиттал
     from datetime import datetime
-    from app.models.references import TransmittalStatus
-    
-    # Получаем статус "sent"
-    sent_status = db.query(TransmittalStatus).filter(TransmittalStatus.name == "Sent").first()
-    if not sent_status:
-        raise HTTPException(status_code=500, detail="Статус 'sent' не найден")
     
-    transmittal.status_id = sent_status.id
+    try:
+        transmittal.status_id = get_transmittal_status_id(db, SENT_STATUS)
+    except TransmittalStatusError as e:
+        raise HTTPException(status_code=500, detail=e.detail)
     # Новая модель дат/направления
     transmittal.direction = "out"
     transmittal.transmittal_date = datetime.utcnow()
@@ -519,14 +737,11 @@ async def receive_transmittal(
     
     # Обновляем трансмиттал
     from datetime import datetime
-    from app.models.references import TransmittalStatus
     
-    # Получаем статус "received"
-    received_status = db.query(TransmittalStatus).filter(TransmittalStatus.name == "received").first()
-    if not received_status:
-        raise HTTPException(status_code=500, detail="Статус 'received' не найден")
-    
-    transmittal.status_id = received_status.id
+    try:
+        transmittal.status_id = get_transmittal_status_id(db, RECEIVED_STATUS)
+    except TransmittalStatusError as e:
+        raise HTTPException(status_code=500, detail=e.detail)
     # Новая модель дат/направления
     transmittal.direction = "in"
     transmittal.transmittal_date = datetime.utcnow()
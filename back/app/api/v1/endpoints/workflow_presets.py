@@ -1,106 +1,45 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 from pydantic import BaseModel
 from datetime import datetime
 
 from app.core.database import get_db
-from app.models.project import WorkflowPreset, WorkflowPresetSequence, WorkflowPresetRule
-from app.models.references import RevisionDescription, RevisionStep, ReviewCode
+from app.models.project import (
+    Project, WorkflowPreset, WorkflowPresetSequence, WorkflowPresetRule, WorkflowPresetVersion
+)
 from app.models.user import User
 from app.services.auth import get_current_active_user
+from app.services.project_catalogue import invalidate_preset_catalogues
+from app.services.workflow_preset_versions import (
+    create_preset_version, diff_snapshots, get_snapshot, get_version_views, invalidate_current_version
+)
 
 router = APIRouter()
 
 
-def load_preset_data(preset_id: int, db: Session):
+def load_presets_data(presets: List[WorkflowPreset], db: Session) -> Dict[int, Tuple[List[dict], List[dict]]]:
+    """
+    Последовательности и правила текущих версий пресетов: из кеша версий,
+    промахи — фиксированным числом запросов независимо от количества пресетов и правил
+    """
+    views = get_version_views(db, [preset.current_version_id for preset in presets])
+    return {preset.id: views.get(preset.current_version_id, ([], [])) for preset in presets}
+
+
+def load_preset_data(preset: WorkflowPreset, db: Session):
     """Загружает данные пресета с последовательностями и правилами"""
-    # Загружаем последовательности
-    sequences = db.query(WorkflowPresetSequence).filter(
-        WorkflowPresetSequence.preset_id == preset_id
-    ).order_by(WorkflowPresetSequence.sequence_order).all()
-    
-    sequences_data = []
-    for seq in sequences:
-        rev_desc = db.query(RevisionDescription).filter(RevisionDescription.id == seq.revision_description_id).first()
-        rev_step = db.query(RevisionStep).filter(RevisionStep.id == seq.revision_step_id).first()
-        
-        sequences_data.append({
-            "id": seq.id,
-            "sequence_order": seq.sequence_order,
-            "revision_description_id": seq.revision_description_id,
-            "revision_step_id": seq.revision_step_id,
-            "revision_description": {
-                "id": rev_desc.id,
-                "code": rev_desc.code,
-                "description": rev_desc.description,
-                "description_native": rev_desc.description_native
-            } if rev_desc else None,
-            "revision_step": {
-                "id": rev_step.id,
-                "code": rev_step.code,
-                "description": rev_step.description,
-                "description_native": rev_step.description_native
-            } if rev_step else None,
-            "is_final": seq.is_final,
-            "requires_transmittal": seq.requires_transmittal
-        })
-    
-    # Загружаем правила
-    rules = db.query(WorkflowPresetRule).filter(
-        WorkflowPresetRule.preset_id == preset_id
-    ).all()
-    
-    rules_data = []
-    for rule in rules:
-        current_desc = db.query(RevisionDescription).filter(RevisionDescription.id == rule.current_revision_description_id).first()
-        current_step = db.query(RevisionStep).filter(RevisionStep.id == rule.current_revision_step_id).first()
-        next_desc = db.query(RevisionDescription).filter(RevisionDescription.id == rule.next_revision_description_id).first() if rule.next_revision_description_id else None
-        next_step = db.query(RevisionStep).filter(RevisionStep.id == rule.next_revision_step_id).first() if rule.next_revision_step_id else None
-        review_code = db.query(ReviewCode).filter(ReviewCode.id == rule.review_code_id).first()
-        
-        rules_data.append({
-            "id": rule.id,
-            "current_revision": {
-                "description": {
-                    "id": current_desc.id,
-                    "code": current_desc.code,
-                    "description": current_desc.description,
-                    "description_native": current_desc.description_native
-                } if current_desc else None,
-                "step": {
-                    "id": current_step.id,
-                    "code": current_step.code,
-                    "description": current_step.description,
-                    "description_native": current_step.description_native
-                } if current_step else None
-            },
-            "operator": rule.operator,
-            "review_code": {
-                "id": review_code.id,
-                "code": review_code.code,
-                "description": review_code.description,
-                "description_native": review_code.name_native
-            } if review_code else None,
-            "review_code_list": rule.review_code_list,
-            "priority": rule.priority,
-            "next_revision": {
-                "description": {
-                    "id": next_desc.id,
-                    "code": next_desc.code,
-                    "description": next_desc.description,
-                    "description_native": next_desc.description_native
-                } if next_desc else None,
-                "step": {
-                    "id": next_step.id,
-                    "code": next_step.code,
-                    "description": next_step.description,
-                    "description_native": next_step.description_native
-                } if next_step else None
-            } if rule.next_revision_description_id else None,
-        })
-    
-    return sequences_data, rules_data
+    return load_presets_data([preset], db)[preset.id]
+
+
+def get_accessible_preset(preset_id: int, db: Session, current_user: User) -> WorkflowPreset:
+    preset = db.query(WorkflowPreset).filter(WorkflowPreset.id == preset_id).first()
+    if not preset:
+        raise HTTPException(status_code=404, detail="Workflow пресет не найден")
+    if not preset.is_global and preset.created_by != current_user.id:
+        raise HTTPException(status_code=403, detail="Нет доступа к этому пресету")
+    return preset
 
 
 # Pydantic schemas
@@ -140,6 +79,7 @@ class WorkflowPresetResponse(BaseModel):
     created_by: Optional[int]
     created_at: str
     updated_at: str
+    current_version_id: Optional[int] = None
     sequences: List[dict] = []
     rules: List[dict] = []
 
@@ -158,10 +98,12 @@ async def get_workflow_presets(
         (WorkflowPreset.created_by == current_user.id)
     ).offset(skip).limit(limit).all()
     
+    # Последовательности и правила всех пресетов страницы — из кеша версий
+    presets_data = load_presets_data(presets, db)
+    
     result = []
     for preset in presets:
-        # Загружаем данные пресета
-        sequences_data, rules_data = load_preset_data(preset.id, db)
+        sequences_data, rules_data = presets_data[preset.id]
         
         result.append(WorkflowPresetResponse(
             id=preset.id,
@@ -171,6 +113,7 @@ async def get_workflow_presets(
             created_by=preset.created_by,
             created_at=preset.created_at.isoformat() if preset.created_at else "",
             updated_at=preset.updated_at.isoformat() if preset.updated_at else "",
+            current_version_id=preset.current_version_id,
             sequences=sequences_data,
             rules=rules_data
         ))
@@ -194,7 +137,7 @@ async def get_workflow_preset(
         raise HTTPException(status_code=403, detail="Нет доступа к этому пресету")
     
     # Загружаем данные пресета
-    sequences_data, rules_data = load_preset_data(preset.id, db)
+    sequences_data, rules_data = load_preset_data(preset, db)
     
     # Преобразуем даты в строки для корректного ответа
     return WorkflowPresetResponse(
@@ -205,11 +148,87 @@ async def get_workflow_preset(
         created_by=preset.created_by,
         created_at=preset.created_at.isoformat() if preset.created_at else "",
         updated_at=preset.updated_at.isoformat() if preset.updated_at else "",
+        current_version_id=preset.current_version_id,
         sequences=sequences_data,
         rules=rules_data
     )
 
 
+def _version_info(version: WorkflowPresetVersion, preset: WorkflowPreset) -> dict:
+    return {
+        "id": version.id,
+        "preset_id": version.preset_id,
+        "version_number": version.version_number,
+        "created_by": version.created_by,
+        "created_at": version.created_at.isoformat() if version.created_at else "",
+        "is_current": version.id == preset.current_version_id
+    }
+
+
+@router.get("/{preset_id}/versions", response_model=List[dict])
+async def get_workflow_preset_versions(
+    preset_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Версии пресета (новые первыми) с числом закрепленных за каждой проектов"""
+    preset = get_accessible_preset(preset_id, db, current_user)
+    rows = db.query(WorkflowPresetVersion, func.count(Project.id)).outerjoin(
+        Project, (Project.workflow_preset_version_id == WorkflowPresetVersion.id) & (Project.is_deleted == 0)
+    ).filter(
+        WorkflowPresetVersion.preset_id == preset.id
+    ).group_by(WorkflowPresetVersion.id).order_by(WorkflowPresetVersion.version_number.desc()).all()
+    return [{**_version_info(version, preset), "projects_count": projects_count} for version, projects_count in rows]
+
+
+@router.get("/{preset_id}/versions/diff", response_model=dict)
+async def diff_workflow_preset_versions(
+    preset_id: int,
+    from_version_id: Optional[int] = None,
+    to_version_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Различия двух версий пресета. По умолчанию to — текущая версия,
+    from — предыдущая перед ней.
+    """
+    preset = get_accessible_preset(preset_id, db, current_user)
+    to_snapshot = get_snapshot(db, to_version_id or preset.current_version_id)
+    if to_snapshot is None or to_snapshot.preset_id != preset.id:
+        raise HTTPException(status_code=404, detail="Версия пресета не найдена")
+    if from_version_id is None:
+        from_version_id = db.query(WorkflowPresetVersion.id).filter(
+            WorkflowPresetVersion.preset_id == preset.id,
+            WorkflowPresetVersion.version_number < to_snapshot.version_number
+        ).order_by(WorkflowPresetVersion.version_number.desc()).limit(1).scalar()
+        if from_version_id is None:
+            raise HTTPException(status_code=400, detail="Нет предыдущей версии для сравнения")
+    from_snapshot = get_snapshot(db, from_version_id)
+    if from_snapshot is None or from_snapshot.preset_id != preset.id:
+        raise HTTPException(status_code=404, detail="Версия пресета не найдена")
+    return diff_snapshots(from_snapshot, to_snapshot)
+
+
+@router.get("/{preset_id}/versions/{version_id}", response_model=dict)
+async def get_workflow_preset_version(
+    preset_id: int,
+    version_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Последовательность и правила версии пресета (из кеша версий)"""
+    preset = get_accessible_preset(preset_id, db, current_user)
+    version = db.query(WorkflowPresetVersion).filter(
+        WorkflowPresetVersion.id == version_id,
+        WorkflowPresetVersion.preset_id == preset.id
+    ).first()
+    if not version:
+        raise HTTPException(status_code=404, detail="Версия пресета не найдена")
+    sequences_data, rules_data = get_version_views(db, [version.id])[version.id]
+    return {**_version_info(version, preset), "sequences": sequences_data, "rules": rules_data}
+
+
 @router.post("/", response_model=WorkflowPresetResponse)
 async def create_workflow_preset(
     preset_data: WorkflowPresetCreate,
@@ -271,10 +290,13 @@ async def create_workflow_preset(
         )
         db.add(rule)
     
+    # Версия 1 — снимок последовательности и правил
+    db.flush()
+    create_preset_version(db, preset, current_user.id)
     db.commit()
     
     # Загружаем данные пресета
-    sequences_data, rules_data = load_preset_data(preset.id, db)
+    sequences_data, rules_data = load_preset_data(preset, db)
     
     # Преобразуем даты в строки для корректного ответа
     return WorkflowPresetResponse(
@@ -285,6 +307,7 @@ async def create_workflow_preset(
         created_by=preset.created_by,
         created_at=preset.created_at.isoformat() if preset.created_at else "",
         updated_at=preset.updated_at.isoformat() if preset.updated_at else "",
+        current_version_id=preset.current_version_id,
         sequences=sequences_data,
         rules=rules_data
     )
@@ -352,11 +375,16 @@ async def update_workflow_preset(
             )
             db.add(rule)
     
+    if preset_data.sequences is not None or preset_data.rules is not None:
+        # Новая неизменяемая версия; проекты остаются на закрепленных версиях до явной смены
+        db.flush()
+        create_preset_version(db, preset, current_user.id)
+    invalidate_preset_catalogues(db, preset.id)
     db.commit()
     db.refresh(preset)
     
     # Загружаем данные пресета
-    sequences_data, rules_data = load_preset_data(preset.id, db)
+    sequences_data, rules_data = load_preset_data(preset, db)
     
     # Преобразуем даты в строки для корректного ответа
     return WorkflowPresetResponse(
@@ -367,6 +395,7 @@ async def update_workflow_preset(
         created_by=preset.created_by,
         created_at=preset.created_at.isoformat() if preset.created_at else "",
         updated_at=preset.updated_at.isoformat() if preset.updated_at else "",
+        current_version_id=preset.current_version_id,
         sequences=sequences_data,
         rules=rules_data
     )
@@ -391,6 +420,8 @@ async def delete_workflow_preset(
     db.query(WorkflowPresetSequence).filter(WorkflowPresetSequence.preset_id == preset.id).delete()
     db.query(WorkflowPresetRule).filter(WorkflowPresetRule.preset_id == preset.id).delete()
     db.delete(preset)
+    invalidate_current_version(db, preset_id)
+    invalidate_preset_catalogues(db, preset_id)
     db.commit()
     
     return {"message": "Workflow пресет удален"}
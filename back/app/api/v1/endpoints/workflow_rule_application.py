@@ -4,13 +4,17 @@ API endpoints для применения правил workflow
 
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from pydantic import BaseModel
 
 from app.core.database import get_db
-from app.models.project import WorkflowPresetRule
+from app.models.document import Document, DocumentRevision
+from app.models.project import Project, WorkflowPresetRule
 from app.models.references import RevisionDescription, RevisionStep, ReviewCode
-from app.services.workflow_rule_processor import WorkflowRuleProcessor
+from app.services.project_access import get_project_access
+from app.services.workflow_preset_versions import get_current_version_id, get_snapshot
+from app.services.workflow_rule_processor import get_decision_table
+from app.services.workflow_batch import BATCH_APPLY_MAX, apply_rules_batch
 from app.services.auth import get_current_active_user
 from app.models.user import User
 
@@ -23,6 +27,24 @@ class WorkflowRuleApplicationRequest(BaseModel):
     current_revision_description_id: int
     current_revision_step_id: int
     review_code_id: int
+    document_type_id: Optional[int] = None  # Без типа документа рассматриваются все правила ревизии
+    version_id: Optional[int] = None  # Версия пресета; по умолчанию закрепленная за проектом или текущая
+    project_id: Optional[int] = None  # Проект, чья закрепленная версия пресета применяется
+    revision_id: Optional[int] = None  # Или ревизия документа проекта (как в пакетном применении)
+
+
+class WorkflowRuleBatchItem(BaseModel):
+    """Строка пакета: ревизия и код проверки (id или код строкой, как в листе ответа)"""
+    revision_id: int
+    review_code_id: Optional[int] = None
+    review_code: Optional[str] = None
+
+
+class WorkflowRuleBatchRequest(BaseModel):
+    """Пакетное применение правил; create_revisions — сразу создать следующие ревизии"""
+    items: List[WorkflowRuleBatchItem]
+    create_revisions: bool = False
+    change_description: Optional[str] = None
 
 
 class WorkflowRuleApplicationResponse(BaseModel):
@@ -33,6 +55,42 @@ class WorkflowRuleApplicationResponse(BaseModel):
     message: str
 
 
+def _pinned_version_id(db: Session, request: WorkflowRuleApplicationRequest, current_user: User) -> Optional[int]:
+    """
+    Закрепленная версия пресета проекта (по project_id или revision_id), как в пакетном
+    применении; None — проект не задан или не закреплен на версии
+    """
+    if request.revision_id is not None:
+        project_id = db.query(Document.project_id).join(
+            DocumentRevision, DocumentRevision.document_id == Document.id
+        ).filter(
+            DocumentRevision.id == request.revision_id,
+            DocumentRevision.is_deleted == 0,
+            Document.is_deleted == 0
+        ).scalar()
+        if project_id is None:
+            raise HTTPException(status_code=404, detail="Ревизия не найдена")
+        if request.project_id is not None and request.project_id != project_id:
+            raise HTTPException(status_code=400, detail="Ревизия не относится к указанному проекту")
+    elif request.project_id is not None:
+        project_id = request.project_id
+    else:
+        return None
+
+    project = db.query(Project.workflow_preset_id, Project.workflow_preset_version_id).filter(
+        Project.id == project_id
+    ).first()
+    if project is None:
+        raise HTTPException(status_code=404, detail="Проект не найден")
+    if not current_user.is_admin:
+        access = get_project_access(db, current_user.id, project_id)
+        if access is None or not (access.is_owner or access.is_member):
+            raise HTTPException(status_code=403, detail="Нет доступа к проекту")
+    if project.workflow_preset_id != request.preset_id:
+        raise HTTPException(status_code=400, detail="Пресет не совпадает с пресетом проекта")
+    return project.workflow_preset_version_id
+
+
 @router.post("/apply-rule", response_model=WorkflowRuleApplicationResponse)
 async def apply_workflow_rule(
     request: WorkflowRuleApplicationRequest,
@@ -50,25 +108,32 @@ async def apply_workflow_rule(
     Returns:
         WorkflowRuleApplicationResponse: Результат применения правила
     """
+    if request.version_id is not None:
+        snapshot = get_snapshot(db, request.version_id)
+        if snapshot is None or snapshot.preset_id != request.preset_id:
+            raise HTTPException(status_code=404, detail="Версия пресета не найдена")
+    
+    # Явная версия, иначе закрепленная за проектом, иначе текущая — как в пакетном применении
+    version_id = request.version_id or _pinned_version_id(db, request, current_user)
+    
     try:
-        # Получаем все правила пресета, отсортированные по приоритету
-        rules = db.query(WorkflowPresetRule).filter(
-            WorkflowPresetRule.preset_id == request.preset_id
-        ).order_by(WorkflowPresetRule.priority.asc()).all()
+        # Скомпилированные правила версии из кеша процесса: поиск без запросов к БД
+        table = get_decision_table(
+            db, version_id or get_current_version_id(db, request.preset_id)
+        )
         
-        if not rules:
+        if table.is_empty:
             return WorkflowRuleApplicationResponse(
                 rule_matched=False,
                 message="Правила для данного пресета не найдены"
             )
         
         # Ищем применимое правило
-        applicable_rule = WorkflowRuleProcessor.find_applicable_rule(
-            rules,
+        applicable_rule = table.find_rule(
             request.current_revision_description_id,
             request.current_revision_step_id,
             request.review_code_id,
-            db
+            request.document_type_id
         )
         
         if not applicable_rule:
@@ -77,17 +142,9 @@ async def apply_workflow_rule(
                 message="Подходящее правило не найдено"
             )
         
-        # Определяем следующую ревизию
-        next_revision = WorkflowRuleProcessor.get_next_revision(
-            applicable_rule,
-            request.current_revision_description_id,
-            request.current_revision_step_id,
-            db
-        )
-        
         return WorkflowRuleApplicationResponse(
             rule_matched=True,
-            next_revision=next_revision,
+            next_revision=table.next_revision(applicable_rule),
             rule_id=applicable_rule.id,
             message="Правило успешно применено"
         )
@@ -96,6 +153,37 @@ async def apply_workflow_rule(
         raise HTTPException(status_code=500, detail=f"Ошибка при применении правила: {str(e)}")
 
 
+@router.post("/apply-rules/batch", response_model=dict)
+async def apply_workflow_rules_batch(
+    request: WorkflowRuleBatchRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Применяет правила workflow к списку ревизий одним запросом (например, ко всем строкам
+    ответа по трансмитталу). Пресет и текущая ревизия каждой строки определяются по проекту
+    документа; строки, которые нельзя обработать, попадают в отчет с причиной.
+    """
+    if len(request.items) > BATCH_APPLY_MAX:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Слишком много строк в одном запросе (максимум {BATCH_APPLY_MAX})"
+        )
+    report = apply_rules_batch(
+        db, request.items, current_user,
+        create_revisions=request.create_revisions,
+        change_description=request.change_description
+    )
+    if request.create_revisions:
+        db.commit()
+    created = report["summary"].get("created", 0)
+    report["message"] = (
+        f"Создано ревизий: {created} из {report['requested']}" if request.create_revisions
+        else f"Правило найдено: {report['summary'].get('matched', 0)} из {report['requested']}"
+    )
+    return report
+
+
 @router.get("/presets/{preset_id}/rules", response_model=list)
 async def get_preset_rules(
     preset_id: int,
@@ -118,24 +206,33 @@ async def get_preset_rules(
             WorkflowPresetRule.preset_id == preset_id
         ).order_by(WorkflowPresetRule.priority.asc()).all()
         
+        # Справочники всех правил — по одному запросу на таблицу
+        description_ids = {rule.current_revision_description_id for rule in rules} | {
+            rule.next_revision_description_id for rule in rules if rule.next_revision_description_id
+        }
+        step_ids = {rule.current_revision_step_id for rule in rules} | {
+            rule.next_revision_step_id for rule in rules if rule.next_revision_step_id
+        }
+        review_code_ids = {rule.review_code_id for rule in rules if rule.review_code_id}
+        descriptions = {
+            item.id: item for item in db.query(RevisionDescription).filter(
+                RevisionDescription.id.in_(description_ids)
+            ).all()
+        } if description_ids else {}
+        steps = {
+            item.id: item for item in db.query(RevisionStep).filter(RevisionStep.id.in_(step_ids)).all()
+        } if step_ids else {}
+        review_codes = {
+            item.id: item for item in db.query(ReviewCode).filter(ReviewCode.id.in_(review_code_ids)).all()
+        } if review_code_ids else {}
+        
         result = []
         for rule in rules:
-            # Получаем связанные данные
-            current_desc = db.query(RevisionDescription).filter(
-                RevisionDescription.id == rule.current_revision_description_id
-            ).first()
-            current_step = db.query(RevisionStep).filter(
-                RevisionStep.id == rule.current_revision_step_id
-            ).first()
-            review_code = db.query(ReviewCode).filter(
-                ReviewCode.id == rule.review_code_id
-            ).first()
-            next_desc = db.query(RevisionDescription).filter(
-                RevisionDescription.id == rule.next_revision_description_id
-            ).first() if rule.next_revision_description_id else None
-            next_step = db.query(RevisionStep).filter(
-                RevisionStep.id == rule.next_revision_step_id
-            ).first() if rule.next_revision_step_id else None
+            current_desc = descriptions.get(rule.current_revision_description_id)
+            current_step = steps.get(rule.current_revision_step_id)
+            review_code = review_codes.get(rule.review_code_id)
+            next_desc = descriptions.get(rule.next_revision_description_id)
+            next_step = steps.get(rule.next_revision_step_id)
             
             result.append({
                 "id": rule.id,
@@ -170,8 +267,7 @@ async def get_preset_rules(
                         "code": next_step.code,
                         "description": next_step.description
                     } if next_step else None
-                } if rule.next_revision_description_id else None,
-                "action_on_fail": rule.action_on_fail
+                } if rule.next_revision_description_id else None
             })
         
         return result
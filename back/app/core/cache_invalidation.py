@@ -0,0 +1,100 @@
+"""
+Сброс кешей процессов API через Postgres LISTEN/NOTIFY: изменивший данные процесс
+публикует уведомление в транзакции, остальные получают его после commit и сбрасывают свои записи
+"""
+
+import logging
+import select
+import threading
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.database import engine
+
+logger = logging.getLogger(__name__)
+
+# Канал -> (обработчик payload, сброс кеша целиком после переподключения)
+_handlers: Dict[str, tuple] = {}
+
+
+def register_channel(channel: str, handler: Callable[[str], None], reset: Callable[[], None]):
+    """Регистрирует обработчик канала; вызывается при импорте модуля кеша, до старта слушателя"""
+    _handlers[channel] = (handler, reset)
+
+
+def publish(db: Session, channel: str, payload: str):
+    """NOTIFY в текущей транзакции (доставляется после commit); вне Postgres — ничего не делает"""
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": channel, "payload": payload})
+
+
+class InvalidationListener:
+    """
+    Фоновый поток процесса API: LISTEN на отдельном соединении. После переподключения
+    кеши очищаются целиком — уведомления за время разрыва могли быть пропущены.
+    """
+
+    def __init__(self, poll_interval: float = 5.0, reconnect_delay: float = 5.0):
+        self.poll_interval = poll_interval
+        self.reconnect_delay = reconnect_delay
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if engine.dialect.name != "postgresql" or self._thread is not None or not _handlers:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="cache-invalidation-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_interval + 1)
+            self._thread = None
+
+    def _dispatch(self, channel: str, payload: str):
+        handler = _handlers.get(channel)
+        if handler is None:
+            return
+        try:
+            handler[0](payload)
+        except Exception:
+            logger.exception("Ошибка обработки уведомления %s: %r", channel, payload)
+
+    def _run(self):
+        while not self._stop.is_set():
+            connection = None
+            try:
+                connection = engine.raw_connection()
+                dbapi_connection = connection.dbapi_connection
+                dbapi_connection.autocommit = True
+                with dbapi_connection.cursor() as cursor:
+                    for channel in _handlers:
+                        cursor.execute(f"LISTEN {channel}")
+                for _, reset in _handlers.values():
+                    reset()
+                while not self._stop.is_set():
+                    ready, _, _ = select.select([dbapi_connection], [], [], self.poll_interval)
+                    if not ready:
+                        continue
+                    dbapi_connection.poll()
+                    while dbapi_connection.notifies:
+                        notify = dbapi_connection.notifies.pop(0)
+                        self._dispatch(notify.channel, notify.payload)
+            except Exception:
+                logger.exception("Ошибка подписки на сброс кешей, переподключение")
+                self._stop.wait(self.reconnect_delay)
+            finally:
+                if connection is not None:
+                    try:
+                        # Соединение в режиме autocommit с LISTEN не возвращается в пул
+                        connection.invalidate()
+                    except Exception:
+                        pass
+
+
+invalidation_listener = InvalidationListener()
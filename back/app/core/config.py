@@ -31,7 +31,35 @@ class Settings(BaseSettings):
     UPLOAD_DIR: str = "uploads"
     MAX_FILE_SIZE: int = 52428800  # 50MB
     ALLOWED_FILE_TYPES: str = "pdf,doc,docx,xls,xlsx,ppt,pptx,txt,jpg,jpeg,png,gif"
-    
+
+    # Document import (import-by-paths)
+    IMPORT_BATCH_SIZE: int = 500  # Кол-во строк манифеста в одной транзакции
+    IMPORT_COPY_WORKERS: int = 8  # Потоки копирования файлов
+    IMPORT_INGEST_MODE: str = "auto"  # auto (reflink -> hardlink -> копирование) | reflink | copy
+    IMPORT_ROOT: str = ""  # Каталог, из которого разрешен импорт по путям (пусто — импорт по путям отключен)
+    TRANSMITTAL_IMPORT_PROFILE_TTL: int = 600  # Секунды жизни скомпилированного профиля импорта в кеше
+    EXCEL_READER_BACKEND: str = "auto"  # auto (calamine, если установлен) | openpyxl | calamine
+    TRANSMITTAL_BATCH_PARSE_WORKERS: int = 4  # Процессы разбора листов пакетного импорта
+    TRANSMITTAL_BATCH_MAX_FILES: int = 200  # Максимум книг/листов в одном пакете
+    TRANSMITTAL_BATCH_MAX_UNCOMPRESSED_MB: int = 1024  # Лимит суммарного распакованного размера книг ZIP-пакета
+    TRANSMITTAL_PREVIEW_DIR: str = "previews"  # Книги и разобранные листы предпросмотра импорта, общие для процессов API и воркеров (не раздается как static)
+    TRANSMITTAL_PREVIEW_CACHE_TTL: int = 900  # Секунды хранения книги предпросмотра с последнего обращения
+    TRANSMITTAL_PREVIEW_CACHE_MAX_MB: int = 256  # Лимит памяти кеша разобранных листов (на процесс)
+    PROJECT_ACCESS_CACHE_TTL: int = 60  # Секунды жизни прав пользователя в проекте в кеше процесса
+    PROJECT_ACCESS_CACHE_MAX_ENTRIES: int = 10000
+    PROJECT_CATALOGUE_CACHE_TTL: int = 300  # Секунды жизни справочников проекта в кеше процесса API
+    WORKFLOW_RULES_CACHE_TTL: int = 600  # Секунды жизни правил и представлений версий пресета (подписи справочников)
+    WORKFLOW_PRESET_VERSION_CACHE_MAX_ENTRIES: int = 512  # Версий пресетов в кеше процесса API
+    EXPORT_CACHE_DIR: str = "exports"  # Кеш титульных листов PDF (не раздается как static)
+
+    # Background jobs
+    JOBS_DIR: str = "jobs"  # Входные файлы и результаты задач (не раздается как static)
+    JOB_WORKER_PROCESSES: int = 2
+    JOB_POLL_INTERVAL: float = 1.0  # Секунды между опросами очереди
+    JOB_HEARTBEAT_INTERVAL: int = 15
+    JOB_STALE_SECONDS: int = 300  # Задача без heartbeat дольше — возвращается в очередь (или завершается ошибкой)
+    JOB_MAX_ATTEMPTS: int = 3
+
     # CORS
     BACKEND_CORS_ORIGINS: List[str] = [
         "http://localhost:3000",
@@ -0,0 +1,41 @@
+"""
+Замеры времени этапов и запись метрик (структурированные строки лога app.metrics)
+"""
+
+import json
+import logging
+import time
+from contextlib import contextmanager
+from typing import Any, Dict
+
+metrics_logger = logging.getLogger("app.metrics")
+
+
+class StageTimer:
+    """Время этапов операции в миллисекундах (повторные входы в этап суммируются)"""
+
+    def __init__(self):
+        self._started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + (time.perf_counter() - started) * 1000
+
+    def as_dict(self) -> Dict[str, float]:
+        result = {name: round(ms, 2) for name, ms in self.stages.items()}
+        result["total"] = round((time.perf_counter() - self._started) * 1000, 2)
+        return result
+
+
+def record_metric(name: str, values: Dict[str, Any], **labels: Any):
+    """
+    Записывает метрику одной JSON-строкой в лог app.metrics
+    (собирается сборщиком логов; значения — в поле values, измерения — в labels)
+    """
+    record = {"metric": name, "values": values, "labels": labels}
+    metrics_logger.info(json.dumps(record, default=str, ensure_ascii=False), extra={"metric": record})
@@ -0,0 +1,42 @@
+"""
+Keyset-пагинация: непрозрачный курсор из значений ключа сортировки последней строки страницы
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, List
+
+from fastapi import HTTPException, Response
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(*values: Any) -> str:
+    """Курсор из значений ключа сортировки (datetime сохраняется в ISO формате)"""
+    payload = [
+        {"dt": value.isoformat()} if isinstance(value, datetime) else value
+        for value in values
+    ]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """Значения ключа сортировки из курсора; некорректный курсор — 400"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        if not isinstance(payload, list) or len(payload) != size:
+            raise ValueError(cursor)
+        return [
+            datetime.fromisoformat(value["dt"]) if isinstance(value, dict) else value
+            for value in payload
+        ]
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="Некорректный курсор пагинации")
+
+
+def set_next_cursor(response: Response, cursor: str | None):
+    """Курсор следующей страницы передается заголовком, тело ответа остается списком"""
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
@@ -11,6 +11,7 @@ from pathlib import Path
 
 from app.core.config import settings
 from app.api.v1.api import api_router
+from app.core.cache_invalidation import invalidation_listener
 
 # Создание директории для загрузок
 upload_dir = Path(settings.UPLOAD_DIR)
@@ -30,6 +31,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # Курсор keyset-пагинации списков
 )
 
 # Подключение статических файлов
@@ -38,6 +40,15 @@ app.mount("/uploads", StaticFiles(directory=settings.UPLOAD_DIR), name="uploads"
 # Подключение API роутеров
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
+@app.on_event("startup")
+async def start_invalidation_listener():
+    """Подписка на сброс кешей (права проекта, правила workflow), измененных другими процессами API"""
+    invalidation_listener.start()
+
+@app.on_event("shutdown")
+async def stop_invalidation_listener():
+    invalidation_listener.stop()
+
 @app.get("/")
 async def root():
     """Корневой эндпоинт"""
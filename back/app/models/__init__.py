@@ -10,6 +10,8 @@ from .document import Document, DocumentRevision, DocumentReview
 from .document_comments import DocumentComment
 from .transmittal import Transmittal, TransmittalRevision
 from .transmittal_import_settings import TransmittalImportSettings
+from .transmittal_numbering import TransmittalNumberingRule
+from .background_job import BackgroundJob
 # Temporarily commented out to avoid circular imports
 # from .workflow import (
 #     WorkflowTemplate, WorkflowStep, DocumentWorkflow, DocumentApproval, DocumentHistory,
@@ -34,6 +36,8 @@ __all__ = [
     "DocumentComment",
     "Transmittal", "TransmittalRevision",
     "TransmittalImportSettings",
+    "TransmittalNumberingRule",
+    "BackgroundJob",
     # "WorkflowTemplate", "WorkflowStep", "DocumentWorkflow", "DocumentApproval", "DocumentHistory",
     # "DocumentStatus", "ApprovalStatus",
     # "Notification",
@@ -0,0 +1,51 @@
+"""
+Background job model for EDMS (очередь фоновых задач в PostgreSQL)
+"""
+
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, Index
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+class BackgroundJob(Base):
+    """Фоновая задача: импорт/экспорт, выполняемые воркером вне HTTP-запроса"""
+    __tablename__ = "background_jobs"
+    __table_args__ = (
+        Index('ix_background_jobs_status_run_after', 'status', 'run_after'),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_type = Column(String(50), nullable=False)  # transmittal_import, documents_import_by_paths, ...
+    status = Column(String(20), nullable=False, default="queued")  # queued | running | succeeded | failed | cancelled
+    payload = Column(Text)  # JSON string — параметры задачи
+    result = Column(Text)  # JSON string — результат задачи
+    error = Column(Text)  # Текст последней ошибки
+
+    # Прогресс выполнения
+    progress_current = Column(Integer, default=0)
+    progress_total = Column(Integer, nullable=True)
+    progress_message = Column(String(255), nullable=True)
+
+    # Повторы и отмена
+    attempts = Column(Integer, default=0, nullable=False)
+    max_attempts = Column(Integer, default=3, nullable=False)
+    cancel_requested = Column(Boolean, default=False, nullable=False)
+    # Обработчик уже зафиксировал часть данных — повтор продублировал бы их
+    partially_committed = Column(Boolean, default=False, nullable=False)
+
+    # Файл-результат (например, выгрузка Excel)
+    artifact_path = Column(String(500), nullable=True)
+    artifact_name = Column(String(255), nullable=True)
+
+    worker_id = Column(String(100), nullable=True)  # Воркер, взявший задачу
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"), nullable=True)
+    created_by = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+
+    run_after = Column(DateTime(timezone=True), server_default=func.now())  # Не запускать раньше (для повторов)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)  # Последний сигнал живости воркера
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<BackgroundJob(id={self.id}, job_type='{self.job_type}', status='{self.status}')>"
@@ -28,6 +28,8 @@ class Project(Base):
     budget = Column(Numeric(15, 2))
     created_by = Column(Integer, ForeignKey("users.id"))
     workflow_preset_id = Column(Integer, ForeignKey("workflow_presets.id"), nullable=True)
+    # Закрепленная версия пресета: изменения пресета не затрагивают проект до смены версии
+    workflow_preset_version_id = Column(Integer, ForeignKey("workflow_preset_versions.id", ondelete="SET NULL"), nullable=True)
     is_deleted = Column(Integer, default=0, nullable=False)  # 0 - не удален, 1 - удален
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -130,6 +132,8 @@ class WorkflowPreset(Base):
     description = Column(Text, nullable=True)
     is_global = Column(Boolean, default=True)  # True - глобальный, False - пользовательский
     created_by = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=True)
+    # Текущая (последняя сохраненная) версия; без FK — версии сами ссылаются на пресет
+    current_version_id = Column(Integer, nullable=True)
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -138,6 +142,25 @@ class WorkflowPreset(Base):
         return f"<WorkflowPreset(name={self.name}, is_global={self.is_global})>"
 
 
+class WorkflowPresetVersion(Base):
+    """Неизменяемая версия пресета workflow: снимок последовательности и правил на момент сохранения"""
+    __tablename__ = "workflow_preset_versions"
+    __table_args__ = (
+        UniqueConstraint('preset_id', 'version_number', name='uq_workflow_preset_versions_preset_version'),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    preset_id = Column(Integer, ForeignKey("workflow_presets.id", ondelete="CASCADE"), nullable=False)
+    version_number = Column(Integer, nullable=False)
+    sequences = Column(Text, nullable=False)  # JSON: строки WorkflowPresetSequence
+    rules = Column(Text, nullable=False)  # JSON: строки WorkflowPresetRule
+    created_by = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    def __repr__(self):
+        return f"<WorkflowPresetVersion(preset_id={self.preset_id}, version={self.version_number})>"
+
+
 class WorkflowPresetSequence(Base):
     """Последовательность ревизий в workflow пресете"""
     __tablename__ = "workflow_preset_sequences"
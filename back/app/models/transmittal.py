@@ -2,13 +2,16 @@
 Transmittal models for EDMS
 """
 
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, UniqueConstraint, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 
 class Transmittal(Base):
     __tablename__ = "transmittals"
+    __table_args__ = (
+        Index('ix_transmittals_project_id_id', 'project_id', 'id'),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     transmittal_number = Column(String(100), unique=True, index=True, nullable=False)
@@ -39,6 +42,9 @@ class Transmittal(Base):
 class TransmittalRevision(Base):
     """Ревизии в трансмитталах"""
     __tablename__ = "transmittal_revisions"
+    __table_args__ = (
+        UniqueConstraint('transmittal_id', 'revision_id', name='uq_transmittal_revisions_transmittal_revision'),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     transmittal_id = Column(Integer, ForeignKey("transmittals.id", ondelete="CASCADE"))
@@ -0,0 +1,34 @@
+"""
+Transmittal numbering rule model for EDMS
+"""
+
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index, text
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+class TransmittalNumberingRule(Base):
+    """
+    Шаблон номера трансмиттала и счетчик. Правило задается для проекта и, при необходимости,
+    направления и/или контрагента (NULL — для всех); применяется наиболее конкретное.
+    """
+    __tablename__ = "transmittal_numbering_rules"
+    __table_args__ = (
+        # Одно правило на сочетание проект/направление/контрагент (NULL считается значением)
+        Index(
+            'uq_transmittal_numbering_rules_scope',
+            'project_id', text("coalesce(direction, '')"), text("coalesce(counterparty_id, 0)"),
+            unique=True
+        ),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"), nullable=False)
+    direction = Column(String(10), nullable=True)  # 'out' | 'in' | NULL — любое
+    counterparty_id = Column(Integer, ForeignKey("companies.id", ondelete="CASCADE"), nullable=True)
+    template = Column(String(200), nullable=False)  # Например: {project_code}-TR-{direction}-{seq:04d}
+    next_value = Column(Integer, nullable=False, default=1)  # Следующее значение {seq}
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    def __repr__(self):
+        return f"<TransmittalNumberingRule(project_id={self.project_id}, direction={self.direction}, counterparty_id={self.counterparty_id}, template='{self.template}')>"
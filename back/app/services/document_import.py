@@ -0,0 +1,466 @@
+"""
+Потоковый импорт документов по путям из Excel-манифеста (import-by-paths)
+"""
+
+import io
+import os
+import uuid
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from openpyxl import load_workbook
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.document import Document, DocumentRevision
+from app.models.discipline import Discipline, DocumentType
+from app.models.project import ProjectDisciplineDocumentType
+from app.services.file_ingest import ingest_file
+from app.models.references import Language, RevisionStatus, WorkflowStatus
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_COLUMNS = ('file_path', 'title')
+
+
+class ManifestError(Exception):
+    """Ошибка структуры или формата файла метаданных"""
+
+
+class ManifestReader:
+    """Построчное чтение манифеста через openpyxl read_only (без загрузки листа в память)"""
+
+    def __init__(self, content: bytes):
+        try:
+            self._workbook = load_workbook(io.BytesIO(content), read_only=True, data_only=True)
+            self._rows = self._workbook.active.iter_rows(values_only=True)
+            header = next(self._rows, None)
+        except Exception as e:
+            raise ManifestError(str(e))
+
+        if header is None:
+            self.close()
+            raise ManifestError("Файл метаданных пуст")
+
+        self.columns = [str(cell).strip() if cell is not None else '' for cell in header]
+        missing_columns = [col for col in REQUIRED_COLUMNS if col not in self.columns]
+        if missing_columns:
+            self.close()
+            raise ManifestError(f"Отсутствуют обязательные колонки: {', '.join(missing_columns)}")
+
+    def __iter__(self) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Возвращает пары (номер строки в Excel, словарь значений); пустые строки пропускаются"""
+        for row_number, values in enumerate(self._rows, start=2):
+            if not values or all(v is None or (isinstance(v, str) and not v.strip()) for v in values):
+                continue
+            yield row_number, {col: val for col, val in zip(self.columns, values) if col}
+
+    def close(self):
+        self._workbook.close()
+
+
+class ImportLookups:
+    """Справочники, загружаемые один раз на импорт вместо запросов по каждой строке"""
+
+    def __init__(self, db: Session):
+        self.disciplines = {d.code: d.id for d in db.query(Discipline.code, Discipline.id).all()}
+        self.document_types = {dt.code: dt.id for dt in db.query(DocumentType.code, DocumentType.id).all()}
+        self.languages = {l.code: l.id for l in db.query(Language.code, Language.id).all() if l.code}
+        self.import_root = os.path.realpath(settings.IMPORT_ROOT) if settings.IMPORT_ROOT else None
+        self.allowed_extensions = {
+            ext.strip().lower() for ext in settings.ALLOWED_FILE_TYPES.split(',') if ext.strip()
+        }
+
+        active_status = db.query(RevisionStatus.id).filter(RevisionStatus.name == "Active").first()
+        draft_workflow_status = db.query(WorkflowStatus.id).filter(WorkflowStatus.name == "Draft").first()
+        self.active_status_id = active_status.id if active_status else None
+        self.draft_workflow_status_id = draft_workflow_status.id if draft_workflow_status else None
+
+
+class ProjectRowChecks:
+    """
+    Проверки строк относительно проекта, общие для dry_run и импорта: номер повторяется
+    в манифесте, документ с номером уже есть в проекте, тип документа не назначен
+    дисциплине в проекте. Строки проверяются пачками — один запрос номеров на пачку.
+    """
+
+    def __init__(self, db: Session, project_id: int):
+        self.db = db
+        self.project_id = project_id
+        # Пустое множество — в проекте пары не настроены, допустима любая
+        self.allowed_pairs = set(db.query(
+            ProjectDisciplineDocumentType.discipline_id,
+            ProjectDisciplineDocumentType.document_type_id
+        ).filter(ProjectDisciplineDocumentType.project_id == project_id).all())
+        # Номер -> первая строка манифеста с ним
+        self.first_rows: Dict[str, int] = {}
+
+    def check(self, items: List[Dict[str, Any]], errors: List[str]) -> List[Dict[str, Any]]:
+        """Возвращает строки, прошедшие проверки; остальные отмечаются has_errors"""
+        numbers = {
+            item["document"]["number"] for item in items
+            if item["document"]["number"] and item["document"]["number"] not in self.first_rows
+        }
+        existing_numbers = set()
+        if numbers:
+            existing_numbers = {
+                number for (number,) in self.db.query(Document.number).filter(
+                    Document.project_id == self.project_id,
+                    Document.is_deleted == 0,
+                    Document.number.in_(list(numbers))
+                ).all()
+            }
+
+        passed = []
+        for item in items:
+            row_number = item["row_number"]
+            doc = item["document"]
+            number = doc["number"]
+            error = None
+            if number and number in self.first_rows:
+                error = f"Строка {row_number}: номер {number} уже указан в строке {self.first_rows[number]}"
+            elif number and number in existing_numbers:
+                error = f"Строка {row_number}: документ с номером {number} уже существует в проекте"
+            elif self.allowed_pairs and doc["discipline_id"] and doc["document_type_id"] and \
+                    (doc["discipline_id"], doc["document_type_id"]) not in self.allowed_pairs:
+                error = (
+                    f"Строка {row_number}: тип документа не назначен дисциплине в проекте ({item['original_name']})"
+                )
+            if number:
+                self.first_rows.setdefault(number, row_number)
+            if error:
+                item["has_errors"] = True
+                errors.append(error)
+            else:
+                passed.append(item)
+        return passed
+
+
+def _get_str(row: Dict[str, Any], name: str, default: Optional[str] = None) -> Optional[str]:
+    val = row.get(name)
+    if val is None:
+        return default
+    val = str(val).strip()
+    return val if val else default
+
+
+def _get_int(row: Dict[str, Any], name: str) -> Optional[int]:
+    val = row.get(name)
+    try:
+        return int(val) if val is not None and str(val).strip() else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _get_date(row: Dict[str, Any], name: str) -> Optional[date]:
+    val = row.get(name)
+    if isinstance(val, datetime):
+        return val.date()
+    if isinstance(val, date):
+        return val
+    if isinstance(val, str) and val.strip():
+        try:
+            return date.fromisoformat(val.strip()[:10])
+        except ValueError:
+            return None
+    return None
+
+
+def _resolve_source_path(path: str, import_root: Optional[str]) -> Optional[str]:
+    """
+    Реальный путь файла внутри каталога импорта; None — каталог не задан или путь
+    (в том числе через символические ссылки) ведет за его пределы
+    """
+    if not import_root:
+        return None
+    # Относительные пути — относительно каталога импорта; ссылки разрешаются до проверки
+    real_path = os.path.realpath(os.path.join(import_root, path))
+    if os.path.commonpath([import_root, real_path]) != import_root or real_path == import_root:
+        return None
+    return real_path
+
+
+def _prepare_row(row_number: int, row: Dict[str, Any], lookups: ImportLookups,
+                 errors: List[str]) -> Optional[Dict[str, Any]]:
+    """Проверяет строку манифеста и разрешает коды по справочникам (без запросов к БД)"""
+    src_path = _get_str(row, 'file_path')
+    if not src_path:
+        errors.append(f"Строка {row_number}: без file_path пропущена")
+        return None
+
+    src_path = _resolve_source_path(src_path, lookups.import_root)
+    if src_path is None:
+        errors.append(f"Строка {row_number}: путь вне каталога импорта ({_get_str(row, 'file_path')})")
+        return None
+    original_name = os.path.basename(src_path)
+    file_extension = os.path.splitext(original_name)[1].lstrip('.').lower()
+
+    if lookups.allowed_extensions and file_extension not in lookups.allowed_extensions:
+        if file_extension:
+            errors.append(f"Неподдерживаемый тип файла: .{file_extension} ({original_name})")
+        else:
+            errors.append(f"Файл без расширения не допускается ({original_name})")
+        return None
+
+    discipline_id = None
+    discipline_code = _get_str(row, 'discipline_code')
+    if discipline_code:
+        discipline_id = lookups.disciplines.get(discipline_code)
+        if not discipline_id:
+            # не прерываем — можно продолжить без дисциплины
+            errors.append(f"Дисциплина не найдена по коду: {discipline_code} (файл {original_name})")
+
+    document_type_id = None
+    document_type_code = _get_str(row, 'document_type_code')
+    if document_type_code:
+        document_type_id = lookups.document_types.get(document_type_code)
+        if not document_type_id:
+            errors.append(f"Тип документа не найден по коду: {document_type_code} (файл {original_name})")
+
+    language_id = None
+    language_code = _get_str(row, 'language_code')
+    if language_code:
+        language_id = lookups.languages.get(language_code)
+        if not language_id:
+            errors.append(f"Язык не найден по коду: {language_code} (файл {original_name})")
+
+    return {
+        "row_number": row_number,
+        "src_path": src_path,
+        "original_name": original_name,
+        "file_extension": file_extension,
+        "revision_number": _get_str(row, 'revision', "01")[:8],
+        "document": {
+            "title": _get_str(row, 'title', original_name),
+            "title_native": _get_str(row, 'description'),
+            "remarks": _get_str(row, 'remarks'),
+            "number": _get_str(row, 'number'),
+            "discipline_id": discipline_id,
+            "document_type_id": document_type_id,
+            "language_id": language_id,
+            "creation_date": _get_date(row, 'creation_date'),
+            "sheet_number": _get_str(row, 'sheet_number'),
+            "total_sheets": _get_int(row, 'total_sheets'),
+            "scale": _get_str(row, 'scale'),
+            "format": _get_str(row, 'format'),
+            "confidentiality": _get_str(row, 'confidentiality', 'internal'),
+        },
+    }
+
+
+def _copy_into_storage(item: Dict[str, Any], upload_dir: str,
+                       ingest_mode: str) -> Tuple[Optional[str], Optional[int], Optional[str], Optional[str]]:
+    """Помещает файл в каталог проекта; возвращает (путь, размер, ошибка, способ)"""
+    src_path = item["src_path"]
+    if not os.path.isfile(src_path):
+        return None, None, f"Файл не найден: {src_path}", None
+
+    file_extension = item["file_extension"]
+    unique_filename = f"{uuid.uuid4()}.{file_extension}" if file_extension else str(uuid.uuid4())
+    dst_path = os.path.join(upload_dir, unique_filename)
+    try:
+        method = ingest_file(src_path, dst_path, ingest_mode)
+        return dst_path, os.path.getsize(dst_path), None, method
+    except Exception as copy_err:
+        return None, None, f"Ошибка копирования '{src_path}': {copy_err}", None
+
+
+def _remove_files(paths: List[str]):
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _import_batch(db: Session, batch: List[Dict[str, Any]], pool: ThreadPoolExecutor, upload_dir: str,
+                  project_id: int, user_id: int, lookups: ImportLookups,
+                  imported_documents: List[Dict[str, Any]], errors: List[str],
+                  ingest_mode: str, ingest_methods: Dict[str, int], checks: ProjectRowChecks):
+    """Помещает файлы пачки в хранилище параллельно и вставляет документы/ревизии одной транзакцией"""
+    batch = checks.check(batch, errors)
+    copied = []
+    results = pool.map(lambda i: _copy_into_storage(i, upload_dir, ingest_mode), batch)
+    for item, (dst_path, file_size, error, method) in zip(batch, results):
+        if error:
+            errors.append(error)
+            ingest_methods["failed"] = ingest_methods.get("failed", 0) + 1
+            continue
+        ingest_methods[method] = ingest_methods.get(method, 0) + 1
+        copied.append((item, dst_path, file_size))
+
+    if not copied:
+        return
+
+    try:
+        documents = [
+            Document(project_id=project_id, created_by=user_id, **item["document"])
+            for item, _, _ in copied
+        ]
+        db.add_all(documents)
+        db.flush()  # Пакетный INSERT ... RETURNING id
+
+        db.add_all([
+            DocumentRevision(
+                document_id=document.id,
+                number=item["revision_number"],
+                file_path=dst_path,
+                file_name=item["original_name"],
+                file_size=file_size,
+                file_type=item["file_extension"],
+                change_description="Импорт по пути",
+                uploaded_by=user_id,
+                revision_status_id=lookups.active_status_id,
+                workflow_status_id=lookups.draft_workflow_status_id,
+            )
+            for document, (item, dst_path, file_size) in zip(documents, copied)
+        ])
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        _remove_files([dst_path for _, dst_path, _ in copied])
+        first_row, last_row = copied[0][0]["row_number"], copied[-1][0]["row_number"]
+        errors.append(f"Строки {first_row}-{last_row}: ошибка сохранения ({e})")
+        logger.exception("import-by-paths batch failed (rows %s-%s)", first_row, last_row)
+        return
+
+    for document, (item, _, file_size) in zip(documents, copied):
+        imported_documents.append({
+            "id": document.id,
+            "title": document.title,
+            "number": document.number,
+            "file_name": item["original_name"],
+            "file_size": file_size,
+            "discipline_id": document.discipline_id,
+            "document_type_id": document.document_type_id,
+            "language_id": document.language_id,
+            "revision": item["revision_number"],
+            "confidentiality": document.confidentiality
+        })
+
+
+def import_documents_from_manifest(
+    db: Session,
+    content: bytes,
+    project_id: int,
+    user_id: int,
+    batch_size: Optional[int] = None,
+    workers: Optional[int] = None,
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+    ingest_mode: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Импортирует документы по манифесту потоково: строки читаются по одной,
+    файлы копируются ограниченным пулом потоков, документы и ревизии
+    вставляются пачками по batch_size строк, одна транзакция на пачку.
+    Строки проверяются теми же ProjectRowChecks, что и в dry_run.
+    progress_callback(обработано_строк, импортировано) вызывается после каждой пачки.
+    ingest_mode (auto | reflink | copy, по умолчанию IMPORT_INGEST_MODE): способ помещения
+    файлов в хранилище — на той же ФС без копирования байтов (reflink/hardlink).
+
+    Raises:
+        ManifestError: если файл метаданных не читается или нет обязательных колонок
+    """
+    batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+    workers = workers or settings.IMPORT_COPY_WORKERS
+    ingest_mode = ingest_mode or settings.IMPORT_INGEST_MODE
+
+    reader = ManifestReader(content)
+    lookups = ImportLookups(db)
+    checks = ProjectRowChecks(db, project_id)
+
+    upload_dir = os.path.join(settings.UPLOAD_DIR, f"project_{project_id}")
+    os.makedirs(upload_dir, exist_ok=True)
+
+    imported_documents: List[Dict[str, Any]] = []
+    errors: List[str] = []
+    ingest_methods: Dict[str, int] = {}
+    total_rows = 0
+    batch: List[Dict[str, Any]] = []
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for row_number, row in reader:
+                total_rows += 1
+                item = _prepare_row(row_number, row, lookups, errors)
+                if item is None:
+                    continue
+                batch.append(item)
+                if len(batch) >= batch_size:
+                    _import_batch(db, batch, pool, upload_dir, project_id, user_id, lookups,
+                                  imported_documents, errors, ingest_mode, ingest_methods, checks)
+                    batch = []
+                    if progress_callback:
+                        progress_callback(total_rows, len(imported_documents))
+
+            if batch:
+                _import_batch(db, batch, pool, upload_dir, project_id, user_id, lookups,
+                              imported_documents, errors, ingest_mode, ingest_methods, checks)
+    finally:
+        reader.close()
+
+    return {
+        "imported_documents": imported_documents,
+        "total_imported": len(imported_documents),
+        "total_rows": total_rows,
+        "ingest_methods": ingest_methods,
+        "errors": errors
+    }
+
+
+def validate_manifest(
+    db: Session,
+    content: bytes,
+    project_id: int,
+    workers: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Проверка манифеста без записи (dry_run): все строки проверяются набором
+    запросов на весь файл, а не по строке — справочники и проверки ProjectRowChecks,
+    которые выполняет и импорт; наличие файлов проверяется параллельно.
+
+    Raises:
+        ManifestError: если файл метаданных не читается или нет обязательных колонок
+    """
+    workers = workers or settings.IMPORT_COPY_WORKERS
+
+    reader = ManifestReader(content)
+    lookups = ImportLookups(db)
+    errors: List[str] = []
+    items: List[Dict[str, Any]] = []
+    total_rows = 0
+    try:
+        for row_number, row in reader:
+            total_rows += 1
+            row_errors: List[str] = []
+            item = _prepare_row(row_number, row, lookups, row_errors)
+            errors.extend(
+                e if e.startswith("Строка ") else f"Строка {row_number}: {e}" for e in row_errors
+            )
+            if item is not None:
+                item["has_errors"] = bool(row_errors)
+                items.append(item)
+    finally:
+        reader.close()
+
+    # Номера и пары дисциплина/тип — те же проверки, что и при импорте, одной пачкой на весь файл
+    ProjectRowChecks(db, project_id).check(items, errors)
+
+    # Наличие файлов — параллельно
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        exists = list(pool.map(lambda i: os.path.isfile(i["src_path"]), items))
+    for item, file_exists in zip(items, exists):
+        if not file_exists:
+            item["has_errors"] = True
+            errors.append(f"Строка {item['row_number']}: файл не найден: {item['src_path']}")
+
+    valid_rows = sum(1 for item in items if not item["has_errors"])
+    return {
+        "dry_run": True,
+        "valid": not errors,
+        "total_rows": total_rows,
+        "valid_rows": valid_rows,
+        "errors": errors
+    }
@@ -0,0 +1,141 @@
+"""
+Чтение листов Excel для импорта: подключаемые бэкенды (openpyxl read_only и
+python-calamine, если установлен), без pandas и без построения DataFrame.
+Лист возвращается итератором строк — потребитель (SheetGrid.from_rows) разбирает
+строки по мере чтения, не накапливая их списком.
+"""
+
+import io
+import logging
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+from openpyxl import load_workbook
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+Row = Sequence[Any]
+
+
+class SheetNotFoundError(Exception):
+    """Лист с указанным именем отсутствует в книге"""
+
+
+class ExcelReadError(Exception):
+    """Файл не читается как книга Excel"""
+
+
+def _iter_rows(rows: Iterator[Row], close: Optional[Callable[[], None]] = None) -> Iterator[Row]:
+    """Строки листа; ошибки разбора при чтении -> ExcelReadError, книга закрывается по исчерпании"""
+    try:
+        for row in rows:
+            yield row
+    except ExcelReadError:
+        raise
+    except Exception as e:
+        raise ExcelReadError(str(e))
+    finally:
+        if close is not None:
+            close()
+
+
+def read_sheet_openpyxl(contents: bytes, sheet_name: str) -> Iterator[Row]:
+    """Потоковое чтение листа (openpyxl read_only, только значения): строки разбираются по мере обхода"""
+    try:
+        workbook = load_workbook(io.BytesIO(contents), read_only=True, data_only=True)
+    except Exception as e:
+        raise ExcelReadError(str(e))
+    if sheet_name not in workbook.sheetnames:
+        workbook.close()
+        raise SheetNotFoundError(sheet_name)
+    return _iter_rows(workbook[sheet_name].iter_rows(values_only=True), workbook.close)
+
+
+def read_sheet_calamine(contents: bytes, sheet_name: str) -> Iterator[Row]:
+    """Чтение листа через python-calamine (Rust), заметно быстрее openpyxl на больших листах"""
+    from python_calamine import CalamineWorkbook
+
+    try:
+        workbook = CalamineWorkbook.from_filelike(io.BytesIO(contents))
+    except Exception as e:
+        raise ExcelReadError(str(e))
+    if sheet_name not in workbook.sheet_names:
+        raise SheetNotFoundError(sheet_name)
+    sheet = workbook.get_sheet_by_name(sheet_name)
+    # Лист calamine уже разобран целиком; iter_rows (python-calamine >= 0.2) не копирует его в список Python
+    if hasattr(sheet, "iter_rows"):
+        return _iter_rows(sheet.iter_rows())
+    return _iter_rows(iter(sheet.to_python()))
+
+
+def _calamine_available() -> bool:
+    try:
+        import python_calamine  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+EXCEL_READERS: Dict[str, Callable[[bytes, str], Iterator[Row]]] = {
+    "openpyxl": read_sheet_openpyxl,
+    "calamine": read_sheet_calamine,
+}
+
+
+def _resolve_backend(backend: Optional[str] = None) -> str:
+    """
+    Имя бэкенда (по умолчанию EXCEL_READER_BACKEND).
+    auto — calamine, если установлен, иначе openpyxl.
+    """
+    backend = backend or settings.EXCEL_READER_BACKEND
+    if backend == "auto":
+        backend = "calamine" if _calamine_available() else "openpyxl"
+    if backend not in EXCEL_READERS:
+        raise ValueError(f"Неизвестный бэкенд чтения Excel: {backend}")
+    if backend == "calamine" and not _calamine_available():
+        logger.warning("python-calamine is not installed, falling back to openpyxl")
+        backend = "openpyxl"
+    return backend
+
+
+def get_sheet_reader(backend: Optional[str] = None) -> Callable[[bytes, str], Iterator[Row]]:
+    """Функция чтения листа по имени бэкенда (см. _resolve_backend)"""
+    return EXCEL_READERS[_resolve_backend(backend)]
+
+
+def list_sheet_names(contents: bytes, backend: Optional[str] = None) -> List[str]:
+    """
+    Имена листов книги в порядке следования
+
+    Raises:
+        ExcelReadError: файл не читается
+    """
+    if _resolve_backend(backend) == "calamine":
+        from python_calamine import CalamineWorkbook
+
+        try:
+            return list(CalamineWorkbook.from_filelike(io.BytesIO(contents)).sheet_names)
+        except Exception as e:
+            raise ExcelReadError(str(e))
+
+    try:
+        workbook = load_workbook(io.BytesIO(contents), read_only=True)
+    except Exception as e:
+        raise ExcelReadError(str(e))
+    try:
+        return list(workbook.sheetnames)
+    finally:
+        workbook.close()
+
+
+def read_sheet(contents: bytes, sheet_name: str, backend: Optional[str] = None) -> Iterator[Row]:
+    """
+    Итератор строк значений листа. Пустые ячейки — None (openpyxl) или '' (calamine);
+    приведение значений к тексту — в SheetGrid.
+
+    Raises:
+        SheetNotFoundError: листа нет в книге
+        ExcelReadError: файл не читается (при вызове или при обходе строк)
+    """
+    return get_sheet_reader(backend)(contents, sheet_name)
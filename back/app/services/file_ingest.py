@@ -0,0 +1,118 @@
+"""
+Помещение файлов в хранилище без копирования байтов, где это возможно:
+reflink (FICLONE) -> hardlink -> copy_file_range/sendfile -> обычное копирование
+"""
+
+import os
+import errno
+import shutil
+import logging
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# ioctl FICLONE из linux/fs.h: _IOW(0x94, 9, int)
+FICLONE = 0x40049409
+
+INGEST_MODES = ("auto", "reflink", "copy")
+
+# Ошибки, при которых способ не поддерживается и нужно пробовать следующий
+_UNSUPPORTED_ERRNOS = {
+    errno.EXDEV, errno.EPERM, errno.EINVAL, errno.ENOTTY, errno.EOPNOTSUPP,
+    errno.ENOSYS, errno.EMLINK, errno.EBADF, errno.ETXTBSY
+}
+
+_CHUNK_SIZE = 64 * 1024 * 1024
+
+
+def _remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _reflink(src: str, dst: str) -> bool:
+    """Клонирование экстентов (btrfs, XFS, ...): файлы независимы, данные общие до изменения"""
+    if fcntl is None:
+        return False
+    try:
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+    except OSError as e:
+        _remove_quietly(dst)
+        if e.errno in _UNSUPPORTED_ERRNOS:
+            return False
+        raise
+    shutil.copystat(src, dst)
+    return True
+
+
+def _hardlink(src: str, dst: str) -> bool:
+    """Жесткая ссылка (та же ФС): без копирования, файл общий с источником"""
+    try:
+        os.link(src, dst)
+    except OSError as e:
+        if e.errno in _UNSUPPORTED_ERRNOS:
+            return False
+        raise
+    return True
+
+
+def _kernel_copy(src: str, dst: str) -> str:
+    """Копирование в ядре (copy_file_range, затем sendfile), иначе буферизованное"""
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        in_fd, out_fd = fsrc.fileno(), fdst.fileno()
+        for name in ("copy_file_range", "sendfile"):
+            func = getattr(os, name, None)
+            if func is None:
+                continue
+            try:
+                offset = 0
+                while True:
+                    if name == "copy_file_range":
+                        sent = func(in_fd, out_fd, _CHUNK_SIZE)
+                    else:
+                        sent = func(out_fd, in_fd, offset, _CHUNK_SIZE)
+                    if sent == 0:
+                        break
+                    offset += sent
+                method = name
+                break
+            except OSError as e:
+                if e.errno not in _UNSUPPORTED_ERRNOS or offset:
+                    raise
+                # Способ не поддерживается для этой пары ФС — пробуем следующий с начала
+                fsrc.seek(0)
+                fdst.seek(0)
+                fdst.truncate()
+        else:
+            shutil.copyfileobj(fsrc, fdst, _CHUNK_SIZE)
+            method = "copy"
+    shutil.copystat(src, dst)
+    return method
+
+
+def ingest_file(src: str, dst: str, mode: str = "auto") -> str:
+    """
+    Помещает файл src в хранилище по пути dst.
+
+    mode:
+        auto    — reflink, затем hardlink, затем копирование
+        reflink — reflink, затем копирование (без общих с источником inode)
+        copy    — всегда копирование
+
+    Возвращает использованный способ: reflink | hardlink | copy_file_range | sendfile | copy
+    """
+    if mode not in INGEST_MODES:
+        raise ValueError(f"Неизвестный режим помещения файла: {mode}")
+
+    if mode in ("auto", "reflink") and _reflink(src, dst):
+        return "reflink"
+    if mode == "auto" and _hardlink(src, dst):
+        return "hardlink"
+    return _kernel_copy(src, dst)
@@ -0,0 +1,102 @@
+"""
+Обработчики фоновых задач (регистрируются в реестре job_queue при импорте модуля)
+"""
+
+from typing import Any, Dict
+
+from sqlalchemy.orm import Session
+
+from app.services.job_queue import register_job_handler, JobContext, JobError
+from app.services.transmittal_import import run_transmittal_import, TransmittalImportError
+from app.services.transmittal_batch_import import run_transmittal_batch_import
+from app.services.transmittal_import_preview import commit_transmittal_import
+from app.services.document_import import import_documents_from_manifest, ManifestError
+
+
+def _read_input(payload: Dict[str, Any]) -> bytes:
+    with open(payload["input_path"], "rb") as f:
+        return f.read()
+
+
+@register_job_handler("transmittal_import")
+def handle_transmittal_import(db: Session, ctx: JobContext, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Импорт входящего трансмиттала из Excel"""
+    ctx.set_progress(0, 1, "Импорт трансмиттала", force=True)
+    try:
+        result = run_transmittal_import(
+            db,
+            _read_input(payload),
+            payload.get("filename") or "",
+            payload["project_id"],
+            payload["counterparty_id"],
+            payload["user_id"],
+            include_timings=payload.get("include_timings", False)
+        )
+    except TransmittalImportError as e:
+        # Ошибки данных и настроек повторять бессмысленно
+        raise JobError(e.detail)
+    ctx.set_progress(1, 1, force=True)
+    return result
+
+
+@register_job_handler("transmittal_import_commit")
+def handle_transmittal_import_commit(db: Session, ctx: JobContext, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Импорт трансмиттала из книги предпросмотра (по content_hash)"""
+    ctx.set_progress(0, 1, "Импорт трансмиттала", force=True)
+    try:
+        result = commit_transmittal_import(
+            db,
+            payload["content_hash"],
+            payload["project_id"],
+            payload["counterparty_id"],
+            payload["user_id"],
+            include_timings=payload.get("include_timings", False)
+        )
+    except TransmittalImportError as e:
+        raise JobError(e.detail)
+    ctx.set_progress(1, 1, force=True)
+    return result
+
+
+@register_job_handler("transmittal_import_batch")
+def handle_transmittal_import_batch(db: Session, ctx: JobContext, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Пакетный импорт входящих трансмитталов (ZIP или многолистовая книга)"""
+    def progress(done: int, total: int):
+        ctx.set_progress(done, total, f"Обработано листов: {done} из {total}")
+
+    ctx.set_progress(0, None, "Разбор пакета", force=True)
+    try:
+        result = run_transmittal_batch_import(
+            db,
+            _read_input(payload),
+            payload.get("filename") or "",
+            payload["project_id"],
+            payload["counterparty_id"],
+            payload["user_id"],
+            progress_callback=progress
+        )
+    except TransmittalImportError as e:
+        raise JobError(e.detail)
+    ctx.set_progress(result["total"], result["total"], force=True)
+    return result
+
+
+@register_job_handler("documents_import_by_paths")
+def handle_documents_import_by_paths(db: Session, ctx: JobContext, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Импорт документов по путям из Excel-манифеста"""
+    def progress(rows_processed: int, imported: int):
+        ctx.set_progress(rows_processed, None, f"Импортировано документов: {imported}")
+
+    try:
+        result = import_documents_from_manifest(
+            db,
+            _read_input(payload),
+            payload["project_id"],
+            payload["user_id"],
+            progress_callback=progress,
+            ingest_mode=payload.get("ingest_mode")
+        )
+    except ManifestError as e:
+        raise JobError(f"Ошибка чтения файла метаданных: {e}")
+    ctx.set_progress(result["total_rows"], result["total_rows"], force=True)
+    return result
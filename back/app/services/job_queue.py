@@ -0,0 +1,296 @@
+"""
+Очередь фоновых задач на PostgreSQL (SELECT ... FOR UPDATE SKIP LOCKED)
+"""
+
+import os
+import json
+import time
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy import event, or_, and_, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.background_job import BackgroundJob
+
+logger = logging.getLogger(__name__)
+
+# Реестр обработчиков: job_type -> handler(db, ctx, payload) -> dict
+JOB_HANDLERS: Dict[str, Callable[[Session, "JobContext", Dict[str, Any]], Dict[str, Any]]] = {}
+
+
+class JobError(Exception):
+    """Ошибка задачи, которую бессмысленно повторять (неверные данные, настройки и т.п.)"""
+
+
+class JobCancelled(Exception):
+    """Задача отменена пользователем"""
+
+
+def register_job_handler(job_type: str):
+    """Декоратор регистрации обработчика задачи"""
+    def decorator(func):
+        JOB_HANDLERS[job_type] = func
+        return func
+    return decorator
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def job_files_dir(job_id: int) -> str:
+    """Каталог входных файлов и результатов задачи"""
+    path = os.path.join(settings.JOBS_DIR, str(job_id))
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def enqueue_job(
+    db: Session,
+    job_type: str,
+    payload: Dict[str, Any],
+    user_id: Optional[int] = None,
+    project_id: Optional[int] = None,
+    input_file: Optional[bytes] = None,
+    input_filename: Optional[str] = None
+) -> BackgroundJob:
+    """
+    Ставит задачу в очередь. Входной файл (если есть) сохраняется в каталог задачи,
+    путь к нему передается обработчику в payload['input_path'].
+    """
+    job = BackgroundJob(
+        job_type=job_type,
+        status="queued",
+        payload=json.dumps(payload),
+        max_attempts=settings.JOB_MAX_ATTEMPTS,
+        project_id=project_id,
+        created_by=user_id
+    )
+    db.add(job)
+    db.flush()
+
+    if input_file is not None:
+        input_path = os.path.join(job_files_dir(job.id), os.path.basename(input_filename or "input"))
+        with open(input_path, "wb") as f:
+            f.write(input_file)
+        payload = {**payload, "input_path": input_path}
+        job.payload = json.dumps(payload)
+
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def claim_next_job(db: Session, worker_id: str) -> Optional[BackgroundJob]:
+    """
+    Забирает следующую задачу из очереди. Параллельные воркеры не блокируют
+    друг друга благодаря SKIP LOCKED. Задачи зависших воркеров (без heartbeat
+    дольше JOB_STALE_SECONDS) возвращаются в работу, если попытки не исчерпаны
+    и обработчик еще ничего не зафиксировал; иначе задача завершается ошибкой.
+    """
+    while True:
+        now = _utcnow()
+        stale_before = now - timedelta(seconds=settings.JOB_STALE_SECONDS)
+
+        job = db.query(BackgroundJob).filter(
+            or_(
+                and_(BackgroundJob.status == "queued", BackgroundJob.run_after <= now),
+                and_(BackgroundJob.status == "running", BackgroundJob.heartbeat_at < stale_before)
+            )
+        ).order_by(BackgroundJob.id).with_for_update(skip_locked=True).first()
+
+        if not job:
+            db.rollback()
+            return None
+
+        if job.status == "running" and (job.attempts >= job.max_attempts or job.partially_committed):
+            job.status = "failed"
+            job.finished_at = now
+            job.error = (
+                "Воркер перестал отвечать после частичного сохранения данных, повтор отключен"
+                if job.partially_committed else
+                "Воркер перестал отвечать, попытки исчерпаны"
+            )
+            db.commit()
+            continue
+
+        job.status = "running"
+        job.attempts = (job.attempts or 0) + 1
+        job.worker_id = worker_id
+        job.started_at = now
+        job.heartbeat_at = now
+        job.error = None
+        db.commit()
+        db.refresh(job)
+        return job
+
+
+class JobContext:
+    """Контекст выполнения задачи: прогресс, проверка отмены, файлы результата"""
+
+    def __init__(self, job_id: int, progress_interval: float = 1.0):
+        self.job_id = job_id
+        self._progress_interval = progress_interval
+        self._last_update = 0.0
+
+    def set_progress(self, current: int, total: Optional[int] = None, message: Optional[str] = None,
+                     force: bool = False):
+        """Сохраняет прогресс отдельной транзакцией (не чаще раза в progress_interval) и проверяет отмену"""
+        now = time.monotonic()
+        if not force and now - self._last_update < self._progress_interval:
+            return
+        self._last_update = now
+
+        with SessionLocal() as db:
+            values = {
+                "progress_current": current,
+                "heartbeat_at": _utcnow()
+            }
+            if total is not None:
+                values["progress_total"] = total
+            if message is not None:
+                values["progress_message"] = message[:255]
+            db.query(BackgroundJob).filter(BackgroundJob.id == self.job_id).update(values)
+            db.commit()
+
+        self.check_cancelled()
+
+    def check_cancelled(self):
+        """Бросает JobCancelled, если пользователь запросил отмену"""
+        with SessionLocal() as db:
+            cancel_requested = db.query(BackgroundJob.cancel_requested).filter(
+                BackgroundJob.id == self.job_id
+            ).scalar()
+        if cancel_requested:
+            raise JobCancelled()
+
+    def artifact_path(self, filename: str) -> str:
+        """Путь для файла-результата задачи"""
+        return os.path.join(job_files_dir(self.job_id), os.path.basename(filename))
+
+
+def _finish_job(job_id: int, **values):
+    with SessionLocal() as db:
+        values.setdefault("finished_at", _utcnow())
+        db.query(BackgroundJob).filter(BackgroundJob.id == job_id).update(values)
+        db.commit()
+
+
+class _CommitTracker:
+    """
+    Отмечает задачу partially_committed в той же транзакции, что и первый commit
+    обработчика: после него повтор задачи продублировал бы уже записанные строки
+    """
+
+    def __init__(self, job: BackgroundJob):
+        self.job_id = job.id
+        self.committed = bool(job.partially_committed)
+
+    def attach(self, db: Session):
+        event.listen(db, "before_commit", self._before_commit)
+        event.listen(db, "after_commit", self._after_commit)
+
+    def _before_commit(self, session: Session):
+        if not self.committed:
+            session.execute(
+                update(BackgroundJob).where(BackgroundJob.id == self.job_id).values(partially_committed=True)
+            )
+
+    def _after_commit(self, session: Session):
+        self.committed = True
+
+
+def execute_job(job: BackgroundJob):
+    """Выполняет задачу обработчиком из реестра и фиксирует результат, ошибку или повтор"""
+    handler = JOB_HANDLERS.get(job.job_type)
+    if handler is None:
+        _finish_job(job.id, status="failed", error=f"Неизвестный тип задачи: {job.job_type}")
+        return
+
+    ctx = JobContext(job.id)
+    payload = json.loads(job.payload) if job.payload else {}
+
+    db = SessionLocal()
+    tracker = _CommitTracker(job)
+    tracker.attach(db)
+    try:
+        ctx.check_cancelled()
+        result = handler(db, ctx, payload) or {}
+        artifact = result.pop("_artifact", None)
+        values = {"status": "succeeded", "result": json.dumps(result, default=str)}
+        if artifact:
+            values["artifact_path"], values["artifact_name"] = artifact
+        _finish_job(job.id, **values)
+    except JobCancelled:
+        db.rollback()
+        _finish_job(job.id, status="cancelled", error="Задача отменена пользователем")
+    except JobError as e:
+        db.rollback()
+        _finish_job(job.id, status="failed", error=str(e))
+    except Exception as e:
+        db.rollback()
+        logger.exception("Job %s (%s) failed on attempt %s", job.id, job.job_type, job.attempts)
+        if tracker.committed:
+            # Обработчики пишут пачками: повтор создал бы записи первых пачек повторно
+            _finish_job(job.id, status="failed", error=f"{e} (часть данных уже сохранена, повтор отключен)")
+        elif job.attempts < job.max_attempts:
+            # Повтор с экспоненциальной задержкой
+            retry_at = _utcnow() + timedelta(seconds=10 * 2 ** (job.attempts - 1))
+            _finish_job(job.id, status="queued", error=str(e), run_after=retry_at, finished_at=None)
+        else:
+            _finish_job(job.id, status="failed", error=str(e))
+    finally:
+        db.close()
+
+
+def request_cancel(db: Session, job: BackgroundJob):
+    """
+    Отмена задачи: задача в очереди отменяется сразу, выполняемая — при следующей проверке.
+    Статус проверяется в том же UPDATE: задачу, которую воркер успел взять, нельзя пометить
+    отмененной, пока она выполняется.
+    """
+    cancelled = db.execute(
+        update(BackgroundJob).where(
+            BackgroundJob.id == job.id,
+            BackgroundJob.status == "queued"
+        ).values(
+            status="cancelled", finished_at=_utcnow(), cancel_requested=True
+        ).returning(BackgroundJob.id).execution_options(synchronize_session=False)
+    ).first()
+    if cancelled is None:
+        db.execute(
+            update(BackgroundJob).where(BackgroundJob.id == job.id).values(
+                cancel_requested=True
+            ).execution_options(synchronize_session=False)
+        )
+    db.commit()
+
+
+def job_to_dict(job: BackgroundJob) -> Dict[str, Any]:
+    """Представление задачи для API"""
+    return {
+        "id": job.id,
+        "job_type": job.job_type,
+        "status": job.status,
+        "progress": {
+            "current": job.progress_current or 0,
+            "total": job.progress_total,
+            "message": job.progress_message
+        },
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "cancel_requested": job.cancel_requested,
+        "partially_committed": job.partially_committed,
+        "result": json.loads(job.result) if job.result else None,
+        "error": job.error,
+        "has_artifact": bool(job.artifact_path),
+        "project_id": job.project_id,
+        "created_by": job.created_by,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at
+    }
@@ -0,0 +1,143 @@
+"""
+Членство и проектная роль пользователя с кешем процесса по (user_id, project_id).
+Кеш сбрасывается эндпоинтами участников проекта, а в других процессах API —
+через Postgres LISTEN/NOTIFY; TTL ограничивает устаревание, если уведомление потеряно.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from sqlalchemy import and_
+from sqlalchemy.orm import Session
+
+from app.core.cache_invalidation import publish, register_channel
+from app.core.config import settings
+from app.models.project import Project, ProjectMember
+from app.models.project_role import ProjectRole
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = "edms_project_access"
+
+
+@dataclass(frozen=True)
+class ProjectAccess:
+    """Права пользователя в проекте (без учета системной роли администратора)"""
+    project_id: int
+    user_id: int
+    is_owner: bool
+    is_member: bool
+    role_code: Optional[str]
+
+    @property
+    def can_manage_members(self) -> bool:
+        """Создатель проекта или менеджер проекта"""
+        return self.is_owner or (self.is_member and self.role_code == 'manager')
+
+    @property
+    def can_contribute(self) -> bool:
+        """Участник проекта с ролью, отличной от читателя"""
+        return self.is_member and self.role_code is not None and self.role_code != 'viewer'
+
+
+class ProjectAccessCache:
+    """LRU-кеш прав с TTL; ключ — (user_id, project_id)"""
+
+    def __init__(self, ttl: int, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[int, int], Tuple[ProjectAccess, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int, project_id: int) -> Optional[ProjectAccess]:
+        key = (user_id, project_id)
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is None:
+                return None
+            access, expires_at = cached
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return access
+
+    def put(self, access: ProjectAccess):
+        key = (access.user_id, access.project_id)
+        with self._lock:
+            self._entries[key] = (access, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, project_id: int, user_id: Optional[int] = None):
+        """Сбрасывает права участника проекта или, если user_id не указан, всех участников"""
+        with self._lock:
+            if user_id is not None:
+                self._entries.pop((user_id, project_id), None)
+                return
+            for key in [key for key in self._entries if key[1] == project_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+access_cache = ProjectAccessCache(
+    ttl=settings.PROJECT_ACCESS_CACHE_TTL,
+    max_entries=settings.PROJECT_ACCESS_CACHE_MAX_ENTRIES
+)
+
+
+def get_project_access(db: Session, user_id: int, project_id: int) -> Optional[ProjectAccess]:
+    """
+    Права пользователя в проекте: из кеша без запросов, иначе одним запросом
+    (проект, членство и роль). None — проекта нет (не кешируется).
+    """
+    access = access_cache.get(user_id, project_id)
+    if access is not None:
+        return access
+
+    row = db.query(Project.created_by, ProjectMember.id, ProjectRole.code).outerjoin(
+        ProjectMember, and_(ProjectMember.project_id == Project.id, ProjectMember.user_id == user_id)
+    ).outerjoin(
+        ProjectRole, ProjectRole.id == ProjectMember.project_role_id
+    ).filter(Project.id == project_id).first()
+    if row is None:
+        return None
+
+    created_by, member_id, role_code = row
+    access = ProjectAccess(
+        project_id=project_id,
+        user_id=user_id,
+        is_owner=created_by == user_id,
+        is_member=member_id is not None,
+        role_code=role_code
+    )
+    access_cache.put(access)
+    return access
+
+
+def invalidate_project_access(db: Session, project_id: int, user_id: Optional[int] = None):
+    """
+    Сбрасывает права в этом процессе и публикует NOTIFY для остальных.
+    Вызывается до commit: Postgres доставляет уведомление только после фиксации транзакции.
+    """
+    access_cache.invalidate(project_id, user_id)
+    publish(db, NOTIFY_CHANNEL, f"{project_id}:{user_id if user_id is not None else '*'}")
+
+
+def _apply_notification(payload: str):
+    try:
+        project_id, user_id = payload.split(":", 1)
+        access_cache.invalidate(int(project_id), None if user_id == "*" else int(user_id))
+    except ValueError:
+        logger.warning("Некорректное уведомление прав проекта: %r", payload)
+
+
+register_channel(NOTIFY_CHANNEL, _apply_notification, access_cache.clear)
@@ -0,0 +1,205 @@
+"""
+Справочники проекта (дисциплины, типы документов с DRS, описания и шаги ревизий,
+последовательность закрепленной версии пресета workflow) — несколькими JOIN-запросами, с кешем процесса по проекту
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.cache_invalidation import publish, register_channel
+from app.core.config import settings
+from app.models.project import (
+    Project, ProjectDisciplineDocumentType, ProjectRevisionDescription, ProjectRevisionStep
+)
+from app.models.discipline import Discipline, DocumentType
+from app.models.references import RevisionDescription, RevisionStep
+from app.services.workflow_preset_versions import get_current_version_id, get_version_views
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = "edms_project_catalogue"
+
+
+def _revision_step_dict(step: RevisionStep) -> Dict[str, Any]:
+    return {
+        "id": step.id,
+        "code": step.code,
+        "description": step.description,
+        "description_native": step.description_native,
+        "description_long": step.description_long,
+        "is_active": step.is_active
+    }
+
+
+def _revision_description_dict(description: RevisionDescription) -> Dict[str, Any]:
+    return {
+        "id": description.id,
+        "code": description.code,
+        "description": description.description,
+        "description_native": description.description_native,
+        "phase": description.phase,
+        "is_active": description.is_active
+    }
+
+
+def _load_discipline_document_types(db: Session, project_id: int) -> Tuple[List[dict], Dict[int, List[dict]]]:
+    rows = db.query(ProjectDisciplineDocumentType.drs, Discipline, DocumentType).join(
+        Discipline, Discipline.id == ProjectDisciplineDocumentType.discipline_id
+    ).join(
+        DocumentType, DocumentType.id == ProjectDisciplineDocumentType.document_type_id
+    ).filter(
+        ProjectDisciplineDocumentType.project_id == project_id
+    ).order_by(ProjectDisciplineDocumentType.id).all()
+
+    disciplines: Dict[int, dict] = {}
+    document_types: Dict[int, List[dict]] = {}
+    for drs, discipline, doc_type in rows:
+        if discipline.id not in disciplines:
+            disciplines[discipline.id] = {
+                "id": discipline.id,
+                "code": discipline.code,
+                "name": discipline.name,
+                "name_en": discipline.name_en,
+                "description": discipline.description
+            }
+        document_types.setdefault(discipline.id, []).append({
+            "id": doc_type.id,
+            "code": doc_type.code,
+            "name": doc_type.name,
+            "name_en": doc_type.name_en,
+            "description": doc_type.description,
+            "drs": drs
+        })
+    return list(disciplines.values()), document_types
+
+
+def _load_workflow_sequence(db: Session, version_id: Optional[int]) -> List[dict]:
+    if not version_id:
+        return []
+    view = get_version_views(db, [version_id]).get(version_id)
+    if view is None:
+        return []
+    return [
+        {
+            "id": item["id"],
+            "order": item["sequence_order"],
+            "revision_step": item["revision_step"],
+            "revision_description": item["revision_description"]
+        }
+        for item in view[0]
+    ]
+
+
+def _workflow_version_id(db: Session, project: Project) -> Optional[int]:
+    """Закрепленная за проектом версия пресета, для проектов без закрепления — текущая"""
+    return project.workflow_preset_version_id or get_current_version_id(db, project.workflow_preset_id)
+
+
+def build_project_catalogue(db: Session, project: Project) -> Dict[str, Any]:
+    """Справочники проекта: фиксированное число запросов независимо от их размера"""
+    version_id = _workflow_version_id(db, project)
+    disciplines, document_types = _load_discipline_document_types(db, project.id)
+
+    revision_descriptions = db.query(RevisionDescription).join(
+        ProjectRevisionDescription, ProjectRevisionDescription.revision_description_id == RevisionDescription.id
+    ).filter(
+        ProjectRevisionDescription.project_id == project.id
+    ).order_by(ProjectRevisionDescription.id).all()
+
+    revision_steps = db.query(RevisionStep).join(
+        ProjectRevisionStep, ProjectRevisionStep.revision_step_id == RevisionStep.id
+    ).filter(
+        ProjectRevisionStep.project_id == project.id
+    ).order_by(ProjectRevisionStep.id).all()
+
+    return {
+        "project_id": project.id,
+        "workflow_preset_id": project.workflow_preset_id,
+        "workflow_preset_version_id": version_id,
+        "disciplines": disciplines,
+        "document_types": document_types,
+        "revision_descriptions": [_revision_description_dict(item) for item in revision_descriptions],
+        "revision_steps": [_revision_step_dict(item) for item in revision_steps],
+        "workflow_sequence": _load_workflow_sequence(db, version_id)
+    }
+
+
+class ProjectCatalogueCache:
+    """
+    Кеш справочников по project_id с TTL. Сбрасывается при изменении проекта и пресета
+    workflow — в этом процессе сразу, в остальных через NOTIFY (см. invalidate_project_catalogue).
+    """
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self._entries: Dict[int, Tuple[Dict[str, Any], float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, project: Project) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            cached = self._entries.get(project.id)
+        if cached is not None:
+            catalogue, expires_at = cached
+            if expires_at > now and catalogue["workflow_preset_id"] == project.workflow_preset_id and (
+                project.workflow_preset_version_id is None
+                or catalogue["workflow_preset_version_id"] == project.workflow_preset_version_id
+            ):
+                return catalogue
+
+        catalogue = build_project_catalogue(db, project)
+        with self._lock:
+            self._entries[project.id] = (catalogue, now + self.ttl)
+        return catalogue
+
+    def invalidate(self, project_id: int):
+        with self._lock:
+            self._entries.pop(project_id, None)
+
+    def invalidate_preset(self, preset_id: int):
+        """Сбрасывает справочники проектов, использующих пресет (проекты без закрепленной версии видят новую)"""
+        with self._lock:
+            for project_id in [
+                project_id for project_id, (catalogue, _) in self._entries.items()
+                if catalogue["workflow_preset_id"] == preset_id
+            ]:
+                del self._entries[project_id]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+project_catalogue_cache = ProjectCatalogueCache(ttl=settings.PROJECT_CATALOGUE_CACHE_TTL)
+
+
+def invalidate_project_catalogue(db: Session, project_id: int):
+    """Сбрасывает справочники проекта в этом процессе и публикует NOTIFY для остальных (до commit)"""
+    project_catalogue_cache.invalidate(project_id)
+    publish(db, NOTIFY_CHANNEL, f"project:{project_id}")
+
+
+def invalidate_preset_catalogues(db: Session, preset_id: int):
+    """Сбрасывает справочники проектов пресета в этом процессе и публикует NOTIFY (до commit)"""
+    project_catalogue_cache.invalidate_preset(preset_id)
+    publish(db, NOTIFY_CHANNEL, f"preset:{preset_id}")
+
+
+def _apply_notification(payload: str):
+    try:
+        kind, object_id = payload.split(":", 1)
+        if kind == "project":
+            project_catalogue_cache.invalidate(int(object_id))
+        elif kind == "preset":
+            project_catalogue_cache.invalidate_preset(int(object_id))
+        else:
+            raise ValueError(kind)
+    except ValueError:
+        logger.warning("Некорректное уведомление справочников проекта: %r", payload)
+
+
+register_channel(NOTIFY_CHANNEL, _apply_notification, project_catalogue_cache.clear)
@@ -0,0 +1,272 @@
+"""
+Настройка состава проекта: синхронизация связей (дисциплины/типы документов, описания и шаги
+ревизий, участники) по разнице множеств пакетными запросами и копирование справочников
+из другого проекта через INSERT ... SELECT
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, exists, insert, literal, select, update
+from sqlalchemy.orm import Session, aliased
+
+from app.models.user import User
+from app.models.references import Company
+from app.models.project import (
+    Project, ProjectMember, ProjectDisciplineDocumentType, ProjectRevisionDescription, ProjectRevisionStep
+)
+from app.models.project_participant import ProjectParticipant
+
+CLONE_SECTIONS = ("document_types", "revision_descriptions", "revision_steps", "workflow_preset")
+
+PARTICIPANT_FIELDS = ("contact_id", "company_role_id", "is_primary", "notes")
+
+
+@dataclass
+class SyncResult:
+    inserted: int = 0
+    updated: int = 0
+    deleted: int = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return {"inserted": self.inserted, "updated": self.updated, "deleted": self.deleted}
+
+
+def _delete_ids(db: Session, model, ids: List[int]) -> int:
+    if not ids:
+        return 0
+    db.execute(delete(model).where(model.id.in_(ids)).execution_options(synchronize_session=False))
+    return len(ids)
+
+
+def _insert_rows(db: Session, model, rows: List[Dict[str, Any]]) -> int:
+    # executemany одного INSERT (insertmanyvalues), без ORM-объектов на строку
+    if rows:
+        db.execute(insert(model), rows)
+    return len(rows)
+
+
+def _update_rows(db: Session, model, rows: List[Dict[str, Any]]) -> int:
+    # Пакетный UPDATE по первичному ключу
+    if rows:
+        db.execute(update(model), rows)
+    return len(rows)
+
+
+def normalize_discipline_document_types(data: Dict[Any, Iterable[Any]]) -> Dict[Tuple[int, int], Optional[str]]:
+    """
+    {discipline_id: [document_type_id] или [{documentTypeId, drs}]} ->
+    {(discipline_id, document_type_id): drs}. Повторы схлопываются (последний DRS побеждает).
+    """
+    result: Dict[Tuple[int, int], Optional[str]] = {}
+    for discipline_id, items in data.items():
+        for item in items:
+            # Поддерживаем как старый формат (массив чисел), так и новый (массив объектов)
+            if isinstance(item, dict):
+                document_type_id, drs = item.get('documentTypeId'), item.get('drs')
+            else:
+                document_type_id, drs = item, None
+            if document_type_id is None:
+                continue
+            result[(int(discipline_id), int(document_type_id))] = drs
+    return result
+
+
+def sync_discipline_document_types(db: Session, project_id: int, data: Dict[Any, Iterable[Any]]) -> SyncResult:
+    """Приводит связи дисциплина/тип документа проекта к переданным: удаляет лишние, добавляет новые, меняет DRS"""
+    desired = normalize_discipline_document_types(data)
+    model = ProjectDisciplineDocumentType
+    existing: Dict[Tuple[int, int], Tuple[int, Optional[str]]] = {}
+    duplicate_ids: List[int] = []
+    for link_id, discipline_id, document_type_id, drs in db.execute(
+        select(model.id, model.discipline_id, model.document_type_id, model.drs)
+        .where(model.project_id == project_id).order_by(model.id)
+    ):
+        key = (discipline_id, document_type_id)
+        if key in existing:
+            duplicate_ids.append(link_id)
+        else:
+            existing[key] = (link_id, drs)
+
+    result = SyncResult()
+    result.deleted = _delete_ids(
+        db, model, duplicate_ids + [link_id for key, (link_id, _) in existing.items() if key not in desired]
+    )
+    result.inserted = _insert_rows(db, model, [
+        {"project_id": project_id, "discipline_id": discipline_id, "document_type_id": document_type_id, "drs": drs}
+        for (discipline_id, document_type_id), drs in desired.items() if (discipline_id, document_type_id) not in existing
+    ])
+    result.updated = _update_rows(db, model, [
+        {"id": existing[key][0], "drs": drs}
+        for key, drs in desired.items() if key in existing and existing[key][1] != drs
+    ])
+    return result
+
+
+def _sync_reference_links(db: Session, model, column, project_id: int, ids: Iterable[int]) -> SyncResult:
+    desired = list(dict.fromkeys(int(item) for item in ids))
+    existing: Dict[int, int] = {}
+    duplicate_ids: List[int] = []
+    for link_id, reference_id in db.execute(
+        select(model.id, column).where(model.project_id == project_id).order_by(model.id)
+    ):
+        if reference_id in existing:
+            duplicate_ids.append(link_id)
+        else:
+            existing[reference_id] = link_id
+
+    desired_set = set(desired)
+    result = SyncResult()
+    result.deleted = _delete_ids(
+        db, model, duplicate_ids + [link_id for reference_id, link_id in existing.items() if reference_id not in desired_set]
+    )
+    result.inserted = _insert_rows(db, model, [
+        {"project_id": project_id, column.key: reference_id} for reference_id in desired if reference_id not in existing
+    ])
+    return result
+
+
+def sync_revision_descriptions(db: Session, project_id: int, ids: Iterable[int]) -> SyncResult:
+    return _sync_reference_links(
+        db, ProjectRevisionDescription, ProjectRevisionDescription.revision_description_id, project_id, ids
+    )
+
+
+def sync_revision_steps(db: Session, project_id: int, ids: Iterable[int]) -> SyncResult:
+    return _sync_reference_links(db, ProjectRevisionStep, ProjectRevisionStep.revision_step_id, project_id, ids)
+
+
+def sync_members(db: Session, project_id: int, owner_id: Optional[int], members: Iterable[Any]) -> SyncResult:
+    """
+    Участники-пользователи проекта по списку (user_id, project_role_id). Владелец проекта
+    не удаляется и не меняется; несуществующие пользователи пропускаются (одна проверка на весь список).
+    """
+    desired: Dict[int, Optional[int]] = {}
+    for member in members:
+        if member.user_id != owner_id:
+            desired[member.user_id] = member.project_role_id
+    if desired:
+        known_users = set(db.scalars(select(User.id).where(User.id.in_(list(desired)))))
+        desired = {user_id: role_id for user_id, role_id in desired.items() if user_id in known_users}
+
+    existing = {
+        user_id: (member_id, role_id)
+        for member_id, user_id, role_id in db.execute(
+            select(ProjectMember.id, ProjectMember.user_id, ProjectMember.project_role_id)
+            .where(ProjectMember.project_id == project_id)
+        )
+        if user_id != owner_id
+    }
+
+    result = SyncResult()
+    result.deleted = _delete_ids(
+        db, ProjectMember, [member_id for user_id, (member_id, _) in existing.items() if user_id not in desired]
+    )
+    result.inserted = _insert_rows(db, ProjectMember, [
+        {"project_id": project_id, "user_id": user_id, "project_role_id": role_id}
+        for user_id, role_id in desired.items() if user_id not in existing
+    ])
+    result.updated = _update_rows(db, ProjectMember, [
+        {"id": existing[user_id][0], "project_role_id": role_id}
+        for user_id, role_id in desired.items() if user_id in existing and existing[user_id][1] != role_id
+    ])
+    return result
+
+
+def sync_participants(db: Session, project_id: int, participants: Iterable[Any]) -> SyncResult:
+    """
+    Участники-компании проекта: одна запись на компанию, поля контакта, роли, признака
+    основного участника и примечаний обновляются только при изменении.
+    """
+    desired: Dict[int, Dict[str, Any]] = {}
+    for participant in participants:
+        desired[participant.company_id] = {field: getattr(participant, field) for field in PARTICIPANT_FIELDS}
+    if desired:
+        known_companies = set(db.scalars(select(Company.id).where(Company.id.in_(list(desired)))))
+        desired = {company_id: values for company_id, values in desired.items() if company_id in known_companies}
+
+    existing: Dict[int, Dict[str, Any]] = {}
+    duplicate_ids: List[int] = []
+    for row in db.execute(
+        select(ProjectParticipant.id, ProjectParticipant.company_id, *[getattr(ProjectParticipant, f) for f in PARTICIPANT_FIELDS])
+        .where(ProjectParticipant.project_id == project_id).order_by(ProjectParticipant.id)
+    ):
+        values = dict(row._mapping)
+        if values["company_id"] in existing:
+            duplicate_ids.append(values["id"])
+        else:
+            existing[values["company_id"]] = values
+
+    result = SyncResult()
+    result.deleted = _delete_ids(
+        db, ProjectParticipant,
+        duplicate_ids + [values["id"] for company_id, values in existing.items() if company_id not in desired]
+    )
+    result.inserted = _insert_rows(db, ProjectParticipant, [
+        {"project_id": project_id, "company_id": company_id, **values}
+        for company_id, values in desired.items() if company_id not in existing
+    ])
+    result.updated = _update_rows(db, ProjectParticipant, [
+        {"id": existing[company_id]["id"], **values}
+        for company_id, values in desired.items()
+        if company_id in existing and any(existing[company_id][field] != values[field] for field in PARTICIPANT_FIELDS)
+    ])
+    return result
+
+
+def _clone_links(db: Session, model, key_columns: List[str], copy_columns: List[str],
+                 source_id: int, target_id: int) -> int:
+    """
+    INSERT INTO model (project_id, ...) SELECT :target, ... FROM model WHERE project_id = :source
+    AND NOT EXISTS (такая же связь уже есть у целевого проекта) — строки не покидают сервер БД
+    """
+    source = aliased(model)
+    target = aliased(model)
+    already_linked = exists().where(
+        target.project_id == target_id,
+        *[getattr(target, column) == getattr(source, column) for column in key_columns]
+    )
+    rows = select(
+        literal(target_id), *[getattr(source, column) for column in key_columns + copy_columns]
+    ).where(source.project_id == source_id, ~already_linked).order_by(source.id)
+    result = db.execute(
+        insert(model).from_select(["project_id", *key_columns, *copy_columns], rows)
+    )
+    return result.rowcount
+
+
+def clone_project_config(
+    db: Session,
+    source: Project,
+    target: Project,
+    sections: Iterable[str] = CLONE_SECTIONS,
+    replace: bool = False
+) -> Dict[str, int]:
+    """
+    Копирует справочники проекта source в target. replace — сначала удалить связи target
+    в копируемых разделах, иначе добавить недостающие к существующим.
+    Возвращает число скопированных строк по разделам. Коммит — на вызывающей стороне.
+    """
+    sections = [section for section in CLONE_SECTIONS if section in set(sections)]
+    link_models = {
+        "document_types": (ProjectDisciplineDocumentType, ["discipline_id", "document_type_id"], ["drs"]),
+        "revision_descriptions": (ProjectRevisionDescription, ["revision_description_id"], []),
+        "revision_steps": (ProjectRevisionStep, ["revision_step_id"], []),
+    }
+
+    copied: Dict[str, int] = {}
+    for section in sections:
+        if section == "workflow_preset":
+            copied[section] = 0
+            if source.workflow_preset_id and (replace or target.workflow_preset_id is None):
+                target.workflow_preset_id = source.workflow_preset_id
+                target.workflow_preset_version_id = source.workflow_preset_version_id
+                copied[section] = 1
+            continue
+        model, key_columns, copy_columns = link_models[section]
+        if replace:
+            db.execute(
+                delete(model).where(model.project_id == target.id).execution_options(synchronize_session=False)
+            )
+        copied[section] = _clone_links(db, model, key_columns, copy_columns, source.id, target.id)
+    return copied
@@ -0,0 +1,38 @@
+"""
+Номера ревизий документа: следующий номер и блокировка документов на время его вычисления
+(ручная загрузка ревизии и пакетное применение правил workflow нумеруют одинаково)
+"""
+
+from typing import Iterable, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models.document import Document
+
+
+def bump_revision_number(current: Optional[str]) -> str:
+    """Увеличивает номер ревизии: 01 -> 02, 02 -> 03, и т.д."""
+    try:
+        # Парсим текущий номер (например, "01", "02")
+        current_num = int(current or "01")
+        new_num = current_num + 1
+        # Возвращаем в формате с ведущим нулем (01, 02, 03, ...)
+        return f"{new_num:02d}"
+    except Exception:
+        # Если не удалось распарсить, возвращаем "02"
+        return "02"
+
+
+def lock_documents(db: Session, document_ids: Iterable[int]) -> None:
+    """
+    SELECT ... FOR UPDATE строк документов до чтения последних ревизий: параллельное
+    создание ревизии того же документа ждет коммита и видит уже созданный номер.
+    Строки блокируются в порядке id — два пакета с общими документами не взаимоблокируются.
+    """
+    document_ids = sorted(set(document_ids))
+    if not document_ids:
+        return
+    db.execute(
+        select(Document.id).where(Document.id.in_(document_ids)).order_by(Document.id).with_for_update()
+    ).all()
@@ -0,0 +1,289 @@
+"""
+Пакетный импорт входящих трансмитталов: ZIP с книгами Excel или одна книга с несколькими листами.
+Разбор листов выполняется в пуле процессов (CPU-bound, не держит GIL процесса-воркера),
+запись в БД — одним писателем, отдельной транзакцией на каждый трансмиттал.
+Книги пакета распаковываются во временный каталог, процессам разбора передаются пути к файлам.
+"""
+
+import io
+import os
+import logging
+import tempfile
+import zipfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import StageTimer, record_metric
+from app.services.excel_readers import list_sheet_names, ExcelReadError
+from app.services.transmittal_import import (
+    ImportProfile, ParsedLoadSheet, TransmittalImportError, get_localized_message,
+    load_import_profile, get_received_status_id, parse_load_sheet, write_transmittal,
+    import_error_from_exception
+)
+
+logger = logging.getLogger(__name__)
+
+BATCH_EXCEL_EXTENSIONS = ('.xlsx', '.xlsm')
+
+BATCH_MESSAGES = {
+    "BATCH_INVALID_ARCHIVE": "Не удалось прочитать ZIP архив: {error}",
+    "BATCH_EMPTY": "В пакете нет книг Excel (.xlsx, .xlsm)",
+    "BATCH_TOO_MANY_FILES": "Слишком много листов в пакете: {count} (максимум {limit})",
+    "BATCH_NOT_EXCEL": "Не книга Excel",
+    "BATCH_FILE_TOO_LARGE": "Файл больше допустимого размера",
+    "BATCH_ARCHIVE_TOO_LARGE": "Распакованный размер книг архива превышает {limit} МБ",
+}
+
+# Размер блока при распаковке книги из архива
+_UNZIP_CHUNK_SIZE = 1024 * 1024
+
+
+def _message(key: str, **kwargs) -> str:
+    return BATCH_MESSAGES[key].format(**kwargs)
+
+
+@dataclass
+class BatchItem:
+    """Лист пакета: отдельная книга из архива или лист многолистовой книги"""
+    index: int
+    source: str  # Имя в отчете: путь в архиве или "книга.xlsx / Лист"
+    filename: str  # Имя файла для описания трансмиттала
+    path: str  # Книга во временном каталоге пакета
+    sheet_name: Optional[str] = None  # None — лист из профиля импорта
+
+
+class _MemberTooLarge(Exception):
+    """Книга архива больше MAX_FILE_SIZE"""
+
+
+def _extract_member(archive: zipfile.ZipFile, info: zipfile.ZipInfo, path: str, total_limit: int,
+                    total_read: int) -> int:
+    """
+    Распаковывает книгу архива в path, считая фактически прочитанные байты (заявленному
+    в архиве info.file_size не доверяем). Возвращает размер книги.
+
+    Raises:
+        _MemberTooLarge: книга больше MAX_FILE_SIZE (частично записанный файл удаляется)
+        TransmittalImportError: превышен лимит распакованного размера всего пакета
+    """
+    size = 0
+    try:
+        with archive.open(info) as src, open(path, "wb") as dst:
+            while True:
+                chunk = src.read(_UNZIP_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > settings.MAX_FILE_SIZE:
+                    raise _MemberTooLarge()
+                if total_read + size > total_limit:
+                    raise TransmittalImportError(
+                        _message("BATCH_ARCHIVE_TOO_LARGE", limit=settings.TRANSMITTAL_BATCH_MAX_UNCOMPRESSED_MB)
+                    )
+                dst.write(chunk)
+    except BaseException:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        raise
+    return size
+
+
+def split_batch_input(
+    contents: bytes,
+    filename: str,
+    work_dir: str
+) -> Tuple[List[BatchItem], List[Dict[str, str]]]:
+    """
+    Разбивает пакет на листы для импорта, книги сохраняются в work_dir. ZIP (по
+    расширению .zip) — каждая книга архива импортируется по листу из профиля; иначе
+    книга, каждый лист которой — отдельный трансмиттал. Возвращает (items, skipped).
+
+    Raises:
+        TransmittalImportError: архив или книга не читается, пакет пуст или слишком велик
+    """
+    items: List[BatchItem] = []
+    skipped: List[Dict[str, str]] = []
+
+    if filename.lower().endswith('.zip'):
+        try:
+            archive = zipfile.ZipFile(io.BytesIO(contents))
+        except zipfile.BadZipFile as e:
+            raise TransmittalImportError(_message("BATCH_INVALID_ARCHIVE", error=str(e)))
+
+        total_limit = settings.TRANSMITTAL_BATCH_MAX_UNCOMPRESSED_MB * 1024 * 1024
+        total_read = 0
+        with archive:
+            for info in archive.infolist():
+                name = info.filename
+                base_name = os.path.basename(name)
+                # Каталоги и служебные файлы архиваторов/Excel не попадают даже в skipped
+                if info.is_dir() or name.startswith('__MACOSX/') or base_name.startswith(('.', '~$')):
+                    continue
+                if not base_name.lower().endswith(BATCH_EXCEL_EXTENSIONS):
+                    skipped.append({"source": name, "reason": _message("BATCH_NOT_EXCEL")})
+                    continue
+                if len(items) >= settings.TRANSMITTAL_BATCH_MAX_FILES:
+                    # Остальные книги не распаковываются — пакет все равно будет отклонен
+                    raise TransmittalImportError(_message(
+                        "BATCH_TOO_MANY_FILES", count=f"> {settings.TRANSMITTAL_BATCH_MAX_FILES}",
+                        limit=settings.TRANSMITTAL_BATCH_MAX_FILES
+                    ))
+                path = os.path.join(work_dir, f"{len(items)}{os.path.splitext(base_name)[1].lower()}")
+                try:
+                    total_read += _extract_member(archive, info, path, total_limit, total_read)
+                except _MemberTooLarge:
+                    skipped.append({"source": name, "reason": _message("BATCH_FILE_TOO_LARGE")})
+                    continue
+                except (zipfile.BadZipFile, zipfile.LargeZipFile, NotImplementedError, RuntimeError, OSError) as e:
+                    raise TransmittalImportError(_message("BATCH_INVALID_ARCHIVE", error=str(e)))
+                items.append(BatchItem(len(items), name, base_name, path))
+    else:
+        try:
+            sheet_names = list_sheet_names(contents)
+        except ExcelReadError as e:
+            raise TransmittalImportError(get_localized_message("EXCEL_READ_ERROR", error=str(e)))
+        path = os.path.join(work_dir, "workbook" + os.path.splitext(filename)[1].lower())
+        with open(path, "wb") as f:
+            f.write(contents)
+        items = [
+            BatchItem(index, f"{filename} / {sheet_name}", filename, path, sheet_name)
+            for index, sheet_name in enumerate(sheet_names)
+        ]
+
+    if not items:
+        raise TransmittalImportError(_message("BATCH_EMPTY"))
+    if len(items) > settings.TRANSMITTAL_BATCH_MAX_FILES:
+        raise TransmittalImportError(
+            _message("BATCH_TOO_MANY_FILES", count=len(items), limit=settings.TRANSMITTAL_BATCH_MAX_FILES)
+        )
+    return items, skipped
+
+
+def _parse_batch_item(
+    path: str,
+    profile: ImportProfile,
+    sheet_name: Optional[str]
+) -> Tuple[Optional[ParsedLoadSheet], Optional[str], Dict[str, float]]:
+    """Разбор листа в дочернем процессе: (результат или None, текст ошибки, время этапов)"""
+    timer = StageTimer()
+    try:
+        # Книга читается с диска в дочернем процессе — байты книги не передаются через pipe пула
+        with open(path, "rb") as f:
+            contents = f.read()
+        return parse_load_sheet(contents, profile, sheet_name, timer), None, timer.as_dict()
+    except TransmittalImportError as e:
+        return None, e.detail, timer.as_dict()
+    except Exception as e:
+        return None, import_error_from_exception(e).detail, timer.as_dict()
+
+
+def _parse_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    Пул разбора листов. forkserver: дочерние процессы не наследуют потоки
+    (heartbeat воркера) и соединения с БД, модули импорта загружаются в сервер один раз.
+    """
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload([__name__])
+    return ProcessPoolExecutor(max_workers=workers, mp_context=context)
+
+
+def run_transmittal_batch_import(
+    db: Session,
+    contents: bytes,
+    filename: str,
+    project_id: int,
+    counterparty_id: int,
+    user_id: int,
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+    workers: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Импортирует пакет трансмитталов и возвращает сводный отчет по каждому листу.
+    Ошибка одного листа не прерывает пакет; уже созданные трансмитталы при отмене
+    задачи сохраняются (каждый — в своей транзакции).
+
+    Raises:
+        TransmittalImportError: ошибка настроек импорта или пакет не читается целиком
+    """
+    timer = StageTimer()
+    with timer.stage("profile"):
+        profile = load_import_profile(db, project_id, counterparty_id, user_id)
+    received_status_id = get_received_status_id(db)
+
+    # Книги пакета — во временном каталоге: процессы разбора получают путь, а не байты книги
+    with tempfile.TemporaryDirectory(prefix="transmittal_batch_") as work_dir:
+        with timer.stage("split"):
+            items, skipped = split_batch_input(contents, filename, work_dir)
+
+        report: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        imported = 0
+        parse_ms = 0.0
+        workers = max(1, min(workers or settings.TRANSMITTAL_BATCH_PARSE_WORKERS, len(items)))
+
+        executor = _parse_pool(workers)
+        try:
+            futures = {
+                executor.submit(_parse_batch_item, item.path, profile, item.sheet_name): item
+                for item in items
+            }
+            # Листы записываются по мере готовности разбора — запись идет параллельно с разбором остальных
+            for done, future in enumerate(as_completed(futures), 1):
+                item = futures[future]
+                parsed, error, parse_timings = future.result()
+                parse_ms += parse_timings.get("total", 0.0)
+
+                entry: Dict[str, Any] = {"source": item.source}
+                if parsed is None:
+                    entry.update(status="failed", error=error)
+                else:
+                    try:
+                        with timer.stage("write"):
+                            result = write_transmittal(
+                                db, parsed, profile, item.filename, project_id, counterparty_id,
+                                user_id, received_status_id
+                            )
+                        imported += 1
+                        entry.update(
+                            status="imported",
+                            transmittal_id=result["transmittal_id"],
+                            transmittal_number=result["transmittal_number"],
+                            table_rows_count=result["table_rows_count"],
+                            created_revisions_count=result["created_revisions_count"]
+                        )
+                    except TransmittalImportError as e:
+                        entry.update(status="failed", error=e.detail, transmittal_number=parsed.transmittal_number or None)
+                report[item.index] = entry
+
+                if progress_callback:
+                    progress_callback(done, len(items))
+        finally:
+            # При отмене или сбое оставшиеся листы не разбираются
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    values = timer.as_dict()
+    values["parse_cpu"] = round(parse_ms, 2)
+    record_metric(
+        "transmittal_import_batch",
+        values,
+        project_id=project_id,
+        counterparty_id=counterparty_id,
+        items=len(items),
+        imported=imported,
+        workers=workers
+    )
+
+    return {
+        "message": f"Импортировано трансмитталов: {imported} из {len(items)}",
+        "total": len(items),
+        "imported": imported,
+        "failed": len(items) - imported,
+        "skipped": skipped,
+        "items": report
+    }
@@ -0,0 +1,409 @@
+"""
+Экспорт трансмитталов: лист трансмиттала и реестр трансмитталов проекта в XLSX
+(openpyxl write-only, строки читаются из БД порциями) и титульный лист PDF с кешем по версии трансмиттала
+"""
+
+import os
+import re
+import json
+import hashlib
+import logging
+import tempfile
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, Optional
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import StageTimer, record_metric
+from app.models.user import User
+from app.models.project import Project
+from app.models.transmittal import Transmittal, TransmittalRevision
+from app.models.document import Document, DocumentRevision
+from app.models.references import RevisionDescription, RevisionStatus, TransmittalStatus, Company
+from app.models.transmittal_import_settings import TransmittalImportSettings
+
+logger = logging.getLogger(__name__)
+
+# Настройки экспорта хранятся рядом с настройками импорта (таблица transmittal_export_settings удалена)
+EXPORT_SETTINGS_KEY = "export_settings"
+
+# Строк, читаемых из БД за одну порцию (server-side cursor)
+EXPORT_FETCH_SIZE = 1000
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+PDF_MEDIA_TYPE = "application/pdf"
+
+
+class TransmittalExportError(Exception):
+    """Ошибка экспорта с HTTP статусом для эндпоинта"""
+
+    def __init__(self, detail: str, status_code: int = 400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+
+@dataclass
+class ExportSettings:
+    """Подписи экспорта; совпадают с подписями профиля импорта, чтобы выгрузку можно было загрузить обратно"""
+    transmittal_number_label: str = "Transmittal No"
+    document_number_label: str = "Document Number"
+    status_label: str = "Status"
+    sheet_name: str = "Transmittal"
+    version: str = ""  # updated_at настроек — часть ключа кеша PDF
+
+    @classmethod
+    def load(cls, db: Session, project_id: int, company_id: Optional[int], user_id: int) -> "ExportSettings":
+        """Настройки экспорта пользователя для контрагента; нет настроек — значения по умолчанию"""
+        if company_id is None:
+            return cls()
+        setting = db.query(TransmittalImportSettings).filter(
+            TransmittalImportSettings.project_id == project_id,
+            TransmittalImportSettings.company_id == company_id,
+            TransmittalImportSettings.user_id == user_id,
+            TransmittalImportSettings.settings_key == EXPORT_SETTINGS_KEY
+        ).first()
+        if setting is None:
+            return cls()
+        try:
+            values = json.loads(setting.settings_value or "{}")
+        except json.JSONDecodeError:
+            logger.warning("Некорректные настройки экспорта id=%s, используются значения по умолчанию", setting.id)
+            values = {}
+        result = cls(version=setting.updated_at.isoformat() if setting.updated_at else "")
+        for key in ("transmittal_number_label", "document_number_label", "status_label", "sheet_name"):
+            value = values.get(key)
+            if isinstance(value, str) and value.strip():
+                setattr(result, key, value.strip())
+        return result
+
+
+def _sheet_title(name: str) -> str:
+    """Имя листа Excel: без запрещенных символов и не длиннее 31 символа"""
+    return re.sub(r'[\[\]:*?/\\]', '_', name)[:31] or "Sheet1"
+
+
+def _safe_filename(name: str) -> str:
+    return re.sub(r'[^\w.\-]+', '_', name or "").strip('_') or "transmittal"
+
+
+def _header_row(sheet, values: Iterable[Any]):
+    bold = Font(bold=True)
+    cells = []
+    for value in values:
+        cell = WriteOnlyCell(sheet, value=value)
+        cell.font = bold
+        cells.append(cell)
+    sheet.append(cells)
+
+
+def _naive(value):
+    # Excel не хранит часовой пояс
+    return value.replace(tzinfo=None) if value is not None and getattr(value, "tzinfo", None) else value
+
+
+def _save_workbook(workbook: Workbook, prefix: str) -> str:
+    """Сохраняет книгу во временный файл; путь удаляет вызывающий после отдачи ответа"""
+    fd, path = tempfile.mkstemp(prefix=prefix, suffix=".xlsx")
+    os.close(fd)
+    try:
+        workbook.save(path)
+    except Exception:
+        os.remove(path)
+        raise
+    return path
+
+
+def get_export_transmittal(db: Session, transmittal_id: int) -> Transmittal:
+    transmittal = db.query(Transmittal).filter(
+        Transmittal.id == transmittal_id, Transmittal.is_deleted == 0
+    ).first()
+    if not transmittal:
+        raise TransmittalExportError("Трансмиттал не найден", status_code=404)
+    return transmittal
+
+
+def _transmittal_lines(db: Session, transmittal_id: int):
+    """Строки трансмиттала порциями по EXPORT_FETCH_SIZE, отсортированные по номеру документа"""
+    return db.query(
+        Document.number,
+        Document.title,
+        DocumentRevision.number,
+        RevisionDescription.code,
+        RevisionStatus.name,
+        DocumentRevision.file_name,
+        DocumentRevision.file_size
+    ).select_from(TransmittalRevision).join(
+        DocumentRevision, DocumentRevision.id == TransmittalRevision.revision_id
+    ).join(
+        Document, Document.id == DocumentRevision.document_id
+    ).outerjoin(
+        RevisionDescription, RevisionDescription.id == DocumentRevision.revision_description_id
+    ).outerjoin(
+        RevisionStatus, RevisionStatus.id == DocumentRevision.revision_status_id
+    ).filter(
+        TransmittalRevision.transmittal_id == transmittal_id
+    ).order_by(
+        Document.number, TransmittalRevision.id
+    ).yield_per(EXPORT_FETCH_SIZE)
+
+
+def _transmittal_header(db: Session, transmittal: Transmittal) -> Dict[str, Any]:
+    row = db.query(
+        Project.name, Project.project_code, Company.name, TransmittalStatus.name
+    ).select_from(Transmittal).outerjoin(
+        Project, Project.id == Transmittal.project_id
+    ).outerjoin(
+        Company, Company.id == Transmittal.counterparty_id
+    ).outerjoin(
+        TransmittalStatus, TransmittalStatus.id == Transmittal.status_id
+    ).filter(Transmittal.id == transmittal.id).one()
+    project_name, project_code, counterparty_name, status_name = row
+    return {
+        "project": f"{project_code} {project_name}".strip() if project_code else project_name,
+        "counterparty": counterparty_name,
+        "status": status_name or "draft"
+    }
+
+
+def export_transmittal_xlsx(db: Session, transmittal_id: int, user_id: int) -> Dict[str, Any]:
+    """
+    Лист трансмиттала: метаданные (подпись в ячейке, значение справа — как их ищет импорт)
+    и таблица документов. Строки пишутся в книгу write-only по мере чтения из БД,
+    поэтому память не зависит от числа строк. Возвращает {path, filename, rows}.
+
+    Raises:
+        TransmittalExportError: трансмиттал не найден
+    """
+    timer = StageTimer()
+    transmittal = get_export_transmittal(db, transmittal_id)
+    export_settings = ExportSettings.load(db, transmittal.project_id, transmittal.counterparty_id, user_id)
+    header = _transmittal_header(db, transmittal)
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(_sheet_title(export_settings.sheet_name))
+    sheet.append([export_settings.transmittal_number_label, transmittal.transmittal_number])
+    sheet.append(["Title", transmittal.title])
+    sheet.append(["Project", header["project"]])
+    sheet.append(["Counterparty", header["counterparty"]])
+    sheet.append(["Direction", transmittal.direction])
+    sheet.append(["Date", _naive(transmittal.transmittal_date or transmittal.created_at)])
+    sheet.append([])
+    _header_row(sheet, [
+        "No", export_settings.document_number_label, "Title", "Revision",
+        "Revision Description", export_settings.status_label, "File Name", "File Size"
+    ])
+
+    rows = 0
+    with timer.stage("rows"):
+        for line in _transmittal_lines(db, transmittal_id):
+            rows += 1
+            sheet.append([rows, *line])
+
+    with timer.stage("save"):
+        path = _save_workbook(workbook, f"transmittal_{transmittal_id}_")
+    record_metric("transmittal_export", timer.as_dict(), transmittal_id=transmittal_id, format="xlsx", rows=rows)
+    return {
+        "path": path,
+        "filename": f"{_safe_filename(transmittal.transmittal_number)}.xlsx",
+        "rows": rows
+    }
+
+
+def export_transmittal_register_xlsx(
+    db: Session,
+    project_id: int,
+    user_id: int,
+    direction: Optional[str] = None,
+    status: Optional[str] = None,
+    counterparty_id: Optional[int] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None
+) -> Dict[str, Any]:
+    """
+    Реестр трансмитталов проекта с теми же фильтрами, что и список: одна строка на трансмиттал
+    с количеством ревизий и суммарным размером файлов. Возвращает {path, filename, rows}.
+
+    Raises:
+        TransmittalExportError: проект не найден
+    """
+    timer = StageTimer()
+    project = db.query(Project).filter(Project.id == project_id).first()
+    if not project:
+        raise TransmittalExportError("Проект не найден", status_code=404)
+    export_settings = ExportSettings.load(db, project_id, counterparty_id, user_id)
+
+    revisions_count = func.count(TransmittalRevision.id)
+    total_file_size = func.coalesce(func.sum(DocumentRevision.file_size), 0)
+    query = db.query(
+        Transmittal.transmittal_number,
+        Transmittal.title,
+        Transmittal.direction,
+        Company.name,
+        Transmittal.transmittal_date,
+        TransmittalStatus.name,
+        revisions_count,
+        total_file_size,
+        User.full_name,
+        Transmittal.created_at
+    ).outerjoin(
+        TransmittalStatus, TransmittalStatus.id == Transmittal.status_id
+    ).outerjoin(
+        Company, Company.id == Transmittal.counterparty_id
+    ).outerjoin(
+        User, User.id == Transmittal.created_by
+    ).outerjoin(
+        TransmittalRevision, TransmittalRevision.transmittal_id == Transmittal.id
+    ).outerjoin(
+        DocumentRevision, DocumentRevision.id == TransmittalRevision.revision_id
+    ).filter(
+        Transmittal.is_deleted == 0,
+        Transmittal.project_id == project_id
+    )
+    if direction:
+        query = query.filter(Transmittal.direction == direction)
+    if status:
+        query = query.filter(TransmittalStatus.name == status)
+    if counterparty_id:
+        query = query.filter(Transmittal.counterparty_id == counterparty_id)
+    if date_from:
+        query = query.filter(Transmittal.transmittal_date >= date_from)
+    if date_to:
+        query = query.filter(Transmittal.transmittal_date < date_to + timedelta(days=1))
+    query = query.group_by(
+        Transmittal.id, TransmittalStatus.name, Company.name, User.full_name
+    ).order_by(Transmittal.transmittal_date.desc().nulls_last(), Transmittal.id.desc())
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(_sheet_title("Register"))
+    _header_row(sheet, [
+        export_settings.transmittal_number_label, "Title", "Direction", "Counterparty", "Date",
+        export_settings.status_label, "Revisions", "Total File Size", "Created By", "Created At"
+    ])
+
+    rows = 0
+    with timer.stage("rows"):
+        for (number, title, row_direction, counterparty, transmittal_date, status_name,
+             count, size, created_by, created_at) in query.yield_per(EXPORT_FETCH_SIZE):
+            rows += 1
+            sheet.append([
+                number, title, row_direction, counterparty, _naive(transmittal_date),
+                status_name, count, size, created_by, _naive(created_at)
+            ])
+
+    with timer.stage("save"):
+        path = _save_workbook(workbook, f"register_{project_id}_")
+    record_metric("transmittal_export", timer.as_dict(), project_id=project_id, format="register_xlsx", rows=rows)
+    code = project.project_code or f"project_{project_id}"
+    return {
+        "path": path,
+        "filename": f"{_safe_filename(code)}_transmittal_register.xlsx",
+        "rows": rows
+    }
+
+
+def _cover_sheet_version(db: Session, transmittal: Transmittal, export_settings: ExportSettings) -> str:
+    """
+    Версия титульного листа: меняется при изменении трансмиттала, его состава или настроек экспорта.
+    Состав учитывается агрегатом без чтения строк.
+    """
+    count, id_sum, max_id = db.query(
+        func.count(TransmittalRevision.id),
+        func.coalesce(func.sum(TransmittalRevision.revision_id), 0),
+        func.coalesce(func.max(TransmittalRevision.id), 0)
+    ).filter(TransmittalRevision.transmittal_id == transmittal.id).one()
+    source = "|".join(str(part) for part in (
+        transmittal.updated_at.isoformat() if transmittal.updated_at else "",
+        count, id_sum, max_id, export_settings.version
+    ))
+    return hashlib.sha256(source.encode()).hexdigest()[:16]
+
+
+def export_transmittal_cover_pdf(db: Session, transmittal_id: int, user_id: int) -> Dict[str, Any]:
+    """
+    Титульный лист трансмиттала в PDF. Файл кешируется в EXPORT_CACHE_DIR по версии трансмиттала:
+    пока трансмиттал и его состав не меняются, повторная выгрузка не строит PDF заново.
+    Возвращает {path, filename, cached}.
+
+    Raises:
+        TransmittalExportError: трансмиттал не найден или не установлен reportlab
+    """
+    try:
+        from reportlab.lib import colors
+        from reportlab.lib.pagesizes import A4
+        from reportlab.lib.styles import getSampleStyleSheet
+        from reportlab.platypus import SimpleDocTemplate, Paragraph, Table, TableStyle, Spacer
+    except ImportError:
+        raise TransmittalExportError(
+            "Экспорт в PDF недоступен: не установлен пакет reportlab", status_code=501
+        )
+
+    transmittal = get_export_transmittal(db, transmittal_id)
+    export_settings = ExportSettings.load(db, transmittal.project_id, transmittal.counterparty_id, user_id)
+    version = _cover_sheet_version(db, transmittal, export_settings)
+    filename = f"{_safe_filename(transmittal.transmittal_number)}_cover.pdf"
+
+    cache_dir = os.path.join(settings.EXPORT_CACHE_DIR, "transmittals")
+    path = os.path.join(cache_dir, f"transmittal_{transmittal_id}_{version}.pdf")
+    if os.path.exists(path):
+        return {"path": path, "filename": filename, "cached": True}
+
+    timer = StageTimer()
+    os.makedirs(cache_dir, exist_ok=True)
+    header = _transmittal_header(db, transmittal)
+    styles = getSampleStyleSheet()
+    transmittal_date = transmittal.transmittal_date or transmittal.created_at
+
+    story = [
+        Paragraph(f"{export_settings.transmittal_number_label}: {transmittal.transmittal_number}", styles["Title"]),
+        Paragraph(transmittal.title or "", styles["Heading2"]),
+        Table([
+            ["Project", header["project"] or ""],
+            ["Counterparty", header["counterparty"] or ""],
+            ["Direction", transmittal.direction or ""],
+            ["Date", transmittal_date.strftime("%Y-%m-%d") if transmittal_date else ""],
+            [export_settings.status_label, header["status"]],
+        ], colWidths=[120, 360]),
+        Spacer(1, 12),
+    ]
+    table_rows = [["No", export_settings.document_number_label, "Revision", export_settings.status_label]]
+    with timer.stage("rows"):
+        for index, (number, _, revision, _, status_name, _, _) in enumerate(_transmittal_lines(db, transmittal_id), 1):
+            table_rows.append([index, number, revision, status_name or ""])
+    table = Table(table_rows, colWidths=[40, 260, 80, 100], repeatRows=1)
+    table.setStyle(TableStyle([
+        ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
+        ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
+    ]))
+    story.append(table)
+
+    # Пишем во временный файл и переименовываем: параллельный запрос не увидит недописанный PDF
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    os.close(fd)
+    try:
+        with timer.stage("render"):
+            SimpleDocTemplate(tmp_path, pagesize=A4, title=transmittal.transmittal_number).build(story)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+
+    # Предыдущие версии титульного листа больше не нужны
+    prefix = f"transmittal_{transmittal_id}_"
+    for name in os.listdir(cache_dir):
+        if name.startswith(prefix) and name.endswith(".pdf") and os.path.join(cache_dir, name) != path:
+            try:
+                os.remove(os.path.join(cache_dir, name))
+            except OSError:
+                pass
+
+    record_metric(
+        "transmittal_export", timer.as_dict(), transmittal_id=transmittal_id, format="pdf", rows=len(table_rows) - 1
+    )
+    return {"path": path, "filename": filename, "cached": False}
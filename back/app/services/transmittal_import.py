@@ -0,0 +1,736 @@
+"""
+Импорт входящих трансмитталов из Excel (логика, общая для API и фоновых задач)
+"""
+
+import re
+import sys
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, Any, Iterable, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.core.metrics import StageTimer, record_metric
+from app.models.transmittal import Transmittal
+from app.models.references import Company
+from app.services.excel_readers import read_sheet, SheetNotFoundError, ExcelReadError
+from app.services.transmittal_import_profile import (
+    ImportProfile, ImportProfileError, TableFieldsProfile, get_import_profile, as_table_profile, as_metadata_fields
+)
+from app.services.transmittal_revisions import (
+    find_documents_by_numbers, get_latest_revision_ids, attach_revisions
+)
+from app.services.transmittal_status import RECEIVED_STATUS, TransmittalStatusError, get_transmittal_status_id
+
+logger = logging.getLogger(__name__)
+
+
+def get_localized_message(key: str, **kwargs) -> str:
+    """Возвращает локализованное сообщение"""
+    messages = {
+        "IMPORT_SETTINGS_NOT_FOUND": "Настройки импорта не найдены для компании: {company_name}",
+        "INVALID_SETTINGS_FORMAT": "Неверный формат настроек импорта",
+        "MISSING_SHEET_NAME": "Не указано имя листа в настройках",
+        "MISSING_METADATA_FIELDS": "Не указаны поля метаданных в настройках",
+        "WORKSHEET_NOT_FOUND": "Лист '{sheet_name}' не найден в Excel файле",
+        "EXCEL_READ_ERROR": "Ошибка чтения Excel файла: {error}",
+        "IMPORT_METADATA_NOT_FOUND": "Не найдены поля метаданных: {fields}",
+        "MISSING_TABLE_FIELDS": "Не указаны поля таблицы в настройках",
+        "IMPORT_TABLE_FIELDS_NOT_FOUND": "Поля не найдены в таблице файла: {fields}. Проверьте настройки импорта.",
+        "STATUS_NOT_FOUND": "Статус 'Received' не найден в системе",
+        "IMPORT_MISSING_DOCUMENTS": "Следующие документы не найдены в проекте: {documents}",
+        "IMPORT_DUPLICATE": "Трансмиттал с номером '{transmittal_number}' уже существует",
+        "IMPORT_GENERAL_ERROR": "Ошибка импорта: {error}",
+        "IMPORT_PREVIEW_EXPIRED": "Предпросмотр устарел, загрузите файл повторно"
+    }
+    
+    message = messages.get(key, key)
+    return message.format(**kwargs)
+
+
+class TransmittalImportError(Exception):
+    """Ошибка импорта трансмиттала с локализованным сообщением"""
+
+    def __init__(self, detail: str, status_code: int = 400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+
+def run_transmittal_import(
+    db: Session,
+    contents: bytes,
+    filename: str,
+    project_id: int,
+    counterparty_id: int,
+    user_id: int,
+    include_timings: bool = False
+) -> Dict[str, Any]:
+    """
+    Импортирует входящий трансмиттал из содержимого Excel файла.
+    Время этапов (profile, parse, label_detection, document_resolution, inserts, commit)
+    записывается метрикой transmittal_import; при include_timings возвращается в поле timings.
+
+    Raises:
+        TransmittalImportError: ошибка настроек, файла или данных (с локализованным сообщением)
+    """
+    return timed_import(
+        lambda timer: _import_transmittal(db, contents, filename, project_id, counterparty_id, user_id, timer),
+        project_id,
+        counterparty_id,
+        include_timings,
+        file_size=len(contents)
+    )
+
+
+def timed_import(
+    import_step: Callable[[StageTimer], Dict[str, Any]],
+    project_id: int,
+    counterparty_id: int,
+    include_timings: bool = False,
+    **labels: Any
+) -> Dict[str, Any]:
+    """
+    Выполняет import_step(timer) и записывает время этапов метрикой transmittal_import
+    (в том числе для неудачных импортов); при include_timings добавляет его в результат
+    """
+    timer = StageTimer()
+    outcome = "error"
+    rows_count = None
+    try:
+        result = import_step(timer)
+        outcome = "ok"
+        rows_count = result["table_rows_count"]
+        if include_timings:
+            result["timings"] = timer.as_dict()
+        return result
+    except TransmittalImportError as e:
+        outcome = "rejected" if e.status_code < 500 else "error"
+        raise
+    finally:
+        record_metric(
+            "transmittal_import",
+            timer.as_dict(),
+            outcome=outcome,
+            project_id=project_id,
+            counterparty_id=counterparty_id,
+            rows=rows_count,
+            **labels
+        )
+
+
+@dataclass
+class ParsedLoadSheet:
+    """Результат разбора листа трансмиттала (без обращений к БД, передается между процессами)"""
+    metadata: Dict[str, str]
+    document_numbers: List[str]
+    transmittal_number: str
+    table_rows_count: int
+
+
+def load_import_profile(db: Session, project_id: int, counterparty_id: int, user_id: int) -> ImportProfile:
+    """
+    Скомпилированный профиль импорта для данной компании (из кеша процесса)
+
+    Raises:
+        TransmittalImportError: настройки не найдены или некорректны
+    """
+    try:
+        profile = get_import_profile(db, project_id, counterparty_id, user_id)
+    except ImportProfileError as e:
+        raise TransmittalImportError(get_localized_message(e.key, **e.kwargs))
+    
+    if not profile:
+        # Получаем название компании для более понятного сообщения
+        company = db.query(Company).filter(Company.id == counterparty_id).first()
+        company_name = company.name if company else f"ID {counterparty_id}"
+        raise TransmittalImportError(get_localized_message("IMPORT_SETTINGS_NOT_FOUND", company_name=company_name))
+    return profile
+
+
+def get_received_status_id(db: Session) -> int:
+    """ID статуса "Received" (с заглавной буквы) для входящих трансмитталов"""
+    try:
+        return get_transmittal_status_id(db, RECEIVED_STATUS)
+    except TransmittalStatusError:
+        raise TransmittalImportError(get_localized_message("STATUS_NOT_FOUND"), status_code=500)
+
+
+def parse_load_sheet(
+    contents: bytes,
+    profile: ImportProfile,
+    sheet_name: Optional[str] = None,
+    timer: Optional[StageTimer] = None
+) -> ParsedLoadSheet:
+    """
+    Разбирает лист трансмиттала по профилю: метаданные, номера документов и номер
+    трансмиттала. Не обращается к БД, поэтому может выполняться в отдельном процессе.
+    sheet_name — лист книги (по умолчанию лист из профиля).
+
+    Raises:
+        TransmittalImportError: лист не читается или не соответствует профилю
+    """
+    timer = timer or StageTimer()
+    sheet_name = sheet_name or profile.sheet_name
+    
+    # Лист читается потоково (без DataFrame) и по мере чтения приводится к нормализованной
+    # сетке — один раз для всех поисков лейблов
+    try:
+        with timer.stage("parse"):
+            grid = SheetGrid.from_rows(read_sheet(contents, sheet_name))
+    except SheetNotFoundError:
+        raise TransmittalImportError(
+            get_localized_message("WORKSHEET_NOT_FOUND", sheet_name=sheet_name)
+        )
+    except ExcelReadError as e:
+        raise TransmittalImportError(get_localized_message("EXCEL_READ_ERROR", error=str(e)))
+
+    return parse_grid(grid, profile, timer)
+
+
+def parse_grid(grid: "SheetGrid", profile: ImportProfile, timer: Optional[StageTimer] = None) -> ParsedLoadSheet:
+    """
+    Разбор уже построенной сетки листа по профилю (см. parse_load_sheet)
+
+    Raises:
+        TransmittalImportError: лист не соответствует профилю
+    """
+    timer = timer or StageTimer()
+
+    # Извлекаем метаданные (если они настроены)
+    metadata = {}
+    if profile.metadata_fields:
+        with timer.stage("label_detection"):
+            metadata = extract_metadata(grid, profile.metadata_fields)
+        
+        # Проверяем, что найдены все необходимые метаданные
+        missing_metadata = [field.label for field in profile.metadata_fields if not metadata.get(field.key)]
+        if missing_metadata:
+            raise TransmittalImportError(
+                get_localized_message("IMPORT_METADATA_NOT_FOUND", fields=','.join(missing_metadata))
+            )
+    
+    # Поля таблицы и источник номера трансмиттала проверены при компиляции профиля
+    table_fields = profile.table
+    
+    with timer.stage("label_detection"):
+        # Находим начало таблицы
+        table_start_row, missing_fields = find_table_start(grid, table_fields)
+        
+        if table_start_row is None:
+            raise TransmittalImportError(
+                get_localized_message("IMPORT_TABLE_FIELDS_NOT_FOUND", fields=','.join(missing_fields))
+            )
+        
+        document_numbers = extract_document_numbers(grid, table_fields, table_start_row)
+        
+        # Источник номера трансмиттала: метаданные или таблица
+        transmittal_number = ''
+        if profile.has_metadata_number:
+            transmittal_number = metadata.get('transmittal_number', '').strip()
+        elif profile.has_table_number:
+            transmittal_number = find_transmittal_number_in_table(grid, table_fields, table_start_row)
+    
+    return ParsedLoadSheet(
+        metadata=metadata,
+        document_numbers=document_numbers,
+        transmittal_number=transmittal_number,
+        table_rows_count=grid.shape[0] - table_start_row
+    )
+
+
+def write_transmittal(
+    db: Session,
+    parsed: ParsedLoadSheet,
+    profile: ImportProfile,
+    filename: str,
+    project_id: int,
+    counterparty_id: int,
+    user_id: int,
+    received_status_id: int,
+    timer: Optional[StageTimer] = None
+) -> Dict[str, Any]:
+    """
+    Проверяет документы разобранного листа и создает трансмиттал с ревизиями
+    в одной транзакции. При ошибке транзакция откатывается.
+
+    Raises:
+        TransmittalImportError: документы не найдены, номер не найден или уже существует
+    """
+    timer = timer or StageTimer()
+    try:
+        # Проверяем все документы и определяем их последние ревизии, не создавая трансмиттал
+        with timer.stage("document_resolution"):
+            revision_ids, missing_documents = resolve_document_revisions(
+                db, project_id, parsed.document_numbers
+            )
+        
+        # Если есть несуществующие документы, возвращаем ошибку
+        if missing_documents:
+            missing_docs_str = ', '.join(missing_documents)
+            raise TransmittalImportError(get_localized_message("IMPORT_MISSING_DOCUMENTS", documents=missing_docs_str))
+        
+        if not profile.has_metadata_number and not profile.has_table_number:
+            # Ничего не настроено - ошибка
+            raise TransmittalImportError(get_localized_message("IMPORT_NO_SOURCE_CONFIGURED"))
+        
+        # Проверяем, что номер найден
+        transmittal_number = parsed.transmittal_number
+        if not transmittal_number:
+            if profile.has_metadata_number:
+                raise TransmittalImportError(get_localized_message("IMPORT_TRANSMITTAL_NOT_FOUND_METADATA"))
+            else:
+                raise TransmittalImportError(get_localized_message("IMPORT_TRANSMITTAL_NOT_FOUND_TABLE"))
+        
+        transmittal = Transmittal(
+            transmittal_number=transmittal_number,
+            project_id=project_id,
+            counterparty_id=counterparty_id,
+            direction='in',
+            status_id=received_status_id,
+            created_by=user_id,
+            transmittal_date=datetime.now(),
+            title=f"Входящий трансмиттал {transmittal_number}",
+            description=f"Импортирован из Excel файла: {filename}"
+        )
+        
+        with timer.stage("inserts"):
+            db.add(transmittal)
+            db.flush()
+            
+            # Ревизии, найденные при проверке, добавляем одним INSERT в той же транзакции
+            created_revisions = attach_revisions(db, transmittal.id, revision_ids)
+        with timer.stage("commit"):
+            db.commit()
+        db.refresh(transmittal)
+        
+        return {
+            "message": "Трансмиттал успешно импортирован",
+            "transmittal_id": transmittal.id,
+            "transmittal_number": transmittal.transmittal_number,
+            "metadata": parsed.metadata,
+            "table_rows_count": parsed.table_rows_count,
+            "created_revisions_count": len(created_revisions)
+        }
+        
+    except TransmittalImportError:
+        # Ошибка уже сформирована, просто пробрасываем её
+        db.rollback()
+        raise
+    except Exception as e:
+        db.rollback()
+        raise import_error_from_exception(e, parsed.transmittal_number)
+
+
+def import_error_from_exception(e: Exception, transmittal_number: str = '') -> TransmittalImportError:
+    """Локализованная ошибка импорта для непредвиденного исключения (в т.ч. дубликата номера)"""
+    # Обрабатываем ошибку уникальности номера трансмиттала
+    if "UniqueViolation" in str(e) and "transmittal_number" in str(e):
+        if not transmittal_number:
+            # Извлекаем номер из SQL ошибки
+            match = re.search(r'\(transmittal_number\)=\(([^)]+)\)', str(e))
+            transmittal_number = match.group(1) if match else 'неизвестный'
+        return TransmittalImportError(get_localized_message("IMPORT_DUPLICATE", transmittal_number=transmittal_number))
+    
+    return TransmittalImportError(get_localized_message("IMPORT_GENERAL_ERROR", error=str(e)), status_code=500)
+
+
+def _import_transmittal(
+    db: Session,
+    contents: bytes,
+    filename: str,
+    project_id: int,
+    counterparty_id: int,
+    user_id: int,
+    timer: StageTimer
+) -> Dict[str, Any]:
+    """Этапы импорта трансмиттала (см. run_transmittal_import)"""
+    with timer.stage("profile"):
+        profile = load_import_profile(db, project_id, counterparty_id, user_id)
+    
+    try:
+        parsed = parse_load_sheet(contents, profile, timer=timer)
+        received_status_id = get_received_status_id(db)
+    except TransmittalImportError:
+        db.rollback()
+        raise
+    except Exception as e:
+        db.rollback()
+        raise import_error_from_exception(e)
+    
+    return write_transmittal(
+        db, parsed, profile, filename, project_id, counterparty_id, user_id, received_status_id, timer
+    )
+
+
+def _cell_text(value: Any) -> str:
+    """
+    Нормализованный текст ячейки: str(value).strip(), пустая ячейка (None/NaN) — '',
+    целые числа с плавающей точкой — без '.0' (как pd.read_excel)
+    """
+    if value is None:
+        return ''
+    if isinstance(value, float):
+        if value != value:
+            return ''
+        if value.is_integer():
+            return str(int(value))
+    return str(value).strip()
+
+
+class SheetGrid:
+    """
+    Лист Excel, один раз приведенный к нормализованным строкам
+    (str(value).strip() непустых ячеек в порядке обхода строк) для векторного поиска лейблов
+    """
+
+    # Разделитель ячеек в общем текстовом буфере (в лейблах не встречается)
+    _SEPARATOR = '\x00'
+
+    def __init__(self, values: np.ndarray):
+        """values — 2D ndarray (dtype=object) значений ячеек, пустые — None или NaN"""
+        self._values = values
+        self.shape = values.shape
+
+        rows, cols = np.nonzero(values != None)  # noqa: E711 — поэлементное сравнение numpy
+        cells = np.array([_cell_text(value) for value in values[rows, cols]], dtype=object)
+        non_empty = cells != ''
+
+        self.rows = rows[non_empty]
+        self.cols = cols[non_empty]
+        self.cells = cells[non_empty]
+        self._text = None
+        self._cell_starts = None
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Sequence[Any]], header: bool = True) -> "SheetGrid":
+        """
+        Сетка из строк листа (итератор excel_readers.read_sheet), собираемая по мере
+        чтения: сохраняются только непустые ячейки, строки листа не накапливаются.
+        Строки нумеруются как в pd.read_excel(header=0): первая строка листа — заголовок
+        и в сетку не входит, пустые строки в конце отбрасываются.
+        """
+        cell_rows: List[int] = []
+        cell_cols: List[int] = []
+        cell_values: List[Any] = []
+        row_count = 0
+        width = 0
+        # Ширина строк после последней непустой: учитывается, только если ниже найдется непустая
+        pending_width = 0
+        rows = iter(rows)
+        if header:
+            next(rows, None)
+        for row_idx, row in enumerate(rows):
+            pending_width = max(pending_width, len(row))
+            non_empty = False
+            for col_idx, value in enumerate(row):
+                if value is None or value == '':
+                    continue
+                cell_rows.append(row_idx)
+                cell_cols.append(col_idx)
+                cell_values.append(value)
+                if not non_empty and _cell_text(value) != '':
+                    non_empty = True
+            if non_empty:
+                row_count = row_idx + 1
+                width = max(width, pending_width)
+                pending_width = 0
+
+        values = np.empty((row_count, width), dtype=object)
+        for row_idx, col_idx, value in zip(cell_rows, cell_cols, cell_values):
+            if row_idx < row_count:
+                values[row_idx, col_idx] = value
+        return cls(values)
+
+    @classmethod
+    def from_dataframe(cls, excel_data) -> "SheetGrid":
+        """Сетка из DataFrame (для кода, который уже прочитал лист через pandas)"""
+        values = excel_data.to_numpy(dtype=object)
+        values[excel_data.isna().to_numpy()] = None
+        return cls(values)
+
+    def memory_size(self) -> int:
+        """
+        Оценка занимаемой памяти в байтах (массивы + строки ячеек; исходные значения
+        считаются сопоставимыми по размеру с нормализованным текстом)
+        """
+        arrays = self._values.nbytes + self.rows.nbytes + self.cols.nbytes + self.cells.nbytes
+        return arrays + 2 * sum(sys.getsizeof(cell) for cell in self.cells)
+
+    def __getstate__(self):
+        # Сохраняются массивы сетки; текстовый буфер поиска пересобирается при первом поиске
+        state = self.__dict__.copy()
+        state["_text"] = None
+        state["_cell_starts"] = None
+        return state
+
+    def value(self, row_idx: int, col_idx: int) -> str:
+        """Нормализованное значение ячейки ('' для пустой или вне листа)"""
+        if not (0 <= row_idx < self.shape[0] and 0 <= col_idx < self.shape[1]):
+            return ''
+        return _cell_text(self._values[row_idx, col_idx])
+
+    def row(self, row_idx: int) -> List[str]:
+        """Нормализованные значения строки"""
+        if not 0 <= row_idx < self.shape[0]:
+            return []
+        return [_cell_text(value) for value in self._values[row_idx]]
+
+    def column(self, col_idx: int, start_row: int = 0) -> List[str]:
+        """Нормализованные значения колонки начиная со строки start_row"""
+        if not 0 <= col_idx < self.shape[1]:
+            return []
+        return [_cell_text(value) for value in self._values[start_row:, col_idx]]
+
+    def match_exact(self, labels: List[str]) -> np.ndarray:
+        """Номер лейбла (позиция в labels) для каждой непустой ячейки или -1 — один проход по листу"""
+        label_ids = np.full(len(self.cells), -1, dtype=np.int64)
+        # В обратном порядке, чтобы при дублях лейблов побеждал первый
+        for i in reversed(range(len(labels))):
+            label_ids[self.cells == labels[i]] = i
+        return label_ids
+
+    def match_contains(self, labels: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Позиции (в self.cells) ячеек, содержащих каждый лейбл. Все ячейки склеены
+        в один текстовый буфер и просматриваются одним регулярным выражением по всем
+        лейблам; затем лейблы сопоставляются только с найденными ячейками-кандидатами.
+        """
+        if self._text is None:
+            self._text = self._SEPARATOR.join(self.cells)
+            lengths = np.fromiter((len(cell) + 1 for cell in self.cells), dtype=np.int64, count=len(self.cells))
+            self._cell_starts = np.concatenate(([0], np.cumsum(lengths)[:-1])).astype(np.int64)
+
+        patterns = [label for label in dict.fromkeys(labels) if label and self._SEPARATOR not in label]
+        candidates = np.array([], dtype=np.int64)
+        if patterns:
+            pattern = re.compile('|'.join(re.escape(label) for label in patterns))
+            offsets = np.fromiter((m.start() for m in pattern.finditer(self._text)), dtype=np.int64)
+            candidates = np.unique(np.searchsorted(self._cell_starts, offsets, side='right') - 1)
+        candidate_cells = self.cells[candidates]
+
+        result = {}
+        for label in labels:
+            if not label:
+                result[label] = np.arange(len(self.cells))
+                continue
+            hits = np.fromiter((label in cell for cell in candidate_cells), dtype=bool, count=len(candidate_cells))
+            result[label] = candidates[hits]
+        return result
+
+
+def _as_grid(excel_data) -> SheetGrid:
+    return excel_data if isinstance(excel_data, SheetGrid) else SheetGrid.from_dataframe(excel_data)
+
+
+_POSITION_OFFSETS = {
+    'right': (0, 1),
+    'left': (0, -1),
+    'below': (1, 0),
+    'above': (-1, 0),
+}
+
+
+def extract_metadata(excel_data, metadata_fields) -> Dict[str, str]:
+    """
+    Извлекает метаданные из Excel файла по настройкам.
+    excel_data — DataFrame или уже построенная SheetGrid;
+    metadata_fields — словарь из настроек или поля скомпилированного профиля.
+    """
+    grid = _as_grid(excel_data)
+    fields = as_metadata_fields(metadata_fields)
+    metadata = {}
+
+    matches = grid.match_contains([field.label for field in fields])
+
+    for field in fields:
+        field_key = field.key
+        offset = _POSITION_OFFSETS.get(field.position)
+        positions = matches[field.label]
+        if not len(positions):
+            continue
+
+        # В каждой строке учитывается только первая ячейка с лейблом;
+        # берется первая строка, где значение в указанной позиции не пустое
+        rows = grid.rows[positions]
+        first_in_row = np.concatenate(([True], rows[1:] != rows[:-1]))
+        for position in positions[first_in_row]:
+            if offset is None:
+                continue
+            value = grid.value(grid.rows[position] + offset[0], grid.cols[position] + offset[1])
+            if value:
+                metadata[field_key] = value
+                break
+
+    return metadata
+
+def find_table_start(excel_data, table_fields) -> tuple[int, list[str]]:
+    """
+    Находит начало таблицы по заголовкам и возвращает отсутствующие поля.
+    excel_data — DataFrame или уже построенная SheetGrid;
+    table_fields — словарь из настроек или TableFieldsProfile.
+    """
+    # Пустые поля не нужны для поиска заголовков — отфильтрованы в профиле
+    table_field_labels = list(as_table_profile(table_fields).labels)
+    
+    # Если нет полей для поиска, возвращаем ошибку
+    if not table_field_labels:
+        return None, ["Нет настроенных полей для поиска в таблице"]
+
+    grid = _as_grid(excel_data)
+    label_ids = grid.match_exact(table_field_labels)
+    hit = label_ids >= 0
+    n_labels = len(table_field_labels)
+
+    # Уникальные пары (строка, лейбл) -> количество разных лейблов в строке
+    pairs = np.unique(grid.rows[hit] * n_labels + label_ids[hit])
+    labels_per_row = np.bincount(pairs // n_labels, minlength=grid.shape[0])
+    
+    # Первая строка, в которой найдены ВСЕ заголовки - начало таблицы
+    full_rows = np.flatnonzero(labels_per_row == n_labels)
+    if len(full_rows):
+        return int(full_rows[0]), []
+    
+    # Иначе — поля, которых нет нигде на листе
+    found_ids = set(np.unique(label_ids[hit]).tolist())
+    missing_fields = [label for i, label in enumerate(table_field_labels) if i not in found_ids]
+    return None, missing_fields
+
+
+def extract_document_numbers(
+    grid: SheetGrid,
+    table_fields: Dict[str, str] | TableFieldsProfile,
+    header_row_idx: int = 0
+) -> List[str]:
+    """Номера документов из строк данных таблицы (строка заголовка header_row_idx), без обращений к БД"""
+    # Нормализованные лейблы и предикаты колонок из профиля
+    table_profile = as_table_profile(table_fields)
+    
+    logger.debug(
+        "Transmittal table: header_row=%s document_label=%r status_label=%r",
+        header_row_idx, table_profile.document_number_label, table_profile.status_label
+    )
+    
+    # Находим индексы колонок в строке заголовка
+    document_number_col = None
+    status_col = None
+    
+    header_row = grid.row(header_row_idx)
+    
+    for col_idx, cell_str in enumerate(header_row):
+        if cell_str:
+            cell_lower = cell_str.lower()
+            
+            # Ищем колонку номера документа
+            if document_number_col is None and table_profile.is_document_number_column(cell_lower):
+                document_number_col = col_idx
+            
+            # Ищем колонку статуса
+            if status_col is None and table_profile.is_status_column(cell_lower):
+                status_col = col_idx
+    
+    if document_number_col is None:
+        # Заголовок обрезается, чтобы не писать в лог всю строку листа
+        logger.warning(
+            "Transmittal table: document number column not found in header row %s (%s)",
+            header_row_idx, [cell for cell in header_row if cell][:20]
+        )
+        return []
+    logger.debug("Transmittal table: document_col=%s status_col=%s", document_number_col, status_col)
+    
+    # Номера документов из строк данных (после заголовка), без построчных запросов
+    document_numbers = [number for number in grid.column(document_number_col, header_row_idx + 1) if number]
+    logger.debug("Transmittal table: %d document numbers", len(document_numbers))
+    return document_numbers
+
+
+def resolve_document_revisions(
+    db: Session,
+    project_id: int,
+    document_numbers: Sequence[str]
+) -> tuple[list[int], list[str]]:
+    """
+    Последние ревизии документов по номерам (фиксированное число запросов на весь лист).
+    Возвращает (revision_ids, missing_documents); при отсутствующих документах revision_ids пуст.
+    """
+    # Все документы — одним запросом, последние ревизии — одним запросом с ROW_NUMBER()
+    documents = find_documents_by_numbers(db, project_id, document_numbers)
+    latest_revisions = get_latest_revision_ids(db, documents.values())
+    
+    revision_ids = []
+    missing_documents = []  # Список несуществующих документов
+    for document_number in document_numbers:
+        document_id = documents.get(document_number)
+        if document_id is None:
+            missing_documents.append(document_number)
+        elif document_id not in latest_revisions:
+            missing_documents.append(f"{document_number} (нет ревизий)")
+        else:
+            revision_ids.append(latest_revisions[document_id])
+    
+    if missing_documents:
+        return [], missing_documents
+    return revision_ids, missing_documents
+
+
+def find_transmittal_number_in_table(
+    grid: SheetGrid,
+    table_fields: Dict[str, str] | TableFieldsProfile,
+    header_row_idx: int = 0
+) -> str:
+    """Ищет номер трансмиттала в таблице (строка заголовка header_row_idx) по различным возможным полям"""
+    
+    header_row = grid.row(header_row_idx)
+    data_start_row = header_row_idx + 1
+    
+    def first_value(col_idx: int) -> str:
+        # Первое непустое значение колонки в строках данных
+        return next((value for value in grid.column(col_idx, data_start_row) if value), '')
+    
+    # Сначала проверяем настройки Table Fields
+    transmittal_field_label = as_table_profile(table_fields).transmittal_number_label
+    if transmittal_field_label:
+        # Ищем колонку с этим лейблом в заголовке
+        for col_idx, cell_str in enumerate(header_row):
+            if cell_str == transmittal_field_label:
+                value = first_value(col_idx)
+                if value:
+                    return value
+                break
+    
+    # Если не нашли по настройкам, используем автопоиск
+    possible_transmittal_fields = [
+        'transmittal_number',
+        'transmittal_no', 
+        'transmittal_id',
+        'transmittal',
+        'number',
+        'no',
+        'id',
+        'document_id',
+        'load_sheet_document_id'
+    ]
+    
+    # Ищем в заголовках таблицы
+    for col_idx, cell_str in enumerate(header_row):
+        if cell_str:
+            col_str = cell_str.lower()
+            for possible_field in possible_transmittal_fields:
+                if possible_field in col_str or col_str in possible_field:
+                    # Нашли потенциальное поле, берем первое непустое значение из данных
+                    value = first_value(col_idx)
+                    if value:
+                        return value
+    
+    # Если не нашли в заголовках, ищем в самих данных
+    for row_idx in range(data_start_row, grid.shape[0]):
+        for cell_str in grid.row(row_idx):
+            # Ищем значения, которые могут быть номерами трансмитталов
+            if (len(cell_str) > 3 and 
+                (cell_str.isalnum() or '-' in cell_str or '_' in cell_str) and
+                not cell_str.isdigit()):  # Исключаем чисто числовые значения
+                return cell_str
+    
+    return ""
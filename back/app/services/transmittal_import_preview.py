@@ -0,0 +1,433 @@
+"""
+Предпросмотр импорта трансмиттала по SHA-256 содержимого книги: книга и разобранные
+при предпросмотре листы сохраняются в TRANSMITTAL_PREVIEW_DIR (общий каталог процессов
+API и воркеров), поэтому повторный предпросмотр и импорт по хешу на любом процессе
+не загружают и не разбирают книгу заново. Разобранные листы дополнительно кешируются
+в памяти процесса.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import StageTimer
+from app.services.excel_readers import read_sheet, SheetNotFoundError, ExcelReadError
+from app.services.transmittal_import import (
+    SheetGrid, TransmittalImportError, get_localized_message, load_import_profile,
+    get_received_status_id, parse_grid, write_transmittal, timed_import, import_error_from_exception,
+    extract_metadata, find_table_start, extract_document_numbers, find_transmittal_number_in_table
+)
+from app.services.transmittal_revisions import find_documents_by_numbers, get_latest_revision_ids
+
+logger = logging.getLogger(__name__)
+
+_CONTENT_HASH_RE = re.compile(r"[0-9a-f]{64}")
+
+
+@dataclass
+class StoredWorkbook:
+    """Книга предпросмотра в общем каталоге"""
+    path: str
+    filename: str
+
+
+def _write_atomic(target: str, data: bytes):
+    # Запись через временный файл: другой процесс не увидит файл частично записанным
+    tmp_path = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, target)
+
+
+class WorkbookStore:
+    """
+    Книги предпросмотра на диске: {каталог}/{user_id}/{sha256}.xlsx, .json с именем файла
+    и {sha256}.{ключ листа}.grid — разобранные листы (pickle SheetGrid).
+    Ключ включает user_id, чтобы загрузку одного пользователя нельзя было импортировать
+    по хешу другому. Книга хранится ttl секунд с последнего обращения (mtime),
+    листы удаляются вместе с книгой.
+    """
+
+    def __init__(self, directory: str, ttl: int):
+        self.directory = directory
+        self.ttl = ttl
+
+    def _paths(self, user_id: int, content_hash: str) -> Tuple[str, str]:
+        base = os.path.join(self.directory, str(user_id), content_hash)
+        return f"{base}.xlsx", f"{base}.json"
+
+    def _grid_path(self, user_id: int, content_hash: str, sheet_name: str) -> str:
+        # Имя листа произвольное — в имени файла используется его хеш
+        sheet_key = hashlib.sha256(sheet_name.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.directory, str(user_id), f"{content_hash}.{sheet_key}.grid")
+
+    def put(self, user_id: int, content_hash: str, contents: bytes, filename: str) -> StoredWorkbook:
+        self.cleanup()
+        path, meta_path = self._paths(user_id, content_hash)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _write_atomic(meta_path, json.dumps({"filename": filename}).encode())
+        _write_atomic(path, contents)
+        return StoredWorkbook(path, filename)
+
+    def put_grid(self, user_id: int, content_hash: str, sheet_name: str, grid: SheetGrid):
+        """Сохраняет разобранный лист книги; ошибка записи не мешает импорту (лист разберется заново)"""
+        try:
+            _write_atomic(
+                self._grid_path(user_id, content_hash, sheet_name),
+                pickle.dumps(grid, protocol=pickle.HIGHEST_PROTOCOL)
+            )
+        except OSError as e:
+            logger.warning("Не удалось сохранить разобранный лист предпросмотра: %s", e)
+
+    def get_grid(self, user_id: int, content_hash: str, sheet_name: str) -> Optional[SheetGrid]:
+        """Разобранный лист, сохраненный при предпросмотре; None — лист не разбирался"""
+        try:
+            with open(self._grid_path(user_id, content_hash, sheet_name), "rb") as f:
+                grid = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError) as e:
+            logger.warning("Не удалось прочитать разобранный лист предпросмотра: %s", e)
+            return None
+        return grid if isinstance(grid, SheetGrid) else None
+
+    def get(self, user_id: int, content_hash: str) -> Optional[StoredWorkbook]:
+        """Книга по хешу (продлевает срок хранения); None — не загружалась или устарела"""
+        if not _CONTENT_HASH_RE.fullmatch(content_hash or ""):
+            return None
+        path, meta_path = self._paths(user_id, content_hash)
+        try:
+            if os.path.getmtime(path) < time.time() - self.ttl:
+                self.discard(user_id, content_hash)
+                return None
+            with open(meta_path, encoding="utf-8") as f:
+                filename = json.load(f).get("filename") or ""
+            now = time.time()
+            os.utime(path, (now, now))
+        except (OSError, ValueError):
+            return None
+        return StoredWorkbook(path, filename)
+
+    def discard(self, user_id: int, content_hash: str):
+        user_dir = os.path.join(self.directory, str(user_id))
+        try:
+            names = [name for name in os.listdir(user_dir) if name.startswith(f"{content_hash}.")]
+        except OSError:
+            return
+        for name in names:
+            try:
+                os.remove(os.path.join(user_dir, name))
+            except OSError:
+                pass
+
+    def cleanup(self):
+        """Удаляет устаревшие книги всех пользователей вместе с их листами"""
+        expired_before = time.time() - self.ttl
+        try:
+            user_dirs = [entry for entry in os.scandir(self.directory) if entry.is_dir()]
+        except OSError:
+            return
+        for user_dir in user_dirs:
+            try:
+                entries = list(os.scandir(user_dir.path))
+            except OSError:
+                continue
+            for entry in entries:
+                try:
+                    expired = entry.name.endswith(".xlsx") and entry.stat().st_mtime < expired_before
+                except OSError:
+                    continue
+                if expired and user_dir.name.isdigit():
+                    self.discard(int(user_dir.name), entry.name[:-len(".xlsx")])
+
+
+@dataclass
+class CachedGrids:
+    """Разобранные листы книги (лист из настроек может меняться между предпросмотрами)"""
+    grids: Dict[str, SheetGrid] = field(default_factory=dict)
+    size: int = 0
+    expires_at: float = 0.0
+
+
+class GridCache:
+    """
+    LRU-кеш разобранных листов в памяти процесса с TTL и ограничением по памяти.
+    Ключ — (user_id, SHA-256). Лист больше лимита не кешируется.
+    """
+
+    def __init__(self, ttl: int, max_bytes: int):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[int, str], CachedGrids]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get_grid(self, user_id: int, content_hash: str, sheet_name: str) -> Optional[SheetGrid]:
+        with self._lock:
+            key = (user_id, content_hash)
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            entry.expires_at = time.monotonic() + self.ttl
+            return entry.grids.get(sheet_name)
+
+    def add_grid(self, user_id: int, content_hash: str, sheet_name: str, grid: SheetGrid):
+        """Добавляет разобранный лист; лист, который сам по себе больше лимита, не сохраняется"""
+        grid_size = grid.memory_size()
+        if grid_size > self.max_bytes:
+            return
+        with self._lock:
+            key = (user_id, content_hash)
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = CachedGrids()
+            if sheet_name in entry.grids:
+                return
+            entry.grids[sheet_name] = grid
+            entry.size += grid_size
+            entry.expires_at = time.monotonic() + self.ttl
+            self._entries.move_to_end(key)
+            self._size += grid_size
+            self._evict()
+
+    def discard(self, user_id: int, content_hash: str):
+        with self._lock:
+            self._remove((user_id, content_hash))
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= entry.size
+
+    def _evict(self):
+        # Сначала просроченные, затем самые давно использованные — пока не уложимся в лимит
+        now = time.monotonic()
+        for key in [key for key, entry in self._entries.items() if entry.expires_at < now]:
+            self._remove(key)
+        while self._size > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+
+
+workbook_store = WorkbookStore(settings.TRANSMITTAL_PREVIEW_DIR, ttl=settings.TRANSMITTAL_PREVIEW_CACHE_TTL)
+
+preview_cache = GridCache(
+    ttl=settings.TRANSMITTAL_PREVIEW_CACHE_TTL,
+    max_bytes=settings.TRANSMITTAL_PREVIEW_CACHE_MAX_MB * 1024 * 1024
+)
+
+
+def _preview_expired() -> TransmittalImportError:
+    return TransmittalImportError(get_localized_message("IMPORT_PREVIEW_EXPIRED"), status_code=404)
+
+
+def _get_grid(
+    user_id: int,
+    content_hash: str,
+    workbook: StoredWorkbook,
+    sheet_name: str,
+    timer: StageTimer
+) -> Tuple[SheetGrid, bool]:
+    """
+    Сетка листа: из кеша процесса, из листа, сохраненного при предпросмотре (общий каталог —
+    так импорт в воркере не разбирает книгу заново), иначе разбор сохраненной книги
+    (этап "parse"). Второй элемент — был ли лист уже разобран.
+    """
+    grid = preview_cache.get_grid(user_id, content_hash, sheet_name)
+    if grid is not None:
+        return grid, True
+
+    with timer.stage("grid_load"):
+        grid = workbook_store.get_grid(user_id, content_hash, sheet_name)
+    if grid is not None:
+        preview_cache.add_grid(user_id, content_hash, sheet_name, grid)
+        return grid, True
+
+    try:
+        with timer.stage("parse"):
+            with open(workbook.path, "rb") as f:
+                contents = f.read()
+            grid = SheetGrid.from_rows(read_sheet(contents, sheet_name))
+    except FileNotFoundError:
+        # Книгу удалили (устарела или импортирована другим процессом)
+        raise _preview_expired()
+    except SheetNotFoundError:
+        raise TransmittalImportError(get_localized_message("WORKSHEET_NOT_FOUND", sheet_name=sheet_name))
+    except ExcelReadError as e:
+        # Нечитаемую книгу хранить незачем
+        workbook_store.discard(user_id, content_hash)
+        raise TransmittalImportError(get_localized_message("EXCEL_READ_ERROR", error=str(e)))
+    workbook_store.put_grid(user_id, content_hash, sheet_name, grid)
+    preview_cache.add_grid(user_id, content_hash, sheet_name, grid)
+    return grid, False
+
+
+def get_preview_workbook(user_id: int, content_hash: str) -> StoredWorkbook:
+    """
+    Книга предпросмотра по хешу
+
+    Raises:
+        TransmittalImportError: (404) книга не загружалась или предпросмотр устарел
+    """
+    workbook = workbook_store.get(user_id, content_hash)
+    if workbook is None:
+        preview_cache.discard(user_id, content_hash)
+        raise _preview_expired()
+    return workbook
+
+
+def preview_transmittal_import(
+    db: Session,
+    project_id: int,
+    counterparty_id: int,
+    user_id: int,
+    contents: Optional[bytes] = None,
+    filename: str = "",
+    content_hash: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Предпросмотр импорта: найденные метаданные, начало таблицы, номер трансмиттала
+    и сопоставление номеров документов. Книга передается содержимым (сохраняется
+    в общий каталог) или хешем ранее загруженной книги.
+
+    Raises:
+        TransmittalImportError: ошибка настроек, книга не читается или предпросмотр устарел
+    """
+    timer = StageTimer()
+    with timer.stage("profile"):
+        profile = load_import_profile(db, project_id, counterparty_id, user_id)
+
+    if contents is not None:
+        content_hash = hashlib.sha256(contents).hexdigest()
+        workbook = workbook_store.get(user_id, content_hash) or \
+            workbook_store.put(user_id, content_hash, contents, filename)
+    else:
+        workbook = get_preview_workbook(user_id, content_hash)
+
+    grid, cached = _get_grid(user_id, content_hash, workbook, profile.sheet_name, timer)
+    errors = []
+
+    with timer.stage("label_detection"):
+        metadata = extract_metadata(grid, profile.metadata_fields) if profile.metadata_fields else {}
+        missing_metadata = [field.label for field in profile.metadata_fields if not metadata.get(field.key)]
+        if missing_metadata:
+            errors.append(get_localized_message("IMPORT_METADATA_NOT_FOUND", fields=','.join(missing_metadata)))
+
+        table_start_row, missing_fields = find_table_start(grid, profile.table)
+        document_numbers = []
+        transmittal_number = ''
+        if table_start_row is None:
+            errors.append(get_localized_message("IMPORT_TABLE_FIELDS_NOT_FOUND", fields=','.join(missing_fields)))
+        else:
+            document_numbers = extract_document_numbers(grid, profile.table, table_start_row)
+            if profile.has_metadata_number:
+                transmittal_number = metadata.get('transmittal_number', '').strip()
+            elif profile.has_table_number:
+                transmittal_number = find_transmittal_number_in_table(grid, profile.table, table_start_row)
+            if not transmittal_number:
+                key = "IMPORT_TRANSMITTAL_NOT_FOUND_METADATA" if profile.has_metadata_number \
+                    else "IMPORT_TRANSMITTAL_NOT_FOUND_TABLE"
+                errors.append(get_localized_message(key))
+
+    with timer.stage("document_resolution"):
+        found = find_documents_by_numbers(db, project_id, document_numbers)
+        latest_revisions = get_latest_revision_ids(db, found.values())
+
+    documents = []
+    missing_documents = []
+    for document_number in document_numbers:
+        document_id = found.get(document_number)
+        revision_id = latest_revisions.get(document_id) if document_id is not None else None
+        if document_id is None:
+            status = "missing"
+            missing_documents.append(document_number)
+        elif revision_id is None:
+            status = "no_revisions"
+            missing_documents.append(f"{document_number} (нет ревизий)")
+        else:
+            status = "found"
+        documents.append({
+            "document_number": document_number,
+            "document_id": document_id,
+            "revision_id": revision_id,
+            "status": status
+        })
+    if missing_documents:
+        errors.append(get_localized_message("IMPORT_MISSING_DOCUMENTS", documents=', '.join(missing_documents)))
+
+    return {
+        "content_hash": content_hash,
+        "filename": workbook.filename,
+        "sheet_name": profile.sheet_name,
+        "cached": cached,
+        "metadata": metadata,
+        "missing_metadata": missing_metadata,
+        "table_start_row": table_start_row,
+        "missing_table_fields": missing_fields,
+        "table_rows_count": grid.shape[0] - table_start_row if table_start_row is not None else 0,
+        "transmittal_number": transmittal_number,
+        "documents": documents,
+        "can_commit": not errors,
+        "errors": errors,
+        "timings": timer.as_dict()
+    }
+
+
+def commit_transmittal_import(
+    db: Session,
+    content_hash: str,
+    project_id: int,
+    counterparty_id: int,
+    user_id: int,
+    include_timings: bool = False
+) -> Dict[str, Any]:
+    """
+    Импорт трансмиттала из книги, ранее загруженной в предпросмотр: без повторной
+    загрузки и разбора — лист берется сохраненным при предпросмотре; разбирается заново
+    (этап "parse" в таймингах), только если лист в настройках сменился после предпросмотра.
+    Выполняется фоновой задачей (transmittal_import_commit). После успешного
+    импорта книга и ее листы удаляются.
+
+    Raises:
+        TransmittalImportError: предпросмотр устарел или ошибка импорта
+    """
+    workbook = get_preview_workbook(user_id, content_hash)
+
+    def import_step(timer: StageTimer) -> Dict[str, Any]:
+        with timer.stage("profile"):
+            profile = load_import_profile(db, project_id, counterparty_id, user_id)
+        try:
+            grid, _ = _get_grid(user_id, content_hash, workbook, profile.sheet_name, timer)
+            parsed = parse_grid(grid, profile, timer)
+            received_status_id = get_received_status_id(db)
+        except TransmittalImportError:
+            db.rollback()
+            raise
+        except Exception as e:
+            db.rollback()
+            raise import_error_from_exception(e)
+        return write_transmittal(
+            db, parsed, profile, workbook.filename, project_id, counterparty_id, user_id, received_status_id, timer
+        )
+
+    result = timed_import(
+        import_step, project_id, counterparty_id, include_timings,
+        file_size=os.path.getsize(workbook.path), source="preview"
+    )
+    workbook_store.discard(user_id, content_hash)
+    preview_cache.discard(user_id, content_hash)
+    return result
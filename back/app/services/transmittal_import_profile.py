@@ -0,0 +1,177 @@
+"""
+Скомпилированные профили импорта трансмитталов: настройки TransmittalImportSettings
+(project, company, user) один раз разбираются и проверяются, кешируются в процессе
+"""
+
+import json
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple, Union
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.transmittal_import_settings import TransmittalImportSettings
+
+# Колонка номера документа не должна содержать эти слова (номер листа загрузки/трансмиттала)
+DOCUMENT_COLUMN_EXCLUDE_WORDS = ('load sheet', 'transmittal')
+
+
+class ImportProfileError(Exception):
+    """Ошибка настроек импорта: key — ключ локализованного сообщения"""
+
+    def __init__(self, key: str, **kwargs):
+        super().__init__(key)
+        self.key = key
+        self.kwargs = kwargs
+
+
+@dataclass(frozen=True)
+class MetadataField:
+    key: str
+    label: str
+    position: str
+
+
+@dataclass(frozen=True)
+class TableFieldsProfile:
+    """Поля таблицы с заранее нормализованными лейблами и предикатами поиска колонок"""
+    labels: Tuple[str, ...]  # Непустые лейблы заголовков (точное совпадение), без дублей
+    document_number_label: str  # strip().lower()
+    status_label: str  # strip().lower()
+    transmittal_number_label: str  # как в настройках (точное совпадение после strip ячейки)
+
+    @classmethod
+    def compile(cls, table_fields: Dict[str, Any]) -> "TableFieldsProfile":
+        return cls(
+            labels=tuple(dict.fromkeys(
+                label for label in table_fields.values() if isinstance(label, str) and label.strip()
+            )),
+            document_number_label=(table_fields.get('document_number_label') or '').strip().lower(),
+            status_label=(table_fields.get('status_label') or '').strip().lower(),
+            transmittal_number_label=table_fields.get('transmittal_number_label') or '',
+        )
+
+    def is_document_number_column(self, cell_lower: str) -> bool:
+        """Точное совпадение или окончание на лейбл, но без слов 'load sheet'/'transmittal'"""
+        label = self.document_number_label
+        return bool(label) and (cell_lower == label or cell_lower.endswith(label)) and \
+            not any(word in cell_lower for word in DOCUMENT_COLUMN_EXCLUDE_WORDS)
+
+    def is_status_column(self, cell_lower: str) -> bool:
+        label = self.status_label
+        return bool(label) and label in cell_lower
+
+
+@dataclass(frozen=True)
+class ImportProfile:
+    """Неизменяемый профиль импорта для (project, company, user)"""
+    settings_id: int
+    version: Any  # updated_at записи настроек
+    sheet_name: str
+    metadata_fields: Tuple[MetadataField, ...]
+    table: TableFieldsProfile
+    has_metadata_number: bool  # Номер трансмиттала берется из метаданных
+    has_table_number: bool  # Номер трансмиттала берется из таблицы
+
+
+def compile_metadata_fields(metadata_fields: Dict[str, Any]) -> Tuple[MetadataField, ...]:
+    return tuple(
+        MetadataField(key=key, label=config['label'], position=config['position'])
+        for key, config in metadata_fields.items()
+    )
+
+
+def compile_import_profile(setting: TransmittalImportSettings) -> ImportProfile:
+    """
+    Разбирает и проверяет настройки.
+
+    Raises:
+        ImportProfileError: неверный формат или неполные настройки
+    """
+    try:
+        data = json.loads(setting.settings_value) if isinstance(setting.settings_value, str) else setting.settings_value
+    except json.JSONDecodeError:
+        raise ImportProfileError("INVALID_SETTINGS_FORMAT")
+
+    if not isinstance(data, dict):
+        raise ImportProfileError("INVALID_SETTINGS_FORMAT")
+
+    if 'sheet_name' not in data or not data['sheet_name'] or not data['sheet_name'].strip():
+        raise ImportProfileError("MISSING_SHEET_NAME")
+
+    if 'table_fields' not in data:
+        raise ImportProfileError("MISSING_TABLE_FIELDS")
+
+    metadata_fields = compile_metadata_fields(data.get('metadata_fields') or {})
+    table = TableFieldsProfile.compile(data['table_fields'])
+
+    # Номер трансмиттала — либо из метаданных, либо из таблицы
+    metadata_number = (data.get('metadata_fields') or {}).get('transmittal_number') or {}
+    has_metadata_number = bool(metadata_number.get('label', '').strip())
+    has_table_number = bool(table.transmittal_number_label.strip())
+    if has_metadata_number and has_table_number:
+        raise ImportProfileError("IMPORT_BOTH_SOURCES_CONFIGURED")
+
+    return ImportProfile(
+        settings_id=setting.id,
+        version=setting.updated_at,
+        sheet_name=data['sheet_name'],
+        metadata_fields=metadata_fields,
+        table=table,
+        has_metadata_number=has_metadata_number,
+        has_table_number=has_table_number,
+    )
+
+
+ProfileKey = Tuple[int, int, int]
+
+_cache: Dict[ProfileKey, Tuple[ImportProfile, float]] = {}
+_cache_lock = threading.Lock()
+
+
+def get_import_profile(db: Session, project_id: int, company_id: int, user_id: int) -> Optional[ImportProfile]:
+    """
+    Профиль импорта из кеша процесса. Актуальность проверяется легким запросом
+    (id, updated_at) без чтения JSON, поэтому изменения, сделанные другими
+    процессами (API и воркеры), подхватываются сразу. None — настроек нет.
+    """
+    key = (project_id, company_id, user_id)
+    row = db.query(TransmittalImportSettings.id, TransmittalImportSettings.updated_at).filter(
+        TransmittalImportSettings.project_id == project_id,
+        TransmittalImportSettings.company_id == company_id,
+        TransmittalImportSettings.user_id == user_id,
+        TransmittalImportSettings.settings_key == 'field_mapping'
+    ).first()
+    if row is None:
+        invalidate_import_profile(project_id, company_id, user_id)
+        return None
+
+    now = time.monotonic()
+    with _cache_lock:
+        cached = _cache.get(key)
+    if cached is not None:
+        profile, expires_at = cached
+        if profile.settings_id == row.id and profile.version == row.updated_at and expires_at > now:
+            return profile
+
+    setting = db.query(TransmittalImportSettings).filter(TransmittalImportSettings.id == row.id).first()
+    profile = compile_import_profile(setting)
+    with _cache_lock:
+        _cache[key] = (profile, now + settings.TRANSMITTAL_IMPORT_PROFILE_TTL)
+    return profile
+
+
+def invalidate_import_profile(project_id: int, company_id: int, user_id: int):
+    """Сбрасывает профиль из кеша (вызывается при изменении настроек импорта)"""
+    with _cache_lock:
+        _cache.pop((project_id, company_id, user_id), None)
+
+
+def as_table_profile(table_fields: Union[Dict[str, Any], TableFieldsProfile]) -> TableFieldsProfile:
+    return table_fields if isinstance(table_fields, TableFieldsProfile) else TableFieldsProfile.compile(table_fields)
+
+
+def as_metadata_fields(metadata_fields: Union[Dict[str, Any], Tuple[MetadataField, ...]]) -> Tuple[MetadataField, ...]:
+    return compile_metadata_fields(metadata_fields) if isinstance(metadata_fields, dict) else tuple(metadata_fields)
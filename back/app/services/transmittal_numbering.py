@@ -0,0 +1,150 @@
+"""
+Серверная нумерация трансмитталов: шаблоны номеров по проекту, направлению и контрагенту
+и выделение номера одним UPDATE ... RETURNING счетчика правила
+"""
+
+import string
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.orm import Session
+
+from app.models.project import Project
+from app.models.transmittal import Transmittal
+from app.models.transmittal_numbering import TransmittalNumberingRule
+
+# Поля шаблона номера: {seq} (с форматом, например {seq:04d}) обязателен
+TEMPLATE_FIELDS = ("project_code", "direction", "year", "yy", "seq")
+
+
+# Сколько занятых номеров подряд (введенных вручную) пропускается при выделении
+MAX_SKIPPED_NUMBERS = 1000
+
+
+class NumberingTemplateError(Exception):
+    """Некорректный шаблон номера трансмиттала"""
+
+
+class NumberAllocationError(Exception):
+    """Не удалось выделить свободный номер: следующие номера правила уже заняты"""
+
+
+def validate_template(template: str):
+    """
+    Проверяет шаблон: только известные поля, {seq} присутствует, пробный номер строится
+
+    Raises:
+        NumberingTemplateError: шаблон некорректен (сообщение на русском)
+    """
+    try:
+        fields = {field for _, field, _, _ in string.Formatter().parse(template) if field is not None}
+    except ValueError as e:
+        raise NumberingTemplateError(f"Некорректный шаблон номера: {e}")
+    unknown = fields - set(TEMPLATE_FIELDS)
+    if unknown:
+        raise NumberingTemplateError(
+            f"Неизвестные поля шаблона: {', '.join(sorted(unknown))}. "
+            f"Допустимые: {', '.join('{' + field + '}' for field in TEMPLATE_FIELDS)}"
+        )
+    if "seq" not in fields:
+        raise NumberingTemplateError("Шаблон номера должен содержать порядковый номер {seq}")
+    try:
+        render_number(template, 1, "PRJ", "out")
+    except (ValueError, IndexError, KeyError) as e:
+        raise NumberingTemplateError(f"Некорректный шаблон номера: {e}")
+
+
+def render_number(template: str, seq: int, project_code: Optional[str], direction: Optional[str],
+                  now: Optional[datetime] = None) -> str:
+    """Номер трансмиттала по шаблону"""
+    now = now or datetime.now()
+    return template.format(
+        project_code=project_code or "",
+        direction=(direction or "").upper(),
+        year=now.year,
+        yy=f"{now.year % 100:02d}",
+        seq=seq
+    )
+
+
+def _matching_rule_id(project_id: int, direction: Optional[str], counterparty_id: Optional[int]):
+    """
+    Подзапрос id наиболее конкретного правила: контрагент + направление,
+    затем только контрагент, только направление, правило проекта по умолчанию
+    """
+    rule = TransmittalNumberingRule
+    return select(rule.id).where(
+        rule.project_id == project_id,
+        or_(rule.direction == direction, rule.direction.is_(None)),
+        or_(rule.counterparty_id == counterparty_id, rule.counterparty_id.is_(None))
+    ).order_by(
+        rule.counterparty_id.is_(None), rule.direction.is_(None)
+    ).limit(1).scalar_subquery()
+
+
+def _project_code(project_id: int):
+    return select(Project.project_code).where(Project.id == project_id).scalar_subquery()
+
+
+def allocate_transmittal_number(
+    db: Session,
+    project_id: int,
+    direction: Optional[str],
+    counterparty_id: Optional[int]
+) -> Optional[str]:
+    """
+    Выделяет следующий номер одним запросом (UPDATE ... RETURNING счетчика правила).
+    Строка правила блокируется до конца транзакции вызывающего: параллельные создания
+    трансмитталов ждут друг друга, а не конфликтуют, а откат не оставляет пропусков.
+    Номера, уже занятые трансмитталами (введенными вручную), пропускаются — иначе
+    вставка падала бы на уникальности номера, и счетчик после отката оставался бы на нем.
+    Возвращает None, если для проекта не настроена нумерация.
+
+    Raises:
+        NumberAllocationError: подряд заняты MAX_SKIPPED_NUMBERS номеров
+    """
+    rule = TransmittalNumberingRule
+    stmt = update(rule).where(
+        rule.id == _matching_rule_id(project_id, direction, counterparty_id)
+    ).values(
+        next_value=rule.next_value + 1
+    ).returning(
+        rule.template, rule.next_value - 1, _project_code(project_id)
+    ).execution_options(synchronize_session=False)
+    for _ in range(MAX_SKIPPED_NUMBERS):
+        row = db.execute(stmt).first()
+        if row is None:
+            return None
+        template, seq, project_code = row
+        number = render_number(template, seq, project_code, direction)
+        taken = db.scalar(select(Transmittal.id).where(Transmittal.transmittal_number == number).limit(1))
+        if taken is None:
+            return number
+    raise NumberAllocationError(
+        f"Не удалось выделить номер трансмиттала: {MAX_SKIPPED_NUMBERS} следующих номеров уже заняты"
+    )
+
+
+def preview_transmittal_number(
+    db: Session,
+    project_id: int,
+    direction: Optional[str],
+    counterparty_id: Optional[int]
+) -> Optional[Dict[str, Any]]:
+    """Следующий номер без выделения (может измениться, если номер выделят раньше)"""
+    rule = TransmittalNumberingRule
+    row = db.execute(
+        select(rule.id, rule.template, rule.next_value, _project_code(project_id)).where(
+            rule.id == _matching_rule_id(project_id, direction, counterparty_id)
+        )
+    ).first()
+    if row is None:
+        return None
+    rule_id, template, next_value, project_code = row
+    return {
+        "transmittal_number": render_number(template, next_value, project_code, direction),
+        "rule_id": rule_id,
+        "template": template,
+        "next_value": next_value
+    }
@@ -0,0 +1,87 @@
+"""
+Множественные операции с ревизиями трансмитталов: последние ревизии документов
+одним запросом и пакетное добавление ревизий в трансмиттал
+"""
+
+from typing import Dict, Iterable, List
+
+from sqlalchemy import Integer, any_, bindparam, func, literal, select
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.orm import Session
+
+from app.models.document import Document, DocumentRevision
+from app.models.transmittal import TransmittalRevision
+
+
+def find_documents_by_numbers(db: Session, project_id: int, numbers: Iterable[str]) -> Dict[str, int]:
+    """Номер документа -> id (неудаленные документы проекта) — один запрос"""
+    numbers = list(set(numbers))
+    if not numbers:
+        return {}
+    rows = db.query(Document.number, Document.id).filter(
+        Document.project_id == project_id,
+        Document.is_deleted == 0,
+        Document.number.in_(numbers)
+    ).order_by(Document.id).all()
+    documents = {}
+    for number, document_id in rows:
+        documents.setdefault(number, document_id)
+    return documents
+
+
+def get_latest_revision_ids(db: Session, document_ids: Iterable[int]) -> Dict[int, int]:
+    """
+    id документа -> id последней неудаленной ревизии — один запрос
+    (ROW_NUMBER() OVER (PARTITION BY document_id ORDER BY created_at DESC))
+    """
+    document_ids = list(set(document_ids))
+    if not document_ids:
+        return {}
+    ranked = db.query(
+        DocumentRevision.document_id.label("document_id"),
+        DocumentRevision.id.label("revision_id"),
+        func.row_number().over(
+            partition_by=DocumentRevision.document_id,
+            order_by=(DocumentRevision.created_at.desc(), DocumentRevision.id.desc())
+        ).label("rn")
+    ).filter(
+        DocumentRevision.document_id.in_(document_ids),
+        DocumentRevision.is_deleted == 0
+    ).subquery()
+    rows = db.query(ranked.c.document_id, ranked.c.revision_id).filter(ranked.c.rn == 1).all()
+    return {document_id: revision_id for document_id, revision_id in rows}
+
+
+def _ids_param(name: str, ids: List[int]):
+    # Один параметр-массив вместо IN (...) с тысячами параметров
+    return bindparam(name, value=ids, type_=ARRAY(Integer))
+
+
+def find_missing_revision_ids(db: Session, revision_ids: Iterable[int]) -> List[int]:
+    """id ревизий, которых нет в БД, — один запрос WHERE id = ANY(:ids)"""
+    revision_ids = list(dict.fromkeys(revision_ids))
+    if not revision_ids:
+        return []
+    existing = set(db.scalars(
+        select(DocumentRevision.id).where(DocumentRevision.id == any_(_ids_param("revision_ids", revision_ids)))
+    ))
+    return [revision_id for revision_id in revision_ids if revision_id not in existing]
+
+
+def attach_revisions(db: Session, transmittal_id: int, revision_ids: Iterable[int]) -> List[int]:
+    """
+    Добавляет ревизии в трансмиттал одним INSERT ... ON CONFLICT DO NOTHING
+    (uq_transmittal_revisions_transmittal_revision). Возвращает id добавленных ревизий;
+    уже присутствующие в трансмиттале пропускаются. Коммит — на вызывающей стороне.
+    """
+    revision_ids = list(dict.fromkeys(revision_ids))
+    if not revision_ids:
+        return []
+    # INSERT ... SELECT unnest(:ids): размер запроса не зависит от числа ревизий
+    rows = select(literal(transmittal_id), func.unnest(_ids_param("revision_ids", revision_ids)))
+    stmt = insert(TransmittalRevision).from_select(
+        [TransmittalRevision.transmittal_id, TransmittalRevision.revision_id], rows
+    ).on_conflict_do_nothing(
+        index_elements=[TransmittalRevision.transmittal_id, TransmittalRevision.revision_id]
+    ).returning(TransmittalRevision.revision_id)
+    return [row[0] for row in db.execute(stmt)]
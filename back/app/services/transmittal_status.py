@@ -0,0 +1,124 @@
+"""
+Переходы статусов трансмитталов: id статусов из кеша процесса и массовая отправка/получение
+одним UPDATE ... WHERE id = ANY(:ids) RETURNING с проверкой условий в SQL
+"""
+
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import Integer, any_, bindparam, func, or_, select, true, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session
+
+from app.models.user import User
+from app.models.transmittal import Transmittal
+from app.models.references import TransmittalStatus
+
+SENT_STATUS = "Sent"
+RECEIVED_STATUS = "Received"
+
+# Максимум трансмитталов в одном массовом переходе
+BULK_TRANSITION_MAX = 1000
+
+# Справочник статусов меняется только миграциями — id кешируются на время жизни процесса
+_status_ids: Dict[str, int] = {}
+_status_lock = threading.Lock()
+
+
+class TransmittalStatusError(Exception):
+    """Статус не найден в справочнике"""
+
+    def __init__(self, name: str):
+        super().__init__(f"Статус '{name}' не найден")
+        self.detail = str(self)
+
+
+def get_transmittal_status_id(db: Session, name: str) -> int:
+    """
+    id статуса трансмиттала по имени без учета регистра (в данных встречаются
+    и "Received", и "received"). Отсутствующий статус не кешируется.
+
+    Raises:
+        TransmittalStatusError: статуса нет в справочнике
+    """
+    key = name.lower()
+    status_id = _status_ids.get(key)
+    if status_id is not None:
+        return status_id
+    status_id = db.scalar(
+        select(TransmittalStatus.id).where(func.lower(TransmittalStatus.name) == key).order_by(TransmittalStatus.id).limit(1)
+    )
+    if status_id is None:
+        raise TransmittalStatusError(name)
+    with _status_lock:
+        _status_ids[key] = status_id
+    return status_id
+
+
+def _ids_param(ids: List[int]):
+    return bindparam("transmittal_ids", value=ids, type_=ARRAY(Integer))
+
+
+def _transition_values(target: str, user: User) -> Dict[str, Any]:
+    if target == SENT_STATUS:
+        return {"direction": "out", "transmittal_date": func.now(), "sender_id": user.id}
+    return {"direction": "in", "transmittal_date": func.now()}
+
+
+def bulk_transition(db: Session, transmittal_ids: Iterable[int], target: str, user: User) -> Dict[str, Any]:
+    """
+    Переводит трансмитталы в статус target (SENT_STATUS или RECEIVED_STATUS) одним UPDATE.
+    Условия проверяются в WHERE: трансмиттал не удален, еще не в целевом статусе,
+    а отправлять можно только свои трансмитталы (администратор — любые).
+    Для не обновленных id причина определяется одним дополнительным запросом.
+    Коммит — на вызывающей стороне. Возвращает отчет по каждому id в порядке запроса.
+
+    Raises:
+        TransmittalStatusError: целевого статуса нет в справочнике
+    """
+    transmittal_ids = list(dict.fromkeys(transmittal_ids))
+    status_id = get_transmittal_status_id(db, target)
+    if not transmittal_ids:
+        return {"requested": 0, "updated": 0, "results": []}
+
+    owner_check = true()
+    if target == SENT_STATUS and not user.is_admin:
+        owner_check = Transmittal.created_by == user.id
+    stmt = update(Transmittal).where(
+        Transmittal.id == any_(_ids_param(transmittal_ids)),
+        Transmittal.is_deleted == 0,
+        or_(Transmittal.status_id.is_(None), Transmittal.status_id != status_id),
+        owner_check
+    ).values(
+        status_id=status_id, **_transition_values(target, user)
+    ).returning(Transmittal.id).execution_options(synchronize_session=False)
+    updated = set(db.scalars(stmt))
+
+    reasons: Dict[int, Optional[str]] = {}
+    rejected = [transmittal_id for transmittal_id in transmittal_ids if transmittal_id not in updated]
+    if rejected:
+        rows = db.execute(
+            select(Transmittal.id, Transmittal.is_deleted, Transmittal.status_id, Transmittal.created_by)
+            .where(Transmittal.id == any_(_ids_param(rejected)))
+        ).all()
+        for transmittal_id, is_deleted, current_status_id, created_by in rows:
+            if is_deleted:
+                reasons[transmittal_id] = "not_found"
+            elif current_status_id == status_id:
+                reasons[transmittal_id] = "already"
+            else:
+                reasons[transmittal_id] = "forbidden"
+
+    messages = {
+        "not_found": "Трансмиттал не найден",
+        "already": f"Трансмиттал уже в статусе '{target}'",
+        "forbidden": "Нет прав для отправки трансмиттала",
+    }
+    results = []
+    for transmittal_id in transmittal_ids:
+        if transmittal_id in updated:
+            results.append({"transmittal_id": transmittal_id, "status": "updated"})
+        else:
+            reason = reasons.get(transmittal_id, "not_found")
+            results.append({"transmittal_id": transmittal_id, "status": reason, "error": messages[reason]})
+    return {"requested": len(transmittal_ids), "updated": len(updated), "results": results}
@@ -0,0 +1,252 @@
+"""
+Пакетное применение правил workflow к ревизиям (ответ по трансмитталу с кодами проверки):
+ревизии с пресетом проекта разрешаются одним запросом, правила закрепленной версии пресета
+берутся из скомпилированной таблицы, следующие ревизии при необходимости создаются пакетно
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.models.user import User
+from app.models.document import Document, DocumentRevision
+from app.models.project import Project
+from app.models.references import ReviewCode, RevisionStatus, WorkflowStatus
+from app.services.project_access import get_project_access
+from app.services.revision_numbering import bump_revision_number, lock_documents
+from app.services.workflow_preset_versions import get_current_version_id
+from app.services.workflow_rule_processor import get_decision_table
+
+# Максимум строк в одном пакете
+BATCH_APPLY_MAX = 2000
+
+MESSAGES = {
+    "not_found": "Ревизия не найдена",
+    "forbidden": "Нет доступа к проекту ревизии",
+    "no_preset": "У проекта не задан пресет workflow",
+    "unknown_review_code": "Код проверки не найден",
+    "no_rule": "Подходящее правило не найдено",
+    "no_action": "Правило не задает следующую ревизию",
+    "not_latest": "Ревизия не является последней ревизией документа",
+    "duplicate_document": "Для документа уже создается ревизия в этом пакете",
+}
+
+
+def _resolve_review_codes(db: Session, items: List[Any]) -> Dict[str, int]:
+    """Коды проверки, переданные строкой, -> id одним запросом"""
+    codes = {item.review_code.strip() for item in items if item.review_code_id is None and item.review_code}
+    if not codes:
+        return {}
+    return dict(db.query(ReviewCode.code, ReviewCode.id).filter(ReviewCode.code.in_(codes)).all())
+
+
+def _load_revisions(db: Session, revision_ids: List[int]) -> Dict[int, Any]:
+    """Ревизии с документом и пресетом проекта одним запросом"""
+    if not revision_ids:
+        return {}
+    rows = db.query(
+        DocumentRevision.id,
+        DocumentRevision.document_id,
+        DocumentRevision.revision_description_id,
+        DocumentRevision.revision_step_id,
+        Document.project_id,
+        Document.document_type_id,
+        Project.workflow_preset_id,
+        Project.workflow_preset_version_id
+    ).join(
+        Document, Document.id == DocumentRevision.document_id
+    ).join(
+        Project, Project.id == Document.project_id
+    ).filter(
+        DocumentRevision.id.in_(revision_ids),
+        DocumentRevision.is_deleted == 0,
+        Document.is_deleted == 0
+    ).all()
+    return {row.id: row for row in rows}
+
+
+def _has_access(db: Session, user: User, project_id: int, cache: Dict[int, Any], create: bool) -> bool:
+    if user.is_admin:
+        return True
+    if project_id not in cache:
+        cache[project_id] = get_project_access(db, user.id, project_id)
+    access = cache[project_id]
+    if access is None:
+        return False
+    return access.is_owner or (access.can_contribute if create else access.is_member)
+
+
+def _latest_revisions(db: Session, document_ids: Iterable[int]) -> Dict[int, Tuple[int, str]]:
+    """Последняя не удаленная ревизия каждого документа: {document_id: (revision_id, number)}"""
+    document_ids = list(document_ids)
+    if not document_ids:
+        return {}
+    position = func.row_number().over(
+        partition_by=DocumentRevision.document_id,
+        order_by=(DocumentRevision.created_at.desc(), DocumentRevision.id.desc())
+    ).label("position")
+    ranked = select(
+        DocumentRevision.id, DocumentRevision.document_id, DocumentRevision.number, position
+    ).where(
+        DocumentRevision.document_id.in_(document_ids),
+        DocumentRevision.is_deleted == 0
+    ).subquery()
+    rows = db.execute(
+        select(ranked.c.id, ranked.c.document_id, ranked.c.number).where(ranked.c.position == 1)
+    ).all()
+    return {document_id: (revision_id, number) for revision_id, document_id, number in rows}
+
+
+def _status_id(db: Session, model, name: str) -> Optional[int]:
+    return db.scalar(select(model.id).where(model.name == name).limit(1))
+
+
+def _create_next_revisions(
+    db: Session,
+    planned: List[Tuple[Dict[str, Any], Any, Dict[str, Any]]],
+    user: User,
+    change_description: Optional[str]
+) -> Dict[int, int]:
+    """
+    Создает следующие ревизии пакетно, по правилам ручного создания ревизии: номер
+    увеличивается (или повторяется, если последняя ревизия с этим номером отменена),
+    активные ревизии документа становятся Superseded, новая — Active/Draft.
+    Возвращает {document_id: id новой ревизии}.
+    """
+    document_ids = [revision.document_id for _, revision, _ in planned]
+    # Параллельная загрузка ревизии тех же документов не получит тот же номер
+    lock_documents(db, document_ids)
+    latest = _latest_revisions(db, document_ids)
+
+    active_status_id = _status_id(db, RevisionStatus, "Active")
+    superseded_status_id = _status_id(db, RevisionStatus, "Superseded")
+    cancelled_status_id = _status_id(db, RevisionStatus, "Cancelled")
+    draft_workflow_status_id = _status_id(db, WorkflowStatus, "Draft")
+
+    cancelled_numbers: Set[Tuple[int, str]] = set()
+    if cancelled_status_id is not None:
+        cancelled_numbers = set(db.execute(
+            select(DocumentRevision.document_id, DocumentRevision.number).where(
+                DocumentRevision.document_id.in_(document_ids),
+                DocumentRevision.revision_status_id == cancelled_status_id
+            )
+        ).all())
+
+    rows = []
+    for result, revision, next_revision in planned:
+        latest_id, latest_number = latest[revision.document_id]
+        if latest_id != revision.id:
+            result.update(status="not_latest", error=MESSAGES["not_latest"])
+            continue
+        if (revision.document_id, latest_number) in cancelled_numbers:
+            number = latest_number
+        else:
+            number = bump_revision_number(latest_number)
+        rows.append({
+            "document_id": revision.document_id,
+            "number": number,
+            "change_description": change_description,
+            "uploaded_by": user.id,
+            "is_deleted": 0,
+            "revision_status_id": active_status_id,
+            "revision_description_id": next_revision["revision_description_id"],
+            "revision_step_id": next_revision["revision_step_id"],
+            "workflow_status_id": draft_workflow_status_id,
+        })
+    if not rows:
+        return {}
+
+    if active_status_id is not None and superseded_status_id is not None:
+        db.execute(
+            update(DocumentRevision).where(
+                DocumentRevision.document_id.in_([row["document_id"] for row in rows]),
+                DocumentRevision.revision_status_id == active_status_id,
+                DocumentRevision.is_deleted == 0
+            ).values(revision_status_id=superseded_status_id).execution_options(synchronize_session=False)
+        )
+    created = db.execute(
+        insert(DocumentRevision).returning(DocumentRevision.id, DocumentRevision.document_id), rows
+    ).all()
+    return {document_id: revision_id for revision_id, document_id in created}
+
+
+def apply_rules_batch(
+    db: Session,
+    items: List[Any],
+    user: User,
+    create_revisions: bool = False,
+    change_description: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Применяет правила пресетов проектов к списку (revision_id, код проверки).
+    Элемент: revision_id и review_code_id или review_code (строкой, как в листе ответа).
+    create_revisions — создать следующие ревизии для совпавших правил (только для последней
+    ревизии документа, одна новая ревизия на документ). Коммит — на вызывающей стороне.
+    Возвращает отчет по каждой строке в порядке запроса.
+    """
+    codes = _resolve_review_codes(db, items)
+    revisions = _load_revisions(db, list({item.revision_id for item in items}))
+
+    access_cache: Dict[int, Any] = {}
+    results: List[Dict[str, Any]] = []
+    planned: List[Tuple[Dict[str, Any], Any, Dict[str, Any]]] = []
+    planned_documents: Set[int] = set()
+    for item in items:
+        result: Dict[str, Any] = {"revision_id": item.revision_id, "status": None}
+        results.append(result)
+
+        revision = revisions.get(item.revision_id)
+        review_code_id = item.review_code_id
+        if review_code_id is None and item.review_code:
+            review_code_id = codes.get(item.review_code.strip())
+        if revision is None:
+            reason = "not_found"
+        elif not _has_access(db, user, revision.project_id, access_cache, create_revisions):
+            reason = "forbidden"
+        elif not revision.workflow_preset_id:
+            reason = "no_preset"
+        elif review_code_id is None:
+            reason = "unknown_review_code"
+        else:
+            reason = None
+        if reason:
+            result.update(status=reason, error=MESSAGES[reason])
+            continue
+
+        # Закрепленная за проектом версия пресета, иначе текущая
+        table = get_decision_table(
+            db, revision.workflow_preset_version_id or get_current_version_id(db, revision.workflow_preset_id)
+        )
+        rule = table.find_rule(
+            revision.revision_description_id,
+            revision.revision_step_id,
+            review_code_id,
+            revision.document_type_id
+        )
+        if rule is None:
+            result.update(status="no_rule", error=MESSAGES["no_rule"])
+            continue
+
+        next_revision = table.next_revision(rule)
+        result.update(status="matched", rule_id=rule.id, next_revision=next_revision)
+        if not create_revisions:
+            continue
+        if next_revision["action"] == "no_action":
+            result.update(status="no_action", error=MESSAGES["no_action"])
+        elif revision.document_id in planned_documents:
+            result.update(status="duplicate_document", error=MESSAGES["duplicate_document"])
+        else:
+            planned_documents.add(revision.document_id)
+            planned.append((result, revision, next_revision))
+
+    if planned:
+        created = _create_next_revisions(db, planned, user, change_description)
+        for result, revision, _ in planned:
+            if revision.document_id in created and result["status"] == "matched":
+                result.update(status="created", created_revision_id=created[revision.document_id])
+
+    summary: Dict[str, int] = {}
+    for result in results:
+        summary[result["status"]] = summary.get(result["status"], 0) + 1
+    return {"requested": len(items), "summary": summary, "results": results}
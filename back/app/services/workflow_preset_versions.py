@@ -0,0 +1,414 @@
+"""
+Версии пресетов workflow. Каждое сохранение последовательности или правил создает
+неизменяемую версию (JSON-снимок строк), проекты закрепляются на версии.
+
+Снимки кешируются в процессе по id версии и никогда не устаревают; производные от них
+данные (представление с подписями справочников, таблица решений) живут WORKFLOW_RULES_CACHE_TTL,
+чтобы подхватывать переименования в справочниках. Изменяемым остается только указатель
+пресета на текущую версию — он сбрасывается при сохранении, в других процессах API —
+через LISTEN/NOTIFY.
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.cache_invalidation import publish, register_channel
+from app.core.config import settings
+from app.models.project import WorkflowPreset, WorkflowPresetVersion, WorkflowPresetSequence, WorkflowPresetRule
+from app.models.references import RevisionDescription, RevisionStep, ReviewCode
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = "edms_workflow_presets"
+
+# id — id строки на момент сохранения версии; в сравнении содержимого версий не участвует
+SEQUENCE_FIELDS = (
+    "id", "document_type_id", "sequence_order", "revision_description_id", "revision_step_id",
+    "is_final", "requires_transmittal"
+)
+# Поля, по которым шаги двух версий считаются одним шагом при сравнении
+SEQUENCE_KEY_FIELDS = ("document_type_id", "revision_description_id", "revision_step_id")
+RULE_FIELDS = (
+    "id", "document_type_id", "current_revision_description_id", "current_revision_step_id",
+    "review_code_id", "operator", "review_code_list", "priority",
+    "next_revision_description_id", "next_revision_step_id"
+)
+# Поля, по которым правила двух версий считаются одним правилом при сравнении
+RULE_KEY_FIELDS = (
+    "document_type_id", "current_revision_description_id", "current_revision_step_id",
+    "operator", "review_code_id", "review_code_list"
+)
+
+
+@dataclass(frozen=True)
+class PresetSnapshot:
+    """Неизменяемый снимок версии пресета"""
+    version_id: int
+    preset_id: int
+    version_number: int
+    sequences: Tuple[Dict[str, Any], ...]
+    rules: Tuple[Dict[str, Any], ...]
+
+
+class VersionCache:
+    """LRU-кеш по id версии; ttl=None — записи не устаревают (неизменяемые данные)"""
+
+    def __init__(self, max_entries: int, ttl: Optional[int] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[int, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: int) -> Optional[Any]:
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is None:
+                return None
+            if self.ttl is not None and cached[1] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return cached[0]
+
+    def put(self, key: int, value: Any):
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else 0.0
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_build(self, key: int, build: Callable[[], Any]) -> Any:
+        value = self.get(key)
+        if value is None:
+            value = build()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+snapshot_cache = VersionCache(max_entries=settings.WORKFLOW_PRESET_VERSION_CACHE_MAX_ENTRIES)
+view_cache = VersionCache(
+    max_entries=settings.WORKFLOW_PRESET_VERSION_CACHE_MAX_ENTRIES, ttl=settings.WORKFLOW_RULES_CACHE_TTL
+)
+
+
+def _snapshot_from_row(version: WorkflowPresetVersion) -> PresetSnapshot:
+    return PresetSnapshot(
+        version_id=version.id,
+        preset_id=version.preset_id,
+        version_number=version.version_number,
+        sequences=tuple(json.loads(version.sequences)),
+        rules=tuple(json.loads(version.rules))
+    )
+
+
+def get_snapshots(db: Session, version_ids: Iterable[int]) -> Dict[int, PresetSnapshot]:
+    """Снимки версий из кеша; отсутствующие загружаются одним запросом"""
+    result: Dict[int, PresetSnapshot] = {}
+    missing = []
+    for version_id in dict.fromkeys(version_ids):
+        if version_id is None:
+            continue
+        snapshot = snapshot_cache.get(version_id)
+        if snapshot is None:
+            missing.append(version_id)
+        else:
+            result[version_id] = snapshot
+    if missing:
+        for version in db.query(WorkflowPresetVersion).filter(WorkflowPresetVersion.id.in_(missing)).all():
+            snapshot = _snapshot_from_row(version)
+            snapshot_cache.put(version.id, snapshot)
+            result[version.id] = snapshot
+    return result
+
+
+def get_snapshot(db: Session, version_id: Optional[int]) -> Optional[PresetSnapshot]:
+    if version_id is None:
+        return None
+    return get_snapshots(db, [version_id]).get(version_id)
+
+
+class CurrentVersionCache:
+    """preset_id -> id текущей версии с TTL; сбрасывается при сохранении пресета"""
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self._entries: Dict[int, Tuple[Optional[int], float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, preset_id: int) -> Optional[int]:
+        now = time.monotonic()
+        with self._lock:
+            cached = self._entries.get(preset_id)
+        if cached is not None and cached[1] > now:
+            return cached[0]
+        version_id = db.query(WorkflowPreset.current_version_id).filter(WorkflowPreset.id == preset_id).scalar()
+        with self._lock:
+            self._entries[preset_id] = (version_id, now + self.ttl)
+        return version_id
+
+    def invalidate(self, preset_id: int):
+        with self._lock:
+            self._entries.pop(preset_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+current_version_cache = CurrentVersionCache(ttl=settings.WORKFLOW_RULES_CACHE_TTL)
+
+
+def get_current_version_id(db: Session, preset_id: Optional[int]) -> Optional[int]:
+    if not preset_id:
+        return None
+    return current_version_cache.get(db, preset_id)
+
+
+def invalidate_current_version(db: Session, preset_id: int):
+    """Сбрасывает указатель на текущую версию в этом процессе и публикует NOTIFY (до commit)"""
+    current_version_cache.invalidate(preset_id)
+    publish(db, NOTIFY_CHANNEL, str(preset_id))
+
+
+def _apply_notification(payload: str):
+    try:
+        current_version_cache.invalidate(int(payload))
+    except ValueError:
+        logger.warning("Некорректное уведомление версии пресета: %r", payload)
+
+
+register_channel(NOTIFY_CHANNEL, _apply_notification, current_version_cache.clear)
+
+
+def _working_rows(db: Session, preset_id: int) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    sequences = db.query(WorkflowPresetSequence).filter(
+        WorkflowPresetSequence.preset_id == preset_id
+    ).order_by(WorkflowPresetSequence.sequence_order, WorkflowPresetSequence.id).all()
+    rules = db.query(WorkflowPresetRule).filter(
+        WorkflowPresetRule.preset_id == preset_id
+    ).order_by(WorkflowPresetRule.priority, WorkflowPresetRule.id).all()
+    return (
+        [{field: getattr(item, field) for field in SEQUENCE_FIELDS} for item in sequences],
+        [{field: getattr(item, field) for field in RULE_FIELDS} for item in rules]
+    )
+
+
+def _content(items: Iterable[Dict[str, Any]], fields: Tuple[str, ...]) -> List[Dict[str, Any]]:
+    """Строки версии без id строк: пересохранение без изменений не создает новую версию"""
+    return [{field: item.get(field) for field in fields if field != "id"} for item in items]
+
+
+def create_preset_version(db: Session, preset: WorkflowPreset, user_id: Optional[int]) -> Optional[WorkflowPresetVersion]:
+    """
+    Сохраняет текущие последовательность и правила пресета новой версией и делает ее текущей.
+    Если содержимое не отличается от текущей версии, новая версия не создается (None).
+    Строки пресета должны быть уже записаны (flush); коммит — на вызывающей стороне.
+    """
+    # Блокировка пресета сериализует нумерацию версий при параллельном сохранении
+    db.query(WorkflowPreset.id).filter(WorkflowPreset.id == preset.id).with_for_update().first()
+    sequences, rules = _working_rows(db, preset.id)
+
+    current = get_snapshot(db, preset.current_version_id)
+    if current is not None \
+            and _content(current.sequences, SEQUENCE_FIELDS) == _content(sequences, SEQUENCE_FIELDS) \
+            and _content(current.rules, RULE_FIELDS) == _content(rules, RULE_FIELDS):
+        return None
+
+    last_number = db.query(func.max(WorkflowPresetVersion.version_number)).filter(
+        WorkflowPresetVersion.preset_id == preset.id
+    ).scalar() or 0
+    version = WorkflowPresetVersion(
+        preset_id=preset.id,
+        version_number=last_number + 1,
+        sequences=json.dumps(sequences),
+        rules=json.dumps(rules),
+        created_by=user_id
+    )
+    db.add(version)
+    db.flush()
+    preset.current_version_id = version.id
+    invalidate_current_version(db, preset.id)
+    return version
+
+
+def _revision_ref(item) -> Optional[dict]:
+    if item is None:
+        return None
+    return {
+        "id": item.id,
+        "code": item.code,
+        "description": item.description,
+        "description_native": item.description_native
+    }
+
+
+def _by_id(db: Session, model, ids: set) -> dict:
+    """Справочник по множеству id одним запросом IN"""
+    ids.discard(None)
+    if not ids:
+        return {}
+    return {item.id: item for item in db.query(model).filter(model.id.in_(ids)).all()}
+
+
+def _render(db: Session, snapshots: List[PresetSnapshot]) -> Dict[int, Tuple[List[dict], List[dict]]]:
+    """Последовательности и правила версий с подписями справочников — три запроса IN на все версии"""
+    sequences = [item for snapshot in snapshots for item in snapshot.sequences]
+    rules = [item for snapshot in snapshots for item in snapshot.rules]
+    descriptions = _by_id(
+        db, RevisionDescription,
+        {item["revision_description_id"] for item in sequences}
+        | {rule["current_revision_description_id"] for rule in rules}
+        | {rule["next_revision_description_id"] for rule in rules}
+    )
+    steps = _by_id(
+        db, RevisionStep,
+        {item["revision_step_id"] for item in sequences}
+        | {rule["current_revision_step_id"] for rule in rules}
+        | {rule["next_revision_step_id"] for rule in rules}
+    )
+    review_codes = _by_id(db, ReviewCode, {rule["review_code_id"] for rule in rules})
+
+    result: Dict[int, Tuple[List[dict], List[dict]]] = {}
+    for snapshot in snapshots:
+        sequences_data = [
+            {
+                # id строки последовательности на момент сохранения версии
+                "id": item.get("id"),
+                "sequence_order": item["sequence_order"],
+                "revision_description_id": item["revision_description_id"],
+                "revision_step_id": item["revision_step_id"],
+                "revision_description": _revision_ref(descriptions.get(item["revision_description_id"])),
+                "revision_step": _revision_ref(steps.get(item["revision_step_id"])),
+                "is_final": item["is_final"],
+                "requires_transmittal": item["requires_transmittal"]
+            }
+            for item in snapshot.sequences
+        ]
+        rules_data = []
+        for rule in snapshot.rules:
+            review_code = review_codes.get(rule["review_code_id"])
+            rules_data.append({
+                "id": rule["id"],
+                "current_revision": {
+                    "description": _revision_ref(descriptions.get(rule["current_revision_description_id"])),
+                    "step": _revision_ref(steps.get(rule["current_revision_step_id"]))
+                },
+                "operator": rule["operator"],
+                "review_code": {
+                    "id": review_code.id,
+                    "code": review_code.code,
+                    "description": review_code.description,
+                    "description_native": review_code.name_native
+                } if review_code else None,
+                "review_code_list": rule["review_code_list"],
+                "priority": rule["priority"],
+                "next_revision": {
+                    "description": _revision_ref(descriptions.get(rule["next_revision_description_id"])),
+                    "step": _revision_ref(steps.get(rule["next_revision_step_id"]))
+                } if rule["next_revision_description_id"] else None,
+            })
+        result[snapshot.version_id] = (sequences_data, rules_data)
+    return result
+
+
+def get_version_views(db: Session, version_ids: Iterable[int]) -> Dict[int, Tuple[List[dict], List[dict]]]:
+    """
+    Представления версий (последовательности и правила с подписями) из кеша;
+    промахи загружаются и оформляются вместе фиксированным числом запросов
+    """
+    result: Dict[int, Tuple[List[dict], List[dict]]] = {}
+    missing = []
+    for version_id in dict.fromkeys(version_ids):
+        if version_id is None:
+            continue
+        view = view_cache.get(version_id)
+        if view is None:
+            missing.append(version_id)
+        else:
+            result[version_id] = view
+    if missing:
+        snapshots = list(get_snapshots(db, missing).values())
+        for version_id, view in _render(db, snapshots).items():
+            view_cache.put(version_id, view)
+            result[version_id] = view
+    return result
+
+
+def _index(items: List[Dict[str, Any]], key) -> Dict[Any, Dict[str, Any]]:
+    # Повторы одного ключа различаются порядковым номером вхождения
+    result, seen = {}, {}
+    for item in items:
+        item_key = key(item)
+        seen[item_key] = seen.get(item_key, 0) + 1
+        result[(item_key, seen[item_key])] = item
+    return result
+
+
+def _diff(
+    before: List[Dict[str, Any]], after: List[Dict[str, Any]], key, compare_fields, track_order: bool = False
+) -> Dict[str, list]:
+    """
+    Добавленные, удаленные и измененные строки; track_order — также строки, сохранившиеся
+    в обеих версиях, но сменившие взаимный порядок (reordered)
+    """
+    old, new = _index(before, key), _index(after, key)
+    changed = [
+        {"before": old[item_key], "after": new[item_key]}
+        for item_key in new
+        if item_key in old and any(old[item_key].get(field) != new[item_key].get(field) for field in compare_fields)
+    ]
+    result = {
+        "added": [item for item_key, item in new.items() if item_key not in old],
+        "removed": [item for item_key, item in old.items() if item_key not in new],
+        "changed": changed
+    }
+    if track_order:
+        old_order = [item_key for item_key in old if item_key in new]
+        new_order = [item_key for item_key in new if item_key in old]
+        result["reordered"] = [
+            {"before": old[item_key], "after": new[item_key]}
+            for position, item_key in enumerate(new_order)
+            if old_order[position] != item_key
+        ]
+    return result
+
+
+def diff_snapshots(before: PresetSnapshot, after: PresetSnapshot) -> Dict[str, Any]:
+    """
+    Различия двух версий: шаги последовательности сопоставляются по типу документа и ревизии
+    (вставка шага не делает измененными все следующие, перестановка — reordered),
+    правила — по условию (тип документа, текущая ревизия, оператор, коды проверки)
+    """
+    sequences = _diff(
+        list(before.sequences), list(after.sequences),
+        key=lambda item: tuple(item.get(field) for field in SEQUENCE_KEY_FIELDS),
+        compare_fields=("is_final", "requires_transmittal"),
+        track_order=True
+    )
+    rules = _diff(
+        list(before.rules), list(after.rules),
+        key=lambda rule: tuple(rule.get(field) for field in RULE_KEY_FIELDS),
+        compare_fields=("priority", "next_revision_description_id", "next_revision_step_id")
+    )
+    return {
+        "preset_id": after.preset_id,
+        "from_version": {"id": before.version_id, "version_number": before.version_number},
+        "to_version": {"id": after.version_id, "version_number": after.version_number},
+        "sequences": sequences,
+        "rules": rules,
+        "has_changes": any(section.get(kind) for section in (sequences, rules)
+                           for kind in ("added", "removed", "changed", "reordered"))
+    }
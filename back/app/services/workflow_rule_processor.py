@@ -1,183 +1,103 @@
 """
-Сервис для обработки правил workflow с поддержкой операторов сравнения
+Правила версии пресета workflow, скомпилированные в неизменяемую таблицу решений.
+
+Таблица строится из снимка версии (до трех запросов к справочникам) и кешируется в процессе
+по id версии — версии неизменяемы, поэтому сохранение пресета кеш не сбрасывает, а лишь
+переключает текущую версию. Применение правила — поиск по ключу (описание ревизии, шаг,
+тип документа) без запросов к БД.
 """
 
 import json
-from typing import Optional, Dict, Any
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
 from sqlalchemy.orm import Session
-from app.models.references import ReviewCode
 
+from app.core.config import settings
+from app.models.references import ReviewCode, RevisionDescription, RevisionStep
+from app.services.workflow_preset_versions import (
+    PresetSnapshot, VersionCache, get_current_version_id, get_snapshot
+)
 
-class WorkflowRuleProcessor:
-    """Процессор правил workflow с поддержкой операторов"""
-    
-    @staticmethod
-    def evaluate_rule(rule, current_revision_description_id: int, 
-                    current_revision_step_id: int, review_code_id: int, 
-                    db: Session) -> bool:
-        """
-        Оценивает правило на соответствие текущим условиям
-        
-        Args:
-            rule: WorkflowPresetRule объект
-            current_revision_description_id: ID текущего описания ревизии
-            current_revision_step_id: ID текущего шага ревизии  
-            review_code_id: ID кода проверки
-            db: Сессия базы данных
-            
-        Returns:
-            bool: True если правило соответствует условиям
-        """
-        # Проверяем соответствие текущей ревизии
-        if (rule.current_revision_description_id != current_revision_description_id or 
-            rule.current_revision_step_id != current_revision_step_id):
-            return False
-        
-        # Получаем код проверки
-        review_code = db.query(ReviewCode).filter(ReviewCode.id == review_code_id).first()
-        if not review_code:
-            return False
-        
-        # Оцениваем оператор
-        return WorkflowRuleProcessor._evaluate_operator(
-            rule.operator, 
-            rule.review_code_id, 
-            rule.review_code_list, 
-            review_code
-        )
-    
-    @staticmethod
-    def _evaluate_operator(operator: str, rule_review_code_id: Optional[int], 
-                          review_code_list: Optional[str], 
-                          current_review_code: ReviewCode) -> bool:
-        """
-        Оценивает оператор сравнения
-        
-        Args:
-            operator: Тип оператора (equals, not_equals, in_list, not_in_list)
-            rule_review_code_id: ID кода проверки в правиле (для equals/not_equals)
-            review_code_list: JSON список кодов (для in_list/not_in_list)
-            current_review_code: Текущий код проверки
-            
-        Returns:
-            bool: Результат сравнения
-        """
-        if operator == "equals":
-            return rule_review_code_id == current_review_code.id
-            
-        elif operator == "not_equals":
-            return rule_review_code_id != current_review_code.id
-            
-        elif operator == "in_list":
-            if not review_code_list:
-                return False
-            try:
-                code_list = json.loads(review_code_list)
-                return current_review_code.code in code_list
-            except (json.JSONDecodeError, TypeError):
-                return False
-                
-        elif operator == "not_in_list":
-            if not review_code_list:
-                return False
-            try:
-                code_list = json.loads(review_code_list)
-                return current_review_code.code not in code_list
-            except (json.JSONDecodeError, TypeError):
-                return False
-        
+# (revision_description_id, revision_step_id, document_type_id); None — правила для любого типа документа
+RuleKey = Tuple[int, int, Optional[int]]
+
+
+@dataclass(frozen=True)
+class CompiledRule:
+    """Правило с разобранным списком кодов (множество id кодов проверки)"""
+    id: int
+    priority: int
+    operator: str
+    review_code_id: Optional[int]
+    review_code_ids: FrozenSet[int]
+    has_review_code_list: bool
+    document_type_id: Optional[int]
+    next_revision_description_id: Optional[int]
+    next_revision_step_id: Optional[int]
+
+    def matches(self, review_code_id: int) -> bool:
+        if self.operator == "equals":
+            return self.review_code_id == review_code_id
+        if self.operator == "not_equals":
+            return self.review_code_id != review_code_id
+        if self.operator == "in_list":
+            return review_code_id in self.review_code_ids
+        if self.operator == "not_in_list":
+            # Пустой или некорректный список не совпадает ни с чем
+            return self.has_review_code_list and review_code_id not in self.review_code_ids
         # Неизвестный оператор
         return False
-    
-    @staticmethod
-    def find_applicable_rule(rules, current_revision_description_id: int,
-                           current_revision_step_id: int, review_code_id: int,
-                           db: Session) -> Optional[Any]:
+
+
+@dataclass(frozen=True)
+class DecisionTable:
+    """Неизменяемая таблица решений версии пресета"""
+    version_id: Optional[int]
+    rules: Dict[RuleKey, Tuple[CompiledRule, ...]]
+    generic_rules: Dict[Tuple[int, int], Tuple[CompiledRule, ...]]
+    review_code_ids: FrozenSet[int]
+    revision_descriptions: Dict[int, Dict[str, Any]]
+    revision_steps: Dict[int, Dict[str, Any]]
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.rules
+
+    def find_rule(
+        self,
+        current_revision_description_id: int,
+        current_revision_step_id: int,
+        review_code_id: int,
+        document_type_id: Optional[int] = None
+    ) -> Optional[CompiledRule]:
         """
-        Находит применимое правило для текущих условий
-        
-        Args:
-            rules: Список правил (отсортированных по приоритету)
-            current_revision_description_id: ID текущего описания ревизии
-            current_revision_step_id: ID текущего шага ревизии
-            review_code_id: ID кода проверки
-            db: Сессия базы данных
-            
-        Returns:
-            WorkflowPresetRule или None
+        Первое по приоритету совпавшее правило. Без типа документа рассматриваются все правила
+        ревизии; с типом — правила этого типа и общие (document_type_id не задан).
         """
-        for rule in rules:
-            if WorkflowRuleProcessor.evaluate_rule(
-                rule, current_revision_description_id, 
-                current_revision_step_id, review_code_id, db
-            ):
+        if review_code_id not in self.review_code_ids:
+            return None
+        candidates = self.rules.get(
+            (current_revision_description_id, current_revision_step_id, document_type_id)
+        )
+        if candidates is None and document_type_id is not None:
+            # Для типа документа без своих правил применяются только общие
+            candidates = self.generic_rules.get((current_revision_description_id, current_revision_step_id))
+        for rule in candidates or ():
+            if rule.matches(review_code_id):
                 return rule
         return None
-    
-    @staticmethod
-    def get_next_revision(rule, current_revision_description_id: int,
-                         current_revision_step_id: int, db: Session) -> Dict[str, Any]:
-        """
-        Определяет следующую ревизию на основе правила
-        
-        Args:
-            rule: WorkflowPresetRule объект
-            current_revision_description_id: ID текущего описания ревизии
-            current_revision_step_id: ID текущего шага ревизии
-            db: Сессия базы данных
-            
-        Returns:
-            Dict с информацией о следующей ревизии
-        """
-        from app.models.references import RevisionDescription, RevisionStep
-        
-        # Если указана конкретная следующая ревизия
+
+    def next_revision(self, rule: CompiledRule) -> Dict[str, Any]:
+        """Следующая ревизия по правилу — из данных, загруженных при компиляции"""
         if rule.next_revision_description_id:
-            next_desc = db.query(RevisionDescription).filter(
-                RevisionDescription.id == rule.next_revision_description_id
-            ).first()
-            next_step = db.query(RevisionStep).filter(
-                RevisionStep.id == rule.next_revision_step_id
-            ).first() if rule.next_revision_step_id else None
-            
             return {
                 "action": "specific_revision",
                 "revision_description_id": rule.next_revision_description_id,
                 "revision_step_id": rule.next_revision_step_id,
-                "revision_description": next_desc,
-                "revision_step": next_step
+                "revision_description": self.revision_descriptions.get(rule.next_revision_description_id),
+                "revision_step": self.revision_steps.get(rule.next_revision_step_id)
             }
-        
-        # Если action_on_fail = "increment_number", увеличиваем номер
-        elif rule.action_on_fail == "increment_number":
-            current_step = db.query(RevisionStep).filter(
-                RevisionStep.id == current_revision_step_id
-            ).first()
-            
-            if current_step:
-                # Простая логика увеличения номера (01 -> 02, 02 -> 03)
-                try:
-                    current_number = int(current_step.code)
-                    next_number = current_number + 1
-                    next_step_code = f"{next_number:02d}"
-                    
-                    # Ищем следующий шаг с таким кодом
-                    next_step = db.query(RevisionStep).filter(
-                        RevisionStep.code == next_step_code
-                    ).first()
-                    
-                    if next_step:
-                        return {
-                            "action": "increment_number",
-                            "revision_description_id": current_revision_description_id,
-                            "revision_step_id": next_step.id,
-                            "revision_description": None,  # Остается тот же
-                            "revision_step": next_step
-                        }
-                except (ValueError, TypeError):
-                    pass
-        
-        # Если ничего не подошло, возвращаем None
         return {
             "action": "no_action",
             "revision_description_id": None,
@@ -185,3 +105,124 @@ class WorkflowRuleProcessor:
             "revision_description": None,
             "revision_step": None
         }
+
+
+def parse_review_code_list(value: Optional[str]) -> Optional[FrozenSet[str]]:
+    """JSON-список кодов проверки правила; None — список не задан или некорректен"""
+    if not value:
+        return None
+    try:
+        codes = json.loads(value)
+    except (json.JSONDecodeError, TypeError):
+        return None
+    if not isinstance(codes, list):
+        return None
+    return frozenset(str(code) for code in codes)
+
+
+EMPTY_TABLE = DecisionTable(
+    version_id=None, rules={}, generic_rules={}, review_code_ids=frozenset(),
+    revision_descriptions={}, revision_steps={}
+)
+
+
+def compile_decision_table(db: Session, snapshot: PresetSnapshot) -> DecisionTable:
+    """Компилирует правила версии: коды проверки, описания и шаги следующих ревизий загружаются сразу"""
+    # Как ORDER BY priority, id в Postgres: правила без приоритета — в конце
+    rules = sorted(snapshot.rules, key=lambda rule: (rule["priority"] is None, rule["priority"] or 0, rule["id"]))
+
+    review_codes = dict(db.query(ReviewCode.code, ReviewCode.id).all())
+
+    next_description_ids = {rule["next_revision_description_id"] for rule in rules if rule["next_revision_description_id"]}
+    next_step_ids = {rule["next_revision_step_id"] for rule in rules if rule["next_revision_step_id"]}
+    revision_descriptions = {
+        item.id: {
+            "id": item.id,
+            "code": item.code,
+            "description": item.description,
+            "description_native": item.description_native
+        }
+        for item in (
+            db.query(RevisionDescription).filter(RevisionDescription.id.in_(next_description_ids)).all()
+            if next_description_ids else []
+        )
+    }
+    revision_steps = {
+        item.id: {
+            "id": item.id,
+            "code": item.code,
+            "description": item.description,
+            "description_native": item.description_native
+        }
+        for item in (
+            db.query(RevisionStep).filter(RevisionStep.id.in_(next_step_ids)).all()
+            if next_step_ids else []
+        )
+    }
+
+    by_revision: Dict[Tuple[int, int], List[CompiledRule]] = {}
+    document_types: Dict[Tuple[int, int], set] = {}
+    for rule in rules:
+        codes = parse_review_code_list(rule["review_code_list"])
+        has_review_code_list = codes is not None
+        codes = codes or frozenset()
+        compiled = CompiledRule(
+            id=rule["id"],
+            priority=rule["priority"],
+            operator=rule["operator"] or "equals",
+            review_code_id=rule["review_code_id"],
+            review_code_ids=frozenset(review_codes[code] for code in codes if code in review_codes),
+            has_review_code_list=has_review_code_list,
+            document_type_id=rule["document_type_id"],
+            next_revision_description_id=rule["next_revision_description_id"],
+            next_revision_step_id=rule["next_revision_step_id"]
+        )
+        revision_key = (rule["current_revision_description_id"], rule["current_revision_step_id"])
+        by_revision.setdefault(revision_key, []).append(compiled)
+        if compiled.document_type_id is not None:
+            document_types.setdefault(revision_key, set()).add(compiled.document_type_id)
+
+    table: Dict[RuleKey, Tuple[CompiledRule, ...]] = {}
+    generic_rules: Dict[Tuple[int, int], Tuple[CompiledRule, ...]] = {}
+    for (description_id, step_id), revision_rules in by_revision.items():
+        # Правила уже упорядочены по приоритету; ключ без типа документа — все правила ревизии
+        table[(description_id, step_id, None)] = tuple(revision_rules)
+        for document_type_id in document_types.get((description_id, step_id), ()):
+            table[(description_id, step_id, document_type_id)] = tuple(
+                rule for rule in revision_rules
+                if rule.document_type_id is None or rule.document_type_id == document_type_id
+            )
+        generic_rules[(description_id, step_id)] = tuple(
+            rule for rule in revision_rules if rule.document_type_id is None
+        )
+
+    return DecisionTable(
+        version_id=snapshot.version_id,
+        rules=table,
+        generic_rules=generic_rules,
+        review_code_ids=frozenset(review_codes.values()),
+        revision_descriptions=revision_descriptions,
+        revision_steps=revision_steps
+    )
+
+
+decision_table_cache = VersionCache(
+    max_entries=settings.WORKFLOW_PRESET_VERSION_CACHE_MAX_ENTRIES, ttl=settings.WORKFLOW_RULES_CACHE_TTL
+)
+
+
+def get_decision_table(db: Session, version_id: Optional[int]) -> DecisionTable:
+    """Таблица решений версии пресета; для отсутствующей версии — пустая таблица"""
+    table = decision_table_cache.get(version_id) if version_id is not None else None
+    if table is None:
+        snapshot = get_snapshot(db, version_id)
+        if snapshot is None:
+            return EMPTY_TABLE
+        table = compile_decision_table(db, snapshot)
+        decision_table_cache.put(version_id, table)
+    return table
+
+
+def get_preset_decision_table(db: Session, preset_id: int) -> DecisionTable:
+    """Таблица решений текущей версии пресета"""
+    return get_decision_table(db, get_current_version_id(db, preset_id))
@@ -0,0 +1,81 @@
+"""
+Воркер фоновых задач: пул процессов, каждый опрашивает очередь в PostgreSQL
+"""
+
+import os
+import socket
+import time
+import logging
+import threading
+import multiprocessing
+from datetime import datetime, timezone
+
+from app.core.config import settings
+from app.core.database import SessionLocal, engine
+from app.models.background_job import BackgroundJob
+from app.services.job_queue import claim_next_job, execute_job
+import app.services.job_handlers  # noqa: F401 — регистрация обработчиков
+
+logger = logging.getLogger(__name__)
+
+
+def _heartbeat_loop(job_id: int, stop: threading.Event):
+    """Периодически обновляет heartbeat_at, чтобы задачу не забрал другой воркер"""
+    while not stop.wait(settings.JOB_HEARTBEAT_INTERVAL):
+        try:
+            with SessionLocal() as db:
+                db.query(BackgroundJob).filter(BackgroundJob.id == job_id).update(
+                    {"heartbeat_at": datetime.now(timezone.utc)}
+                )
+                db.commit()
+        except Exception:
+            logger.exception("Heartbeat failed for job %s", job_id)
+
+
+def worker_loop(worker_index: int):
+    """Основной цикл процесса-воркера"""
+    # Соединения родительского процесса не переиспользуем после fork
+    engine.dispose(close=False)
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{worker_index}"
+    logger.info("Job worker %s started", worker_id)
+
+    while True:
+        try:
+            with SessionLocal() as db:
+                job = claim_next_job(db, worker_id)
+                if job is not None:
+                    db.expunge(job)
+        except Exception:
+            logger.exception("Failed to claim job")
+            job = None
+
+        if job is None:
+            time.sleep(settings.JOB_POLL_INTERVAL)
+            continue
+
+        logger.info("Worker %s running job %s (%s)", worker_id, job.id, job.job_type)
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=_heartbeat_loop, args=(job.id, stop), daemon=True)
+        heartbeat.start()
+        try:
+            execute_job(job)
+        finally:
+            stop.set()
+            heartbeat.join()
+
+
+def run_workers(processes: int = None):
+    """Запускает пул процессов-воркеров и ждет их завершения"""
+    processes = processes or settings.JOB_WORKER_PROCESSES
+    workers = [
+        multiprocessing.Process(target=worker_loop, args=(i,), daemon=False)
+        for i in range(processes)
+    ]
+    for process in workers:
+        process.start()
+    try:
+        for process in workers:
+            process.join()
+    except KeyboardInterrupt:
+        for process in workers:
+            process.terminate()
@@ -3,18 +3,16 @@
 """
 
 import json
-from app.models.project import WorkflowPresetRule
-from app.services.workflow_rule_processor import WorkflowRuleProcessor
 
 def create_example_preset_rules():
     """
     Создает примеры правил для вашей логики:
-    - K + code 3 → K+1 (увеличение номера)
+    - K + code 3 → K (следующая ревизия с тем же описанием, номер увеличивается)
     - K + любой код кроме 3 → U01
     - V01 → финальная ревизия
     """
     
-    # Правило 1: K + code 3 → K+1
+    # Правило 1: K + code 3 → K (номер ревизии увеличивается при ее создании)
     rule_k_increment = {
         "current_revision_description_id": "K_ID",  # ID для K
         "current_revision_step_id": "01_ID",  # ID для 01
@@ -22,9 +20,8 @@ def create_example_preset_rules():
         "review_code_id": "3_ID",  # ID для кода 3
         "review_code_list": None,
         "priority": 10,
-        "next_revision_description_id": None,  # null для +1
-        "next_revision_step_id": None,  # null для +1
-        "action_on_fail": "increment_number"
+        "next_revision_description_id": "K_ID",  # То же описание
+        "next_revision_step_id": "01_ID"
     }
     
     # Правило 2: K + любой код кроме 3 → U01
@@ -36,8 +33,7 @@ def create_example_preset_rules():
         "review_code_list": None,
         "priority": 20,
         "next_revision_description_id": "U_ID",  # ID для U
-        "next_revision_step_id": "01_ID",  # ID для 01
-        "action_on_fail": "stay_same"
+        "next_revision_step_id": "01_ID"  # ID для 01
     }
     
     # Альтернативное правило 2 через список: K + коды 1,2,4 → U01
@@ -49,8 +45,7 @@ def create_example_preset_rules():
         "review_code_list": json.dumps(["1", "2", "4"]),
         "priority": 20,
         "next_revision_description_id": "U_ID",
-        "next_revision_step_id": "01_ID",
-        "action_on_fail": "stay_same"
+        "next_revision_step_id": "01_ID"
     }
     
     # Правило 3: V01 → финальная (блокирует дальнейшие переходы)
@@ -62,8 +57,7 @@ def create_example_preset_rules():
         "review_code_list": None,
         "priority": 100,
         "next_revision_description_id": None,  # Финальная
-        "next_revision_step_id": None,  # Финальная
-        "action_on_fail": "stay_same"
+        "next_revision_step_id": None  # Финальная
     }
     
     return [rule_k_increment, rule_k_to_u, rule_v_final]
@@ -76,7 +70,7 @@ def demonstrate_rule_evaluation():
     
     # Пример 1: K01 + code 3 → должно сработать правило увеличения
     print("=== Пример 1: K01 + code 3 ===")
-    print("Ожидается: K02 (увеличение номера)")
+    print("Ожидается: K01 со следующим номером ревизии")
     
     # Пример 2: K01 + code 1 → должно сработать правило перехода к U
     print("\n=== Пример 2: K01 + code 1 ===")
@@ -92,7 +86,7 @@ def demonstrate_rule_evaluation():
     
     # Пример 5: V01 + любой код → финальная ревизия
     print("\n=== Пример 5: V01 + любой код ===")
-    print("Ожидается: Финальная ревизия (блокировка)")
+    print("Ожидается: no_action (следующая ревизия не задана)")
 
 
 def create_api_example():
@@ -113,9 +107,11 @@ def create_api_example():
     expected_response = {
         "rule_matched": True,
         "next_revision": {
-            "action": "increment_number",
+            "action": "specific_revision",
             "revision_description_id": "K_ID",
-            "revision_step_id": "02_ID"
+            "revision_step_id": "01_ID",
+            "revision_description": {"id": "K_ID", "code": "K", "description": "..."},
+            "revision_step": {"id": "01_ID", "code": "01", "description": "..."}
         },
         "rule_id": 1,
         "message": "Правило успешно применено"
@@ -0,0 +1,14 @@
+#!/usr/bin/env python3
+"""
+Скрипт для запуска воркера фоновых задач (импорт трансмитталов и документов)
+Запуск: python run_worker.py [кол-во процессов]
+"""
+
+import sys
+import logging
+
+from app.worker import run_workers
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(processName)s %(levelname)s %(message)s")
+    run_workers(int(sys.argv[1]) if len(sys.argv) > 1 else None)
@@ -0,0 +1,171 @@
+"""
+Бенчмарк поиска лейблов импорта трансмиттала (extract_metadata / find_table_start)
+на синтетическом листе загрузки: построчный обход (как было) против векторного.
+
+Запуск из каталога back: python scripts/benchmark_transmittal_labels.py [строк]
+"""
+
+import os
+import sys
+import time
+from typing import Any, Dict
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app.services.transmittal_import import SheetGrid, extract_metadata, find_table_start  # noqa: E402
+
+METADATA_FIELDS = {
+    'transmittal_number': {'label': 'Transmittal No', 'position': 'right'},
+    'date': {'label': 'Date', 'position': 'below'},
+    'subject': {'label': 'Subject', 'position': 'right'},
+}
+TABLE_FIELDS = {
+    'document_number_label': 'Document Number',
+    'revision_label': 'Revision',
+    'status_label': 'Status',
+    'title_label': 'Title',
+}
+# Поля, которых нет на листе: худший случай (поиск по всему листу)
+METADATA_FIELDS_MISSING = {**METADATA_FIELDS, 'project': {'label': 'Project Code', 'position': 'right'}}
+TABLE_FIELDS_MISSING = {**TABLE_FIELDS, 'review_code_label': 'Review Code'}
+
+
+# Прежняя реализация (построчный обход iterrows) — для сравнения времени и результата
+def legacy_extract_metadata(excel_data: pd.DataFrame, metadata_fields: Dict[str, Any]) -> Dict[str, str]:
+    """Извлекает метаданные из Excel файла по настройкам"""
+    metadata = {}
+    
+    for field_key, field_config in metadata_fields.items():
+        label = field_config['label']
+        position = field_config['position']
+        
+        # Ищем ячейку с лейблом (более гибкий поиск)
+        for row_idx, row in excel_data.iterrows():
+            for col_idx, cell_value in enumerate(row):
+                if pd.notna(cell_value):
+                    cell_str = str(cell_value).strip()
+                    # Проверяем точное совпадение или вхождение лейбла в ячейку
+                    if cell_str == label or label in cell_str:
+                        # Находим значение в указанной позиции
+                        if position == 'right' and col_idx + 1 < len(row):
+                            next_value = row.iloc[col_idx + 1]
+                            if pd.notna(next_value):
+                                metadata[field_key] = str(next_value).strip()
+                        elif position == 'left' and col_idx - 1 >= 0:
+                            prev_value = row.iloc[col_idx - 1]
+                            if pd.notna(prev_value):
+                                metadata[field_key] = str(prev_value).strip()
+                        elif position == 'below' and row_idx + 1 < len(excel_data):
+                            below_value = excel_data.iloc[row_idx + 1, col_idx]
+                            if pd.notna(below_value):
+                                metadata[field_key] = str(below_value).strip()
+                        elif position == 'above' and row_idx - 1 >= 0:
+                            above_value = excel_data.iloc[row_idx - 1, col_idx]
+                            if pd.notna(above_value):
+                                metadata[field_key] = str(above_value).strip()
+                        break
+            if field_key in metadata:
+                break
+    
+    return metadata
+
+def legacy_find_table_start(excel_data: pd.DataFrame, table_fields: Dict[str, str]) -> tuple[int, list[str]]:
+    """Находит начало таблицы по заголовкам и возвращает отсутствующие поля"""
+    # Фильтруем пустые поля - они не нужны для поиска заголовков
+    table_field_labels = [label for label in table_fields.values() if label and label.strip()]
+    missing_fields = []
+    
+    # Если нет полей для поиска, возвращаем ошибку
+    if not table_field_labels:
+        return None, ["Нет настроенных полей для поиска в таблице"]
+    
+    for row_idx, row in excel_data.iterrows():
+        # Проверяем каждую ячейку в строке на точное совпадение
+        found_headers = []
+        row_cells = []
+        for col_idx, cell_value in enumerate(row):
+            if pd.notna(cell_value):
+                cell_str = str(cell_value).strip()
+                row_cells.append(cell_str)
+                # Проверяем точное совпадение с каждым полем
+                for field_label in table_field_labels:
+                    if cell_str == field_label:
+                        found_headers.append(field_label)
+        
+        
+        # Если найдены ВСЕ заголовки - это начало таблицы
+        if len(found_headers) == len(table_field_labels):
+            return row_idx, []
+    
+    # Если не найдена строка со всеми заголовками, определяем отсутствующие поля
+    # Проверяем каждое поле отдельно по всему файлу на точное совпадение
+    for field_label in table_field_labels:
+        field_found = False
+        for row_idx, row in excel_data.iterrows():
+            for col_idx, cell_value in enumerate(row):
+                if pd.notna(cell_value):
+                    cell_str = str(cell_value).strip()
+                    if cell_str == field_label:
+                        field_found = True
+                        break
+            if field_found:
+                break
+        
+        if not field_found:
+            missing_fields.append(field_label)
+    
+    return None, missing_fields
+
+
+def make_sheet(n_rows: int) -> pd.DataFrame:
+    """Лист загрузки: шапка с метаданными, заголовок таблицы в строке 8, n_rows строк данных"""
+    n_cols = 12
+    rng = np.random.default_rng(0)
+    data = np.full((n_rows + 10, n_cols), np.nan, dtype=object)
+    data[1, 0:2] = ['Transmittal No', 'TR-0001']
+    data[2, 0:2] = ['Subject', 'Issued for construction']
+    data[3, 4] = 'Date'
+    data[4, 4] = '2025-10-20'
+    data[8, 0:6] = ['No.', 'Document Number', 'Title', 'Revision', 'Status', 'Remarks']
+    for i in range(n_rows):
+        data[9 + i, 0:6] = [
+            i + 1, f"PRJ-CIV-DWG-{i:05d}", f"Drawing sheet {i}", f"{rng.integers(0, 5):02d}",
+            'IFC' if i % 3 else 'IFR', None if i % 7 else 'see comment'
+        ]
+    return pd.DataFrame(data, columns=[f"Unnamed: {i}" for i in range(n_cols)])
+
+
+def timed(func, *args, repeat: int = 3):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best * 1000
+
+
+def main(n_rows: int = 20000):
+    sheet = make_sheet(n_rows)
+    print(f"sheet: {sheet.shape[0]} rows x {sheet.shape[1]} cols")
+
+    grid, grid_ms = timed(SheetGrid.from_dataframe, sheet)
+    cases = [
+        ("extract_metadata", legacy_extract_metadata, extract_metadata, METADATA_FIELDS),
+        ("extract_metadata (missing field)", legacy_extract_metadata, extract_metadata, METADATA_FIELDS_MISSING),
+        ("find_table_start", legacy_find_table_start, find_table_start, TABLE_FIELDS),
+        ("find_table_start (missing field)", legacy_find_table_start, find_table_start, TABLE_FIELDS_MISSING),
+    ]
+    print(f"{'SheetGrid build':36} {grid_ms:10.1f} ms")
+    for name, legacy, vectorized, fields in cases:
+        legacy_result, legacy_ms = timed(legacy, sheet, fields, repeat=1)
+        result, ms = timed(vectorized, grid, fields)
+        status = "OK" if legacy_result == result else f"DIFF {legacy_result!r} != {result!r}"
+        print(f"{name:36} legacy {legacy_ms:10.1f} ms   vectorized {ms:8.2f} ms   {status}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
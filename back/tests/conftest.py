@@ -0,0 +1,95 @@
+"""
+Общие фикстуры тестов: приложение на временной SQLite-базе (переменные окружения
+задаются до импорта app — настройки и движок читаются при импорте), подсчет SQL-запросов
+"""
+
+import os
+import tempfile
+from contextlib import contextmanager
+
+_TEST_DIR = tempfile.mkdtemp(prefix="edms_tests_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TEST_DIR, 'edms.db')}"
+os.environ["UPLOAD_DIR"] = os.path.join(_TEST_DIR, "uploads")
+os.environ["JOBS_DIR"] = os.path.join(_TEST_DIR, "jobs")
+os.environ["EXPORT_CACHE_DIR"] = os.path.join(_TEST_DIR, "exports")
+os.environ["TRANSMITTAL_PREVIEW_DIR"] = os.path.join(_TEST_DIR, "previews")
+
+import pytest  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+import app.models  # noqa: E402,F401
+import app.models.discipline  # noqa: E402,F401
+import app.models.references  # noqa: E402,F401
+from app.core.database import Base, SessionLocal, engine  # noqa: E402
+
+
+def _clear_caches():
+    """Кеши процесса переживают тест — сбрасываются вместе с базой"""
+    from app.services.project_access import access_cache
+    from app.services.project_catalogue import project_catalogue_cache
+    from app.services.workflow_preset_versions import current_version_cache, snapshot_cache, view_cache
+    from app.services.workflow_rule_processor import decision_table_cache
+
+    for cache in (access_cache, project_catalogue_cache, current_version_cache, snapshot_cache,
+                  view_cache, decision_table_cache):
+        cache.clear()
+
+
+@pytest.fixture
+def db():
+    """Сессия на пустой базе; после теста таблицы и кеши очищаются"""
+    Base.metadata.create_all(engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(engine)
+        _clear_caches()
+
+
+@pytest.fixture
+def client(db):
+    """
+    TestClient приложения; пользователь запроса задается через client.user
+    (get_current_active_user подменяется, startup-события не запускаются)
+    """
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+    from app.services.auth import get_current_active_user
+
+    test_client = TestClient(app)
+    test_client.user = None
+    app.dependency_overrides[get_current_active_user] = lambda: test_client.user
+    try:
+        yield test_client
+    finally:
+        app.dependency_overrides.pop(get_current_active_user, None)
+
+
+class QueryCounter:
+    """Число SQL-запросов, выполненных через движок приложения"""
+
+    def __init__(self):
+        self.count = 0
+        self.statements = []
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+        self.statements.append(statement)
+
+
+@contextmanager
+def count_queries():
+    counter = QueryCounter()
+    event.listen(engine, "before_cursor_execute", counter._before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", counter._before_cursor_execute)
+
+
+@pytest.fixture
+def query_counter():
+    return count_queries
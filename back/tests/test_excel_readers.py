@@ -0,0 +1,87 @@
+"""
+Бэкенды чтения листов Excel (app.services.excel_readers): строки отдаются итератором,
+сетка SheetGrid из любого бэкенда одинакова
+"""
+
+import io
+from collections.abc import Iterator
+
+import pytest
+from openpyxl import Workbook
+
+from app.services.excel_readers import ExcelReadError, SheetNotFoundError, read_sheet
+from app.services.transmittal_import import SheetGrid
+
+SHEET = "Load Sheet"
+ROWS = [
+    ("Header", None, None),
+    ("Transmittal No.", "TR-001", None),
+    (None, None, None),
+    ("Document No.", "Title", "Rev"),
+    ("DOC-1", "Plan", 1),
+    ("DOC-2", "  Section  ", 2.0),
+    (None, None, None),
+]
+
+
+@pytest.fixture
+def workbook_bytes():
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.title = SHEET
+    for row in ROWS:
+        sheet.append(row)
+    workbook.create_sheet("Other")
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def _grid_cells(grid):
+    return [(int(row), int(col), cell) for row, col, cell in zip(grid.rows, grid.cols, grid.cells)]
+
+
+EXPECTED_CELLS = [
+    (0, 0, "Transmittal No."), (0, 1, "TR-001"),
+    (2, 0, "Document No."), (2, 1, "Title"), (2, 2, "Rev"),
+    (3, 0, "DOC-1"), (3, 1, "Plan"), (3, 2, "1"),
+    (4, 0, "DOC-2"), (4, 1, "Section"), (4, 2, "2"),
+]
+
+
+def test_openpyxl_returns_iterator(workbook_bytes):
+    rows = read_sheet(workbook_bytes, SHEET, backend="openpyxl")
+    assert isinstance(rows, Iterator)
+    assert next(rows) == ROWS[0]
+
+
+def test_openpyxl_grid(workbook_bytes):
+    grid = SheetGrid.from_rows(read_sheet(workbook_bytes, SHEET, backend="openpyxl"))
+    # Пустая строка в конце отбрасывается
+    assert grid.shape == (5, 3)
+    assert _grid_cells(grid) == EXPECTED_CELLS
+
+
+def test_calamine_grid(workbook_bytes):
+    pytest.importorskip("python_calamine")
+    rows = read_sheet(workbook_bytes, SHEET, backend="calamine")
+    assert isinstance(rows, Iterator)
+    grid = SheetGrid.from_rows(rows)
+    assert grid.shape[0] == 5
+    assert _grid_cells(grid) == EXPECTED_CELLS
+
+
+@pytest.mark.parametrize("backend", ["openpyxl", "calamine"])
+def test_missing_sheet(workbook_bytes, backend):
+    if backend == "calamine":
+        pytest.importorskip("python_calamine")
+    with pytest.raises(SheetNotFoundError):
+        read_sheet(workbook_bytes, "Missing", backend=backend)
+
+
+@pytest.mark.parametrize("backend", ["openpyxl", "calamine"])
+def test_unreadable_file(backend):
+    if backend == "calamine":
+        pytest.importorskip("python_calamine")
+    with pytest.raises(ExcelReadError):
+        read_sheet(b"not an xlsx", SHEET, backend=backend)
@@ -0,0 +1,119 @@
+"""
+Помещение файлов в хранилище (app.services.file_ingest): каждый способ дает
+побайтно совпадающий файл и сообщает использованный метод
+"""
+
+import errno
+import hashlib
+import os
+
+import pytest
+
+from app.services import file_ingest
+from app.services.file_ingest import INGEST_MODES, ingest_file
+
+# Больше одного блока и не кратно странице — проверяет дочитывание хвоста
+DATA_SIZE = 3 * 1024 * 1024 + 123
+
+
+def _sha256(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "source.bin"
+    path.write_bytes(os.urandom(DATA_SIZE))
+    return str(path)
+
+
+@pytest.fixture
+def destination(tmp_path):
+    return str(tmp_path / "stored.bin")
+
+
+def _assert_same(source, destination):
+    assert os.path.getsize(destination) == DATA_SIZE
+    assert _sha256(destination) == _sha256(source)
+
+
+def test_reflink(source, destination):
+    if not file_ingest._reflink(source, destination):
+        pytest.skip("ФС не поддерживает reflink (FICLONE)")
+    _assert_same(source, destination)
+    assert os.stat(source).st_ino != os.stat(destination).st_ino
+
+
+def test_hardlink(source, destination):
+    if not file_ingest._hardlink(source, destination):
+        pytest.skip("ФС не поддерживает жесткие ссылки")
+    _assert_same(source, destination)
+    assert os.stat(source).st_ino == os.stat(destination).st_ino
+
+
+def test_auto_falls_back_to_hardlink(source, destination, monkeypatch):
+    monkeypatch.setattr(file_ingest, "_reflink", lambda src, dst: False)
+    method = ingest_file(source, destination, "auto")
+    if method != "hardlink":
+        pytest.skip("ФС не поддерживает жесткие ссылки")
+    _assert_same(source, destination)
+
+
+def test_copy_file_range(source, destination):
+    if not hasattr(os, "copy_file_range"):
+        pytest.skip("os.copy_file_range недоступен")
+    try:
+        method = file_ingest._kernel_copy(source, destination)
+    except OSError as e:
+        pytest.skip(f"copy_file_range не поддерживается: {e}")
+    if method != "copy_file_range":
+        pytest.skip("ФС не поддерживает copy_file_range")
+    _assert_same(source, destination)
+
+
+def test_sendfile(source, destination, monkeypatch):
+    if not hasattr(os, "sendfile"):
+        pytest.skip("os.sendfile недоступен")
+    monkeypatch.delattr(os, "copy_file_range", raising=False)
+    assert file_ingest._kernel_copy(source, destination) == "sendfile"
+    _assert_same(source, destination)
+
+
+def test_unsupported_copy_file_range_falls_back_to_sendfile(source, destination, monkeypatch):
+    if not hasattr(os, "sendfile"):
+        pytest.skip("os.sendfile недоступен")
+
+    def unsupported(*args):
+        raise OSError(errno.EXDEV, "cross-device")
+
+    monkeypatch.setattr(os, "copy_file_range", unsupported, raising=False)
+    assert file_ingest._kernel_copy(source, destination) == "sendfile"
+    _assert_same(source, destination)
+
+
+def test_buffered_copy_fallback(source, destination, monkeypatch):
+    monkeypatch.delattr(os, "copy_file_range", raising=False)
+    monkeypatch.delattr(os, "sendfile", raising=False)
+    assert file_ingest._kernel_copy(source, destination) == "copy"
+    _assert_same(source, destination)
+
+
+@pytest.mark.parametrize("mode", INGEST_MODES)
+def test_ingest_modes(source, destination, mode):
+    method = ingest_file(source, destination, mode)
+    allowed = {
+        "auto": {"reflink", "hardlink", "copy_file_range", "sendfile", "copy"},
+        "reflink": {"reflink", "copy_file_range", "sendfile", "copy"},
+        "copy": {"copy_file_range", "sendfile", "copy"},
+    }[mode]
+    assert method in allowed
+    _assert_same(source, destination)
+    if mode != "auto":
+        # Без hardlink файл хранилища не делит inode с источником
+        assert os.stat(source).st_ino != os.stat(destination).st_ino
+
+
+def test_unknown_mode(source, destination):
+    with pytest.raises(ValueError):
+        ingest_file(source, destination, "symlink")
@@ -0,0 +1,66 @@
+"""
+GET /projects: число SQL-запросов не зависит от числа проектов
+(проекты, участники-пользователи и участники-компании загружаются пакетно)
+"""
+
+from app.models.project import Project, ProjectMember
+from app.models.project_participant import ProjectParticipant
+from app.models.project_role import ProjectRole
+from app.models.references import Company
+from app.models.user import User
+
+
+def _create_projects(db, user, count, offset=0):
+    role = db.query(ProjectRole).filter(ProjectRole.code == "manager").first()
+    if role is None:
+        role = ProjectRole(code="manager", name="Менеджер")
+        db.add(role)
+        db.flush()
+    colleague = User(
+        username=f"colleague{offset}", email=f"colleague{offset}@example.com",
+        full_name="Коллега", hashed_password="x"
+    )
+    db.add(colleague)
+    db.flush()
+    for index in range(offset, offset + count):
+        project = Project(
+            name=f"Проект {index}", project_code=f"P{index:03d}", status="PLANNING", created_by=user.id
+        )
+        db.add(project)
+        db.flush()
+        db.add_all([
+            ProjectMember(project_id=project.id, user_id=user.id, project_role_id=role.id),
+            ProjectMember(project_id=project.id, user_id=colleague.id),
+        ])
+        for company_index in range(2):
+            company = Company(name=f"Компания {index}.{company_index}")
+            db.add(company)
+            db.flush()
+            db.add(ProjectParticipant(project_id=project.id, company_id=company.id, is_primary=company_index == 0))
+    db.commit()
+
+
+def _count_list_queries(client, query_counter):
+    with query_counter() as counter:
+        response = client.get("/api/v1/projects/")
+    assert response.status_code == 200, response.text
+    return counter.count, response.json()
+
+
+def test_project_list_query_count_is_constant(db, client, query_counter):
+    user = User(username="owner", email="owner@example.com", full_name="Владелец", hashed_password="x")
+    db.add(user)
+    db.commit()
+    client.user = user
+
+    _create_projects(db, user, 2)
+    small_count, projects = _count_list_queries(client, query_counter)
+    assert len(projects) == 2
+
+    _create_projects(db, user, 18, offset=2)
+    large_count, projects = _count_list_queries(client, query_counter)
+    assert len(projects) == 20
+    assert all(len(project["members"]) == 2 and len(project["participants"]) == 2 for project in projects)
+    assert all(project["user_role"] == "Менеджер" for project in projects)
+
+    assert large_count == small_count
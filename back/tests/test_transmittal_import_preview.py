@@ -0,0 +1,73 @@
+"""
+Листы предпросмотра импорта трансмиттала сохраняются рядом с книгой: другой процесс
+(воркер импорта) берет разобранный лист из общего каталога, не разбирая книгу заново
+"""
+
+import io
+import os
+
+import numpy as np
+import pytest
+from openpyxl import Workbook
+
+from app.core.metrics import StageTimer
+from app.services import transmittal_import_preview as preview
+from app.services.transmittal_import_preview import GridCache, WorkbookStore
+
+CONTENT_HASH = "a" * 64
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = WorkbookStore(str(tmp_path), ttl=900)
+    monkeypatch.setattr(preview, "workbook_store", store)
+    monkeypatch.setattr(preview, "preview_cache", GridCache(ttl=900, max_bytes=64 * 1024 * 1024))
+    return store
+
+
+@pytest.fixture
+def workbook(store):
+    book = Workbook()
+    sheet = book.active
+    sheet.title = "Load Sheet"
+    for row in (("Header",), ("Transmittal No.", "TR-001"), ("Document No.", "Title"), ("DOC-1", "Plan")):
+        sheet.append(row)
+    book.create_sheet("Other").append(("Header",))
+    buffer = io.BytesIO()
+    book.save(buffer)
+    return store.put(1, CONTENT_HASH, buffer.getvalue(), "transmittal.xlsx")
+
+
+def _grid(workbook, sheet_name):
+    timer = StageTimer()
+    grid, cached = preview._get_grid(1, CONTENT_HASH, workbook, sheet_name, timer)
+    return grid, cached, timer.stages
+
+
+def test_worker_reuses_grid_parsed_at_preview(workbook):
+    grid, cached, stages = _grid(workbook, "Load Sheet")
+    assert not cached and "parse" in stages
+
+    # Другой процесс: кеш в памяти пуст, лист берется из общего каталога
+    preview.preview_cache = GridCache(ttl=900, max_bytes=64 * 1024 * 1024)
+    loaded, cached, stages = _grid(workbook, "Load Sheet")
+    assert cached and "parse" not in stages and "grid_load" in stages
+    assert loaded.shape == grid.shape
+    assert np.array_equal(loaded.cells, grid.cells)
+    assert loaded.value(0, 1) == "TR-001"
+    assert list(loaded.match_contains(["Document"])["Document"]) == list(grid.match_contains(["Document"])["Document"])
+
+
+def test_other_sheet_is_parsed(workbook):
+    _grid(workbook, "Load Sheet")
+    _, cached, stages = _grid(workbook, "Other")
+    assert not cached and "parse" in stages
+
+
+def test_discard_removes_grids(store, workbook):
+    _grid(workbook, "Load Sheet")
+    user_dir = os.path.dirname(workbook.path)
+    assert any(name.endswith(".grid") for name in os.listdir(user_dir))
+    store.discard(1, CONTENT_HASH)
+    assert os.listdir(user_dir) == []
+    assert store.get_grid(1, CONTENT_HASH, "Load Sheet") is None
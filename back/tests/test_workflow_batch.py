@@ -0,0 +1,133 @@
+"""
+Пакетное применение правил workflow (POST /workflow-rules/apply-rules/batch): статусы строк
+отчета и пакетное создание следующих ревизий по правилам ручного создания ревизии
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.document import Document, DocumentRevision
+from app.models.project import Project
+from app.models.references import ReviewCode, RevisionDescription, RevisionStatus, RevisionStep, WorkflowStatus
+from app.models.user import User
+
+BATCH_URL = "/api/v1/workflow-rules/apply-rules/batch"
+
+
+@pytest.fixture
+def setup(db, client):
+    """Админ, справочники, пресет с правилом K01 + код 1 -> U01 и проект, закрепленный на его версии"""
+    user = User(username="admin", email="admin@example.com", full_name="Админ", hashed_password="x", is_admin=True)
+    k, u = RevisionDescription(code="K"), RevisionDescription(code="U")
+    step = RevisionStep(code="01")
+    statuses = {name: RevisionStatus(name=name) for name in ("Active", "Superseded", "Cancelled")}
+    draft = WorkflowStatus(name="Draft")
+    codes = [ReviewCode(code="1", name="Код 1"), ReviewCode(code="3", name="Код 3")]
+    db.add_all([user, k, u, step, draft, *statuses.values(), *codes])
+    db.commit()
+    client.user = user
+
+    response = client.post("/api/v1/workflow-presets/", json={
+        "name": "Пресет",
+        "rules": [{
+            "current_revision_description_id": k.id,
+            "current_revision_step_id": step.id,
+            "review_code_id": codes[0].id,
+            "next_revision_description_id": u.id,
+            "next_revision_step_id": step.id,
+        }],
+    })
+    assert response.status_code == 200, response.text
+    preset = response.json()
+    project = Project(
+        name="Проект", project_code="P001", status="PLANNING", created_by=user.id,
+        workflow_preset_id=preset["id"], workflow_preset_version_id=preset["current_version_id"]
+    )
+    db.add(project)
+    db.commit()
+    return {"db": db, "user": user, "project": project, "k": k, "u": u, "step": step,
+            "statuses": statuses, "draft": draft}
+
+
+def _document(setup, number, revisions):
+    """Документ с ревизиями [(номер, статус)] в порядке создания; возвращает ревизии"""
+    db = setup["db"]
+    document = Document(project_id=setup["project"].id, title=number, number=number, created_by=setup["user"].id)
+    db.add(document)
+    db.flush()
+    created = []
+    started = datetime(2024, 1, 1)
+    for position, (revision_number, status) in enumerate(revisions):
+        revision = DocumentRevision(
+            document_id=document.id, number=revision_number, uploaded_by=setup["user"].id, is_deleted=0,
+            revision_status_id=setup["statuses"][status].id,
+            revision_description_id=setup["k"].id, revision_step_id=setup["step"].id,
+            created_at=started + timedelta(days=position)
+        )
+        db.add(revision)
+        created.append(revision)
+    db.commit()
+    return created
+
+
+def _post(client, items, create_revisions=True):
+    response = client.post(BATCH_URL, json={"items": items, "create_revisions": create_revisions})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_match_without_creating(setup, client):
+    (revision,) = _document(setup, "DOC-1", [("01", "Active")])
+
+    report = _post(client, [{"revision_id": revision.id, "review_code": "1"}], create_revisions=False)
+
+    (result,) = report["results"]
+    assert result["status"] == "matched"
+    assert result["next_revision"]["revision_description_id"] == setup["u"].id
+    assert setup["db"].query(DocumentRevision).count() == 1
+
+
+def test_batch_creates_next_revisions(setup, client):
+    db = setup["db"]
+    (latest,) = _document(setup, "DOC-1", [("01", "Active")])
+    older, _ = _document(setup, "DOC-2", [("01", "Superseded"), ("02", "Active")])
+    (other,) = _document(setup, "DOC-3", [("01", "Active")])
+
+    report = _post(client, [
+        {"revision_id": latest.id, "review_code": "1"},
+        {"revision_id": latest.id, "review_code": "1"},
+        {"revision_id": older.id, "review_code": "1"},
+        {"revision_id": other.id, "review_code": "ZZ"},
+    ])
+
+    statuses = [result["status"] for result in report["results"]]
+    assert statuses == ["created", "duplicate_document", "not_latest", "unknown_review_code"]
+    assert report["summary"] == {"created": 1, "duplicate_document": 1, "not_latest": 1, "unknown_review_code": 1}
+
+    db.expire_all()
+    created = db.get(DocumentRevision, report["results"][0]["created_revision_id"])
+    assert created.document_id == latest.document_id
+    assert created.number == "02"
+    assert created.revision_description_id == setup["u"].id
+    assert created.revision_step_id == setup["step"].id
+    assert created.revision_status_id == setup["statuses"]["Active"].id
+    assert created.workflow_status_id == setup["draft"].id
+    assert db.get(DocumentRevision, latest.id).revision_status_id == setup["statuses"]["Superseded"].id
+    # Строки, не дошедшие до создания, ревизий не добавляют
+    assert db.query(DocumentRevision).filter(DocumentRevision.document_id != latest.document_id).count() == 3
+
+
+def test_cancelled_latest_number_is_repeated(setup, client):
+    db = setup["db"]
+    _, cancelled = _document(setup, "DOC-1", [("01", "Active"), ("02", "Cancelled")])
+
+    report = _post(client, [{"revision_id": cancelled.id, "review_code": "1"}])
+
+    (result,) = report["results"]
+    assert result["status"] == "created"
+    db.expire_all()
+    created = db.get(DocumentRevision, result["created_revision_id"])
+    # Номер отмененной последней ревизии повторяется
+    assert created.number == "02"
+    assert db.get(DocumentRevision, cancelled.id).revision_status_id == setup["statuses"]["Cancelled"].id
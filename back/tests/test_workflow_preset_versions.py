@@ -0,0 +1,92 @@
+"""
+Версии пресетов workflow: пересохранение без изменений не создает версию (id строк
+не учитываются), шаги последовательности сравниваются по типу документа и ревизии
+"""
+
+from app.models.project import WorkflowPresetSequence
+from app.models.references import RevisionDescription, RevisionStep
+from app.models.user import User
+from app.services.workflow_preset_versions import PresetSnapshot, diff_snapshots
+
+
+def _step(row_id, order, description_id, step_id=1, **fields):
+    return {
+        "id": row_id, "document_type_id": None, "sequence_order": order,
+        "revision_description_id": description_id, "revision_step_id": step_id,
+        "is_final": fields.get("is_final", False), "requires_transmittal": False
+    }
+
+
+def _snapshot(version_id, sequences):
+    return PresetSnapshot(
+        version_id=version_id, preset_id=1, version_number=version_id, sequences=tuple(sequences), rules=()
+    )
+
+
+def test_inserted_step_is_only_added():
+    before = _snapshot(1, [_step(1, 1, 10), _step(2, 2, 20)])
+    after = _snapshot(2, [_step(3, 1, 5), _step(4, 2, 10), _step(5, 3, 20)])
+    sequences = diff_snapshots(before, after)["sequences"]
+    assert [item["revision_description_id"] for item in sequences["added"]] == [5]
+    assert sequences["removed"] == [] and sequences["changed"] == [] and sequences["reordered"] == []
+
+
+def test_swapped_steps_are_reordered():
+    before = _snapshot(1, [_step(1, 1, 10), _step(2, 2, 20), _step(3, 3, 30)])
+    after = _snapshot(2, [_step(4, 1, 20), _step(5, 2, 10), _step(6, 3, 30, is_final=True)])
+    diff = diff_snapshots(before, after)
+    sequences = diff["sequences"]
+    assert sequences["added"] == [] and sequences["removed"] == []
+    assert [item["after"]["revision_description_id"] for item in sequences["reordered"]] == [20, 10]
+    assert [item["after"]["revision_description_id"] for item in sequences["changed"]] == [30]
+    assert diff["has_changes"]
+
+
+def _sequence_row_ids(db, preset_id):
+    return [
+        row_id for row_id, in db.query(WorkflowPresetSequence.id).filter(
+            WorkflowPresetSequence.preset_id == preset_id
+        ).order_by(WorkflowPresetSequence.sequence_order)
+    ]
+
+
+def test_resave_without_changes_keeps_version(db, client):
+    user = User(username="owner", email="owner@example.com", full_name="Владелец", hashed_password="x")
+    descriptions = [RevisionDescription(code="A"), RevisionDescription(code="B")]
+    step = RevisionStep(code="01")
+    db.add_all([user, step] + descriptions)
+    db.commit()
+    client.user = user
+
+    sequences = [
+        {"revision_description_id": description.id, "revision_step_id": step.id} for description in descriptions
+    ]
+    presets = []
+    for name in ("Пресет", "Другой пресет"):
+        response = client.post("/api/v1/workflow-presets/", json={"name": name, "sequences": sequences})
+        assert response.status_code == 200, response.text
+        presets.append(response.json())
+    first, preset = presets
+    row_ids = _sequence_row_ids(db, preset["id"])
+    # id шага — id строки последовательности, а не порядковый номер
+    assert [item["id"] for item in preset["sequences"]] == row_ids
+    assert row_ids != [item["sequence_order"] for item in preset["sequences"]]
+
+    # Строки пересоздаются с новыми id, содержимое то же — версия не меняется
+    response = client.put(f"/api/v1/workflow-presets/{first['id']}", json={"sequences": sequences})
+    assert response.status_code == 200, response.text
+    resaved = response.json()
+    assert _sequence_row_ids(db, first["id"]) != [item["id"] for item in first["sequences"]]
+    assert resaved["current_version_id"] == first["current_version_id"]
+
+    response = client.put(f"/api/v1/workflow-presets/{preset['id']}", json={"sequences": sequences[::-1]})
+    assert response.status_code == 200, response.text
+    updated = response.json()
+    assert updated["current_version_id"] != preset["current_version_id"]
+
+    response = client.get(f"/api/v1/workflow-presets/{preset['id']}/versions/diff", params={
+        "from_version_id": preset["current_version_id"], "to_version_id": updated["current_version_id"]
+    })
+    assert response.status_code == 200, response.text
+    diff = response.json()["sequences"]
+    assert diff["added"] == [] and diff["removed"] == [] and len(diff["reordered"]) == 2
@@ -0,0 +1,83 @@
+"""
+GET /workflow-presets: число SQL-запросов не зависит от числа пресетов — представления
+текущих версий строятся пакетно при промахе кеша и берутся из кеша версий при повторе
+"""
+
+from app.models.references import ReviewCode, RevisionDescription, RevisionStep
+from app.models.user import User
+from app.services.workflow_preset_versions import current_version_cache, view_cache
+
+
+def _create_references(db):
+    descriptions = [RevisionDescription(code=code, description=f"Описание {code}") for code in ("A", "B", "K")]
+    steps = [RevisionStep(code=code, description=f"Шаг {code}") for code in ("01", "02")]
+    review_codes = [ReviewCode(code=code, name=f"Код {code}") for code in ("1", "2", "3")]
+    db.add_all(descriptions + steps + review_codes)
+    db.commit()
+    return descriptions, steps, review_codes
+
+
+def _create_presets(client, references, count, offset=0):
+    descriptions, steps, review_codes = references
+    for index in range(offset, offset + count):
+        response = client.post("/api/v1/workflow-presets/", json={
+            "name": f"Пресет {index}",
+            "sequences": [
+                {"revision_description_id": description.id, "revision_step_id": step.id}
+                for description in descriptions for step in steps
+            ],
+            "rules": [
+                {
+                    "current_revision_description_id": descriptions[0].id,
+                    "current_revision_step_id": steps[0].id,
+                    "review_code_id": review_code.id,
+                    "next_revision_description_id": descriptions[1].id,
+                    "next_revision_step_id": steps[1].id,
+                    "priority": position,
+                }
+                for position, review_code in enumerate(review_codes)
+            ],
+        })
+        assert response.status_code == 200, response.text
+
+
+def _count_list_queries(client, query_counter):
+    with query_counter() as counter:
+        response = client.get("/api/v1/workflow-presets/")
+    assert response.status_code == 200, response.text
+    return counter.count, response.json()
+
+
+def _list_counts(client, query_counter, expected_presets):
+    """(холодный, теплый) запрос списка; холодный — после сброса кешей версий"""
+    view_cache.clear()
+    current_version_cache.clear()
+    cold, presets = _count_list_queries(client, query_counter)
+    warm, warm_presets = _count_list_queries(client, query_counter)
+    assert len(presets) == expected_presets
+    assert warm_presets == presets
+    for preset in presets:
+        assert preset["current_version_id"] is not None
+        assert len(preset["sequences"]) == 6
+        assert len(preset["rules"]) == 3
+        assert preset["rules"][0]["next_revision"]["description"]["code"] == "B"
+    return cold, warm
+
+
+def test_preset_list_query_count_is_constant(db, client, query_counter):
+    user = User(username="owner", email="owner@example.com", full_name="Владелец", hashed_password="x")
+    db.add(user)
+    db.commit()
+    client.user = user
+    references = _create_references(db)
+
+    _create_presets(client, references, 2)
+    small_cold, small_warm = _list_counts(client, query_counter, 2)
+
+    _create_presets(client, references, 10, offset=2)
+    large_cold, large_warm = _list_counts(client, query_counter, 12)
+
+    assert large_cold == small_cold
+    assert large_warm == small_warm
+    # Теплый кеш: только выборка самих пресетов
+    assert large_warm < large_cold
@@ -191,6 +191,16 @@ export interface ProjectParticipant {
   updated_at: string;
 }
 
+export interface ProjectCatalogue {
+  project_id: number;
+  workflow_preset_id: number | null;
+  disciplines: Discipline[];
+  document_types: { [disciplineId: number]: DocumentType[] };
+  revision_descriptions: RevisionDescription[];
+  revision_steps: RevisionStep[];
+  workflow_sequence: any[];
+}
+
 export interface ProjectParticipantCreate {
   company_id: number;
   contact_id?: number;
@@ -331,6 +341,59 @@ export interface Transmittal {
   status: string;
   created_at: string;
   updated_at: string;
+  // Агрегаты списка трансмитталов
+  counterparty_name?: string | null;
+  created_by_name?: string | null;
+  revisions_count?: number;
+  total_file_size?: number;
+}
+
+export interface TransmittalListFilters {
+  direction?: 'out' | 'in';
+  status?: string;
+  counterparty_id?: number;
+  date_from?: string;  // YYYY-MM-DD
+  date_to?: string;
+}
+
+export interface TransmittalBulkTransitionResult {
+  message: string;
+  requested: number;
+  updated: number;
+  results: {
+    transmittal_id: number;
+    status: 'updated' | 'not_found' | 'already' | 'forbidden';
+    error?: string;
+  }[];
+}
+
+export interface WorkflowRuleBatchItem {
+  revision_id: number;
+  review_code_id?: number;
+  review_code?: string;  // Код строкой, как в листе ответа
+}
+
+export interface WorkflowRuleBatchResult {
+  message: string;
+  requested: number;
+  summary: Record<string, number>;
+  results: {
+    revision_id: number;
+    status: 'matched' | 'created' | 'not_found' | 'forbidden' | 'no_preset' | 'unknown_review_code'
+      | 'no_rule' | 'no_action' | 'not_latest' | 'duplicate_document';
+    rule_id?: number;
+    next_revision?: Record<string, any>;
+    created_revision_id?: number;
+    error?: string;
+  }[];
+}
+
+export interface ActiveRevisionFilters {
+  search?: string;
+  discipline_id?: number;
+  document_type_id?: number;
+  revision_description_id?: number;
+  exclude_transmittal_id?: number;
 }
 
 export interface TransmittalUpdate {
@@ -679,6 +742,12 @@ export const projectsApi = {
     }
   },
 
+  // Все справочники проекта одним запросом
+  getCatalogue: async (projectId: number): Promise<ProjectCatalogue> => {
+    const response = await apiClient.get(`/projects/${projectId}/catalogue`);
+    return response.data;
+  },
+
   // Получить дисциплины проекта
   getDisciplines: async (projectId: number): Promise<Discipline[]> => {
     const response = await apiClient.get(`/projects/${projectId}/disciplines`);
@@ -802,7 +871,11 @@ export const documentsApi = {
         'Content-Type': 'multipart/form-data',
       },
     });
-    return response.data;
+    // dry_run=true возвращает отчет проверки сразу, без фоновой задачи
+    if (response.data.dry_run) {
+      return response.data;
+    }
+    return jobsApi.waitForResult(response.data.job_id);
   },
 
   // Получить ревизии документа
@@ -863,15 +936,69 @@ export const documentsApi = {
   },
 };
 
+export interface TransmittalNumberingRule {
+  id: number;
+  project_id: number;
+  direction: 'out' | 'in' | null;
+  counterparty_id: number | null;
+  counterparty_name?: string | null;
+  template: string;  // Поля: {project_code}, {direction}, {year}, {yy}, {seq} (например {seq:04d})
+  next_value: number;
+  created_at: string;
+  updated_at: string;
+}
+
+// API методы для нумерации трансмитталов
+export const transmittalNumberingApi = {
+  getRules: async (projectId: number): Promise<TransmittalNumberingRule[]> => {
+    const response = await apiClient.get('/transmittal-numbering/rules', { params: { project_id: projectId } });
+    return response.data;
+  },
+
+  createRule: async (rule: Partial<TransmittalNumberingRule>): Promise<TransmittalNumberingRule> => {
+    const response = await apiClient.post('/transmittal-numbering/rules', rule);
+    return response.data;
+  },
+
+  updateRule: async (id: number, rule: { template?: string; next_value?: number }): Promise<TransmittalNumberingRule> => {
+    const response = await apiClient.put(`/transmittal-numbering/rules/${id}`, rule);
+    return response.data;
+  },
+
+  deleteRule: async (id: number): Promise<void> => {
+    await apiClient.delete(`/transmittal-numbering/rules/${id}`);
+  },
+
+  // Следующий номер (не резервируется; 404 — нумерация не настроена)
+  previewNext: async (
+    projectId: number,
+    direction?: 'out' | 'in' | null,
+    counterpartyId?: number | null
+  ): Promise<{ transmittal_number: string; rule_id: number; template: string; next_value: number }> => {
+    const params: any = { project_id: projectId };
+    if (direction) params.direction = direction;
+    if (counterpartyId) params.counterparty_id = counterpartyId;
+    const response = await apiClient.get('/transmittal-numbering/next', { params });
+    return response.data;
+  },
+};
+
 // API методы для трансмитталов
 export const transmittalsApi = {
   // Получить все трансмитталы
-  getAll: async (projectId?: number): Promise<Transmittal[]> => {
-    const params: any = {};
+  // Журнал загружается целиком страницами по курсору (обычно одним запросом)
+  getAll: async (projectId?: number, filters: TransmittalListFilters = {}): Promise<Transmittal[]> => {
+    const params: any = { ...filters, limit: 5000 };
     if (projectId) params.project_id = projectId;
-    // Убираем лимит и офсет - загружаем все трансмитталы
-    const response = await apiClient.get('/transmittals/', { params });
-    return response.data;
+    const transmittals: Transmittal[] = [];
+    for (;;) {
+      const response = await apiClient.get('/transmittals/', { params });
+      transmittals.push(...response.data);
+      const nextCursor = response.headers['x-next-cursor'];
+      if (!nextCursor) break;
+      params.cursor = nextCursor;
+    }
+    return transmittals;
   },
 
   // Получить трансмиттал по ID
@@ -880,6 +1007,24 @@ export const transmittalsApi = {
     return response.data;
   },
 
+  // Экспорт трансмиттала по настройкам экспорта: xlsx — список документов, pdf — титульный лист
+  exportTransmittal: async (id: number, format: 'xlsx' | 'pdf' = 'xlsx'): Promise<Blob> => {
+    const response = await apiClient.get(`/transmittals/${id}/export`, {
+      params: { format },
+      responseType: 'blob',
+    });
+    return response.data;
+  },
+
+  // Экспорт реестра трансмитталов проекта (фильтры — как у списка)
+  exportRegister: async (projectId: number, filters: TransmittalListFilters = {}): Promise<Blob> => {
+    const response = await apiClient.get('/transmittals/register/export', {
+      params: { ...filters, project_id: projectId },
+      responseType: 'blob',
+    });
+    return response.data;
+  },
+
   // Создать трансмиттал
   create: async (transmittalData: Partial<Transmittal>): Promise<Transmittal> => {
     const response = await apiClient.post('/transmittals/', transmittalData);
@@ -904,18 +1049,43 @@ export const transmittalsApi = {
     return response.data;
   },
 
+  // Массовая отправка: один запрос, отчет по каждому трансмитталу
+  bulkSend: async (transmittalIds: number[]): Promise<TransmittalBulkTransitionResult> => {
+    const response = await apiClient.post('/transmittals/bulk/send', { transmittal_ids: transmittalIds });
+    return response.data;
+  },
+
+  // Массовое получение
+  bulkReceive: async (transmittalIds: number[]): Promise<TransmittalBulkTransitionResult> => {
+    const response = await apiClient.post('/transmittals/bulk/receive', { transmittal_ids: transmittalIds });
+    return response.data;
+  },
+
   // Удалить трансмиттал
   delete: async (id: number): Promise<void> => {
     await apiClient.delete(`/transmittals/${id}`);
   },
 
   // Получить активные ревизии документов
-  getActiveRevisions: async (projectId?: number): Promise<any[]> => {
-    const params = projectId ? { project_id: projectId } : {};
+  getActiveRevisions: async (projectId?: number, filters: ActiveRevisionFilters = {}): Promise<any[]> => {
+    const params = projectId ? { ...filters, project_id: projectId } : { ...filters };
     const response = await apiClient.get('/transmittals/documents/active-revisions', { params });
     return response.data;
   },
 
+  // Страница активных ревизий (nextCursor — null на последней странице)
+  getActiveRevisionsPage: async (
+    projectId: number,
+    filters: ActiveRevisionFilters = {},
+    limit: number = 200,
+    cursor?: string
+  ): Promise<{ items: any[]; nextCursor: string | null }> => {
+    const params: any = { ...filters, project_id: projectId, limit };
+    if (cursor) params.cursor = cursor;
+    const response = await apiClient.get('/transmittals/documents/active-revisions', { params });
+    return { items: response.data, nextCursor: response.headers['x-next-cursor'] || null };
+  },
+
   // Удалить ревизию из трансмиттала
   removeRevision: async (transmittalId: number, revisionId: number): Promise<void> => {
     await apiClient.delete(`/transmittals/${transmittalId}/revisions/${revisionId}`);
@@ -1170,6 +1340,61 @@ export const transmittalImportSettingsApi = {
   },
 };
 
+// Фоновая задача (импорт/экспорт выполняется воркером вне HTTP-запроса)
+export interface BackgroundJob {
+  id: number;
+  job_type: string;
+  status: 'queued' | 'running' | 'succeeded' | 'failed' | 'cancelled';
+  progress: { current: number; total: number | null; message: string | null };
+  attempts: number;
+  max_attempts: number;
+  cancel_requested: boolean;
+  partially_committed: boolean;
+  result: any;
+  error: string | null;
+  has_artifact: boolean;
+  created_at: string;
+  started_at: string | null;
+  finished_at: string | null;
+}
+
+// API методы для фоновых задач
+export const jobsApi = {
+  get: async (jobId: number): Promise<BackgroundJob> => {
+    const response = await apiClient.get(`/jobs/${jobId}`);
+    return response.data;
+  },
+
+  cancel: async (jobId: number): Promise<BackgroundJob> => {
+    const response = await apiClient.post(`/jobs/${jobId}/cancel`);
+    return response.data;
+  },
+
+  downloadArtifact: async (jobId: number): Promise<Blob> => {
+    const response = await apiClient.get(`/jobs/${jobId}/artifact`, { responseType: 'blob' });
+    return response.data;
+  },
+
+  // Ожидание завершения задачи; при ошибке бросает Error с текстом ошибки задачи
+  waitForResult: async (
+    jobId: number,
+    onProgress?: (job: BackgroundJob) => void,
+    intervalMs: number = 1000
+  ): Promise<any> => {
+    for (;;) {
+      const job = await jobsApi.get(jobId);
+      onProgress?.(job);
+      if (job.status === 'succeeded') {
+        return job.result;
+      }
+      if (job.status === 'failed' || job.status === 'cancelled') {
+        throw new Error(job.error || job.status);
+      }
+      await new Promise(resolve => setTimeout(resolve, intervalMs));
+    }
+  },
+};
+
 // Интерфейс для результата импорта трансмиттала
 export interface TransmittalImportResult {
   message: string;
@@ -1181,6 +1406,48 @@ export interface TransmittalImportResult {
   missing_documents?: string[];
 }
 
+export interface TransmittalBatchImportItem {
+  source: string;
+  status: 'imported' | 'failed';
+  transmittal_id?: number;
+  transmittal_number?: string | null;
+  table_rows_count?: number;
+  created_revisions_count?: number;
+  error?: string;
+}
+
+export interface TransmittalBatchImportResult {
+  message: string;
+  total: number;
+  imported: number;
+  failed: number;
+  skipped: { source: string; reason: string }[];
+  items: TransmittalBatchImportItem[];
+}
+
+export interface TransmittalImportPreviewDocument {
+  document_number: string;
+  document_id: number | null;
+  revision_id: number | null;
+  status: 'found' | 'missing' | 'no_revisions';
+}
+
+export interface TransmittalImportPreview {
+  content_hash: string;
+  filename: string;
+  sheet_name: string;
+  cached: boolean;
+  metadata: Record<string, string>;
+  missing_metadata: string[];
+  table_start_row: number | null;
+  missing_table_fields: string[];
+  table_rows_count: number;
+  transmittal_number: string;
+  documents: TransmittalImportPreviewDocument[];
+  can_commit: boolean;
+  errors: string[];
+}
+
 // API методы для импорта трансмитталов
 export const transmittalImportApi = {
   // Импорт входящего трансмиттала
@@ -1195,8 +1462,62 @@ export const transmittalImportApi = {
         'Content-Type': 'multipart/form-data',
       },
     });
+    return jobsApi.waitForResult(response.data.job_id);
+  },
+
+  // Предпросмотр импорта: файл или content_hash предыдущего предпросмотра
+  preview: async (
+    projectId: number,
+    counterpartyId: number,
+    source: { file: File } | { contentHash: string }
+  ): Promise<TransmittalImportPreview> => {
+    const formData = new FormData();
+    formData.append('project_id', projectId.toString());
+    formData.append('counterparty_id', counterpartyId.toString());
+    if ('file' in source) {
+      formData.append('file', source.file);
+    } else {
+      formData.append('content_hash', source.contentHash);
+    }
+
+    const response = await apiClient.post('/transmittal-import/preview', formData, {
+      headers: {
+        'Content-Type': 'multipart/form-data',
+      },
+    });
     return response.data;
   },
+
+  // Импорт книги из предпросмотра без повторной загрузки фоновой задачей (404 — предпросмотр устарел)
+  commitPreview: async (contentHash: string, projectId: number, counterpartyId: number): Promise<TransmittalImportResult> => {
+    const formData = new FormData();
+    formData.append('content_hash', contentHash);
+    formData.append('project_id', projectId.toString());
+    formData.append('counterparty_id', counterpartyId.toString());
+
+    const response = await apiClient.post('/transmittal-import/commit', formData);
+    return jobsApi.waitForResult(response.data.job_id);
+  },
+
+  // Пакетный импорт: ZIP с книгами или книга, где каждый лист — трансмиттал
+  importBatch: async (
+    file: File,
+    projectId: number,
+    counterpartyId: number,
+    onProgress?: (job: BackgroundJob) => void
+  ): Promise<TransmittalBatchImportResult> => {
+    const formData = new FormData();
+    formData.append('file', file);
+    formData.append('project_id', projectId.toString());
+    formData.append('counterparty_id', counterpartyId.toString());
+
+    const response = await apiClient.post('/transmittal-import/import-batch', formData, {
+      headers: {
+        'Content-Type': 'multipart/form-data',
+      },
+    });
+    return jobsApi.waitForResult(response.data.job_id, onProgress);
+  },
 };
 
 // API методы для настроек пользователя
@@ -1495,7 +1816,32 @@ export const workflowPresetsApi = {
     apiClient.put(`/workflow-presets/${id}`, data).then(res => res.data),
   
   delete: (id: number): Promise<void> => 
-    apiClient.delete(`/workflow-presets/${id}`).then(res => res.data)
+    apiClient.delete(`/workflow-presets/${id}`).then(res => res.data),
+
+  // Версии пресета: каждое сохранение последовательности/правил создает новую неизменяемую версию
+  getVersions: (id: number): Promise<any[]> =>
+    apiClient.get(`/workflow-presets/${id}/versions`).then(res => res.data),
+
+  getVersion: (id: number, versionId: number): Promise<any> =>
+    apiClient.get(`/workflow-presets/${id}/versions/${versionId}`).then(res => res.data),
+
+  // Различия версий; по умолчанию — текущая относительно предыдущей
+  diffVersions: (id: number, fromVersionId?: number, toVersionId?: number): Promise<any> =>
+    apiClient.get(`/workflow-presets/${id}/versions/diff`, {
+      params: { from_version_id: fromVersionId, to_version_id: toVersionId }
+    }).then(res => res.data),
+
+  // Пакетное применение правил (строки ответа по трансмитталу); createRevisions — создать следующие ревизии
+  applyRulesBatch: (
+    items: WorkflowRuleBatchItem[],
+    createRevisions = false,
+    changeDescription?: string
+  ): Promise<WorkflowRuleBatchResult> =>
+    apiClient.post('/workflow-rules/apply-rules/batch', {
+      items,
+      create_revisions: createRevisions,
+      change_description: changeDescription
+    }).then(res => res.data)
 };
 
 // Дублирующееся объявление languagesApi удалено - используется объявление выше